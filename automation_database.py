@@ -0,0 +1,757 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🗄️ AUTOMATION DATABASE - SQLITE COM POOL DE CONEXÕES E WAL
+=========================================================
+Banco local do servidor de automação (automations, automation_logs,
+visitor_photos).
+
+Antes cada método abria um sqlite3.connect, executava um comando, fazia
+commit e fechava; workers e requisições do Flask disputavam o journal de
+rollback padrão. Agora:
+- conexões reutilizadas por um pool (cada uma mantém o cache de comandos
+  preparados do sqlite3, então o mesmo SQL não é recompilado a cada chamada)
+- journal WAL: leituras não bloqueiam a escrita e vice-versa
+- synchronous=NORMAL (seguro com WAL) e busy_timeout em vez de erro imediato
+
+As estatísticas (/api/health, /api/hikcentral/stats) saem de um snapshot em
+memória atualizado a cada mudança de status; o banco só é consultado (uma
+query agrupada, coberta pelo índice status+created_at) na inicialização e
+quando get_stats(fresh=True) pede reconciliação.
+
+add_log não grava na hora: as linhas passam pelo LogSink
+(automation_log_sink.py), que grava em lote numa thread própria.
+
+A fila de jobs mora na tabela automations: enqueue é um INSERT commitado,
+claim/claim_next são compare-and-set atômicos e a PriorityJobQueue do
+servidor é só cache. Um processo morto não perde job aceito (o reaper de
+leases devolve os que estavam em andamento). Com synchronous=NORMAL uma
+queda de energia pode desfazer os últimos commits; DB_SYNCHRONOUS=FULL
+fecha essa janela ao custo de um fsync por commit.
+"""
+
+import os
+import json
+import queue
+import base64
+import hashlib
+import socket
+import time
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from contextlib import contextmanager
+
+from automation_log_sink import LogSink
+from priority_job_queue import job_priority, QUEUE_AGING_SECONDS
+
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '8'))
+DB_BUSY_TIMEOUT_MS = int(os.getenv('DB_BUSY_TIMEOUT_MS', '5000'))
+DB_SYNCHRONOUS = os.getenv('DB_SYNCHRONOUS', 'NORMAL')  # NORMAL ou FULL
+DB_STATEMENT_CACHE = 256  # comandos preparados mantidos por conexão
+RETRY_ATTEMPTS = 3
+STATS_STATUSES = ('pending', 'processing', 'completed', 'failed')
+STATS_WINDOW = 24 * 3600  # janela do contador last_24h (s)
+LEASE_SECONDS = int(os.getenv('LEASE_SECONDS', '90'))  # renovado por heartbeat a cada 1/3
+HISTORY_PAGE_SIZE = 50
+HISTORY_MAX_PAGE_SIZE = 500
+CPF_HASH_SALT = os.getenv('CPF_HASH_SALT', '')
+# Identifica esta instância do servidor nos leases (várias instâncias podem usar o mesmo banco)
+INSTANCE_ID = os.getenv('AUTOMATION_INSTANCE_ID', f"{socket.gethostname()}:{os.getpid()}")
+
+PRAGMAS = (
+    "PRAGMA auto_vacuum=INCREMENTAL",  # só vale em banco novo; o job de retenção converte os antigos
+    "PRAGMA journal_mode=WAL",
+    f"PRAGMA synchronous={DB_SYNCHRONOUS}",
+    f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}",
+    "PRAGMA temp_store=MEMORY",
+)
+
+
+# Cria o job como 'pending' ou reinicia um job terminado; nunca sobrescreve um em processamento
+UPSERT_AUTOMATION_SQL = '''
+    INSERT INTO automations
+    (id, visitor_data, status, created_at, updated_at, photo_path, has_photo, cpf_hash,
+     priority, dispatch_key)
+    VALUES (?, ?, 'pending', CURRENT_TIMESTAMP, CURRENT_TIMESTAMP, ?, ?, ?, ?, ?)
+    ON CONFLICT(id) DO UPDATE SET
+        visitor_data = excluded.visitor_data, status = 'pending',
+        created_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP,
+        retry_count = 0, error_message = NULL, worker_id = NULL, completed_at = NULL,
+        photo_path = excluded.photo_path, has_photo = excluded.has_photo, cpf_hash = excluded.cpf_hash,
+        priority = excluded.priority, dispatch_key = excluded.dispatch_key
+    WHERE automations.status != 'processing'
+'''
+
+
+def upsert_params(visitor_id, visitor_data, photo_path, digest):
+    """Parâmetros do UPSERT_AUTOMATION_SQL; dispatch_key segue a ordem da PriorityJobQueue"""
+    priority = job_priority(visitor_data)
+    return (visitor_id, json.dumps(visitor_data), photo_path, 1 if photo_path else 0, digest,
+            priority, time.time() - priority * QUEUE_AGING_SECONDS)
+
+
+def encode_cursor(created_at, visitor_id):
+    """Cursor opaco da paginação do histórico (posição da última linha entregue)"""
+    return base64.urlsafe_b64encode(json.dumps([created_at, visitor_id]).encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        created_at, visitor_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return str(created_at), str(visitor_id)
+    except Exception:
+        raise ValueError('cursor inválido')
+
+
+def normalize_timestamp(value):
+    """Data/hora ISO (ou só a data) no formato do CURRENT_TIMESTAMP do SQLite (UTC)"""
+    try:
+        parsed = datetime.fromisoformat(value.strip().replace('Z', '+00:00'))
+    except (AttributeError, ValueError):
+        raise ValueError(f'data inválida: {value}')
+    if parsed.tzinfo:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def cpf_hash(visitor_data):
+    """SHA-256 do CPF só com dígitos (None sem CPF completo) - chave de deduplicação"""
+    digits = ''.join(c for c in str((visitor_data or {}).get('cpf') or '') if c.isdigit())
+    if len(digits) != 11:
+        return None
+    return hashlib.sha256(f"{CPF_HASH_SALT}{digits}".encode()).hexdigest()
+
+
+class SQLitePool:
+    """Pool de conexões SQLite compartilhado por workers e threads do Flask"""
+
+    def __init__(self, db_path, size=DB_POOL_SIZE):
+        self.db_path = db_path
+        self.size = size
+        self.idle = queue.LifoQueue()  # LIFO: conexão mais recente tem cache quente
+        self.created = 0
+        self.lock = threading.Lock()
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=DB_BUSY_TIMEOUT_MS / 1000,
+            check_same_thread=False,  # a conexão circula entre threads, mas uma por vez
+            cached_statements=DB_STATEMENT_CACHE
+        )
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """Empresta uma conexão do pool (cria até `size`; acima disso espera uma livre)"""
+        conn = None
+        try:
+            conn = self.idle.get_nowait()
+        except queue.Empty:
+            with self.lock:
+                if self.created < self.size:
+                    self.created += 1
+                    conn = self._connect()
+            if conn is None:
+                conn = self.idle.get()
+
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self.idle.put(conn)
+
+    def close_all(self):
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                break
+        with self.lock:
+            self.created = 0
+
+
+class StatsSnapshot:
+    """Contadores por status em memória, atualizados a cada transição (leitura O(1))"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = {}
+        self.recent = OrderedDict()  # visitor_id -> criado em (epoch), mais antigo primeiro
+
+    def load(self, counts, recent):
+        """Substitui o snapshot pelos valores lidos do banco"""
+        with self.lock:
+            self.counts = dict(counts)
+            self.recent = OrderedDict(recent)
+
+    def created(self, visitor_id, old_status, status='pending'):
+        """Automação inserida (ou substituída, com old_status) agora"""
+        with self.lock:
+            self._move(old_status, status)
+            self.recent[visitor_id] = time.time()
+            self.recent.move_to_end(visitor_id)
+
+    def transition(self, old_status, status):
+        if old_status == status:
+            return
+        with self.lock:
+            self._move(old_status, status)
+
+    def _move(self, old_status, status):
+        if old_status is not None:
+            self.counts[old_status] = self.counts.get(old_status, 0) - 1
+        self.counts[status] = self.counts.get(status, 0) + 1
+
+    def snapshot(self):
+        with self.lock:
+            cutoff = time.time() - STATS_WINDOW
+            while self.recent:
+                visitor_id, created = next(iter(self.recent.items()))
+                if created >= cutoff:
+                    break
+                self.recent.popitem(last=False)
+            stats = {status: self.counts.get(status, 0) for status in STATS_STATUSES}
+            stats['last_24h'] = len(self.recent)
+        stats['total'] = sum(stats[status] for status in STATS_STATUSES)
+        return stats
+
+
+class AutomationDatabase:
+    """Gerenciador de banco de dados para automações"""
+
+    def __init__(self, db_path='automation.db', pool_size=DB_POOL_SIZE,
+                 instance_id=INSTANCE_ID, lease_seconds=LEASE_SECONDS):
+        self.db_path = db_path
+        self.instance_id = instance_id
+        self.lease_seconds = lease_seconds
+        self.pool = SQLitePool(db_path, pool_size)
+        self.stats = StatsSnapshot()
+        self.init_database()
+        self.refresh_stats()
+        self.log_sink = LogSink(self._insert_logs)
+
+    # ========== ACESSO ==========
+
+    def _execute(self, sql, params=()):
+        """Executa um comando de escrita em transação própria"""
+        with self.pool.connection() as conn:
+            with conn:
+                return conn.execute(sql, params).rowcount
+
+    def _write_status(self, visitor_id, sql, params):
+        """
+        Executa uma escrita que muda o status de uma automação e devolve
+        (existia, status anterior). BEGIN IMMEDIATE garante que o status lido
+        é o que a escrita substitui, mesmo com workers concorrentes.
+        """
+        with self.pool.connection() as conn:
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                row = conn.execute('SELECT status FROM automations WHERE id = ?', (visitor_id,)).fetchone()
+                conn.execute(sql, params)
+        return row is not None, row[0] if row else None
+
+    def _fetchone(self, sql, params=()):
+        with self.pool.connection() as conn:
+            return conn.execute(sql, params).fetchone()
+
+    def _fetchall(self, sql, params=()):
+        with self.pool.connection() as conn:
+            return conn.execute(sql, params).fetchall()
+
+    def close(self):
+        """Grava os logs pendentes e fecha as conexões"""
+        self.log_sink.close()
+        self.pool.close_all()
+
+    # ========== ESQUEMA ==========
+
+    def init_database(self):
+        """Inicializa o banco de dados"""
+        with self.pool.connection() as conn:
+            with conn:
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS automations (
+                        id TEXT PRIMARY KEY,
+                        visitor_data TEXT NOT NULL,
+                        status TEXT DEFAULT 'pending',
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        retry_count INTEGER DEFAULT 0,
+                        error_message TEXT,
+                        worker_id INTEGER,
+                        completed_at TIMESTAMP,
+                        photo_path TEXT,
+                        has_photo BOOLEAN DEFAULT 0
+                    )
+                ''')
+
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS automation_logs (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        automation_id TEXT,
+                        level TEXT,
+                        message TEXT,
+                        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        FOREIGN KEY (automation_id) REFERENCES automations (id)
+                    )
+                ''')
+
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS visitor_photos (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        visitor_id TEXT NOT NULL,
+                        photo_path TEXT NOT NULL,
+                        file_size INTEGER,
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        metadata TEXT
+                    )
+                ''')
+
+                # Leases dos claims (bancos criados antes ganham as colunas aqui)
+                columns = {row[1] for row in conn.execute('PRAGMA table_info(automations)')}
+                if 'lease_owner' not in columns:
+                    conn.execute('ALTER TABLE automations ADD COLUMN lease_owner TEXT')
+                if 'lease_expires_at' not in columns:
+                    conn.execute('ALTER TABLE automations ADD COLUMN lease_expires_at REAL')
+                # Hash do CPF normalizado para deduplicar envios repetidos
+                if 'cpf_hash' not in columns:
+                    conn.execute('ALTER TABLE automations ADD COLUMN cpf_hash TEXT')
+                # Fila durável: ordem de despacho gravada no enqueue (prioridade + envelhecimento)
+                if 'priority' not in columns:
+                    conn.execute('ALTER TABLE automations ADD COLUMN priority INTEGER DEFAULT 1')
+                if 'dispatch_key' not in columns:
+                    conn.execute('ALTER TABLE automations ADD COLUMN dispatch_key REAL')
+                conn.execute('''
+                    CREATE INDEX IF NOT EXISTS idx_automations_dispatch
+                    ON automations (status, dispatch_key)
+                ''')
+                conn.execute('''
+                    CREATE INDEX IF NOT EXISTS idx_automations_cpf_hash
+                    ON automations (cpf_hash) WHERE cpf_hash IS NOT NULL
+                ''')
+
+                # Cobre a contagem agrupada de get_stats e o histórico filtrado por status;
+                # o id no fim é o desempate da paginação por keyset
+                conn.execute('DROP INDEX IF EXISTS idx_automations_status_created')
+                conn.execute('''
+                    CREATE INDEX IF NOT EXISTS idx_automations_status_history
+                    ON automations (status, created_at, id)
+                ''')
+                # Histórico sem filtro e por worker
+                conn.execute('''
+                    CREATE INDEX IF NOT EXISTS idx_automations_history
+                    ON automations (created_at, id)
+                ''')
+                conn.execute('''
+                    CREATE INDEX IF NOT EXISTS idx_automations_worker_history
+                    ON automations (worker_id, created_at, id)
+                ''')
+        logging.info("✅ Banco de dados inicializado (WAL, pool de conexões)")
+
+    # ========== AUTOMAÇÕES ==========
+
+    def add_automation(self, visitor_id, visitor_data, photo_path=None):
+        """
+        Adiciona (ou reenfileira) automação como 'pending', com suporte a foto.
+        Uma automação em 'processing' não é sobrescrita: o worker dono termina
+        o job e a entrada repetida na fila perde o claim.
+
+        Returns:
+            bool: False se a automação estava em processamento
+        """
+        has_photo = 1 if photo_path else 0
+
+        _, old_status = self._write_status(
+            visitor_id, UPSERT_AUTOMATION_SQL,
+            upsert_params(visitor_id, visitor_data, photo_path, cpf_hash(visitor_data))
+        )
+
+        if old_status == 'processing':
+            logging.warning(f"⚠️ Automação {visitor_id} já está em processamento - mantida")
+            return False
+        self.stats.created(visitor_id, old_status)
+
+        logging.info(f"✅ Automação {visitor_id} adicionada ao banco (foto: {'sim' if has_photo else 'não'})")
+        return True
+
+    def enqueue(self, visitor_id, visitor_data, photo_path=None):
+        """
+        Enfileiramento idempotente: se já existe job pending/processing com o
+        mesmo visitor_id ou o mesmo CPF, devolve esse job em vez de criar outro.
+
+        Returns:
+            dict: {'visitor_id', 'status', 'coalesced'} - visitor_id é o do job existente
+                  quando coalesced=True
+        """
+        digest = cpf_hash(visitor_data)
+        has_photo = 1 if photo_path else 0
+
+        with self.pool.connection() as conn:
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                existing = conn.execute('''
+                    SELECT id, status FROM automations
+                    WHERE (id = ? OR (? IS NOT NULL AND cpf_hash = ?))
+                    AND status IN ('pending', 'processing')
+                    ORDER BY id = ? DESC
+                    LIMIT 1
+                ''', (visitor_id, digest, digest, visitor_id)).fetchone()
+
+                if existing:
+                    existing_id, status = existing
+                else:
+                    row = conn.execute('SELECT status FROM automations WHERE id = ?', (visitor_id,)).fetchone()
+                    conn.execute(UPSERT_AUTOMATION_SQL, upsert_params(visitor_id, visitor_data, photo_path, digest))
+
+        if existing:
+            logging.info(f"🔁 Envio repetido de {visitor_id} agrupado no job {existing_id} ({status})")
+            return {'visitor_id': existing_id, 'status': status, 'coalesced': True}
+
+        self.stats.created(visitor_id, row[0] if row else None)
+        logging.info(f"✅ Automação {visitor_id} adicionada ao banco (foto: {'sim' if has_photo else 'não'})")
+        return {'visitor_id': visitor_id, 'status': 'pending', 'coalesced': False}
+
+    def save_visitor_photo_record(self, visitor_id, photo_path, file_size, metadata=None):
+        """Salva registro da foto no banco"""
+        self._execute('''
+            INSERT INTO visitor_photos (visitor_id, photo_path, file_size, metadata)
+            VALUES (?, ?, ?, ?)
+        ''', (visitor_id, photo_path, file_size, json.dumps(metadata) if metadata else None))
+
+        logging.info(f"✅ Registro de foto salvo para {visitor_id}")
+
+    def update_status(self, visitor_id, status, error=None, worker_id=None):
+        """Atualiza status da automação"""
+        if status == 'completed':
+            exists, old_status = self._write_status(visitor_id, '''
+                UPDATE automations
+                SET status = ?, updated_at = CURRENT_TIMESTAMP,
+                    completed_at = CURRENT_TIMESTAMP, worker_id = ?
+                WHERE id = ?
+            ''', (status, worker_id, visitor_id))
+        else:
+            exists, old_status = self._write_status(visitor_id, '''
+                UPDATE automations
+                SET status = ?, error_message = ?, updated_at = CURRENT_TIMESTAMP,
+                    worker_id = ?
+                WHERE id = ?
+            ''', (status, error, worker_id, visitor_id))
+
+        if exists:
+            self.stats.transition(old_status, status)
+
+        logging.info(f"✅ Status atualizado para {visitor_id}: {status}")
+
+    def increment_retry(self, visitor_id):
+        """Incrementa contador de retry"""
+        self._execute('''
+            UPDATE automations
+            SET retry_count = retry_count + 1, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        ''', (visitor_id,))
+
+    def get_pending(self, max_retries=RETRY_ATTEMPTS):
+        """Recupera automações pendentes (jobs em processamento voltam pelo reaper de leases)"""
+        rows = self._fetchall('''
+            SELECT id, visitor_data, retry_count
+            FROM automations
+            WHERE status = 'pending'
+            AND retry_count < ?
+            ORDER BY dispatch_key ASC
+        ''', (max_retries,))
+
+        return [
+            {
+                'visitor_id': row[0],
+                'visitor_data': json.loads(row[1]),
+                'retry_count': row[2]
+            }
+            for row in rows
+        ]
+
+    def get_status(self, visitor_id):
+        """Obtém status de uma automação"""
+        result = self._fetchone('''
+            SELECT status, created_at, updated_at, retry_count,
+                   error_message, worker_id, completed_at
+            FROM automations WHERE id = ?
+        ''', (visitor_id,))
+
+        if result:
+            return {
+                'status': result[0],
+                'created_at': result[1],
+                'updated_at': result[2],
+                'retry_count': result[3],
+                'error_message': result[4],
+                'worker_id': result[5],
+                'completed_at': result[6]
+            }
+        return None
+
+    # ========== HISTÓRICO ==========
+
+    def get_history(self, status=None, worker_id=None, since=None, until=None, cursor=None,
+                    limit=HISTORY_PAGE_SIZE):
+        """
+        Automações mais recentes primeiro, paginadas por keyset (created_at, id):
+        cada página começa depois do cursor da anterior, sem OFFSET, e o filtro
+        usado cai num dos índices (status|worker_id, created_at, id).
+
+        Devolve até limit + 1 linhas (a extra indica que há próxima página).
+        A página já é limitada, então é lida inteira e a conexão volta ao pool
+        antes da resposta ser transmitida: cliente HTTP lento não segura
+        conexão que os workers usam em claim/heartbeat.
+
+        Raises:
+            ValueError: cursor ou data inválidos
+        """
+        conditions, params = [], []
+        if status:
+            conditions.append('status = ?')
+            params.append(status)
+        if worker_id is not None:
+            conditions.append('worker_id = ?')
+            params.append(int(worker_id))
+        if since:
+            conditions.append('created_at >= ?')
+            params.append(normalize_timestamp(since))
+        if until:
+            conditions.append('created_at < ?')
+            params.append(normalize_timestamp(until))
+        if cursor:
+            conditions.append('(created_at, id) < (?, ?)')
+            params.extend(decode_cursor(cursor))
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        limit = max(1, min(int(limit), HISTORY_MAX_PAGE_SIZE))
+
+        sql = f'''
+            SELECT id, status, created_at, updated_at, completed_at, retry_count,
+                   worker_id, error_message, priority, has_photo,
+                   json_extract(visitor_data, '$.name')
+            FROM automations
+            {where}
+            ORDER BY created_at DESC, id DESC
+            LIMIT ?
+        '''
+        return [
+            {
+                'visitor_id': row[0],
+                'status': row[1],
+                'created_at': row[2],
+                'updated_at': row[3],
+                'completed_at': row[4],
+                'retry_count': row[5],
+                'worker_id': row[6],
+                'error_message': row[7],
+                'priority': row[8],
+                'has_photo': bool(row[9]),
+                'name': row[10]
+            }
+            for row in self._fetchall(sql, (*params, limit + 1))
+        ]
+
+    # ========== CICLO DE VIDA DO JOB ==========
+    # Cada transição é um único UPDATE com compare-and-set no status atual:
+    # uma conexão e um commit, e só um worker consegue pegar cada job.
+    # O claim é um lease (dono + expiração) renovado por heartbeat; só o
+    # reaper devolve à fila jobs cujo lease venceu, então outra instância do
+    # servidor usando o mesmo banco não tem seus jobs roubados.
+
+    def lease_owner(self, worker_id):
+        return f"{self.instance_id}/{worker_id}"
+
+    def _transition(self, visitor_id, from_status, to_status, sql, params):
+        """Executa o UPDATE da transição; True se a linha estava em from_status"""
+        if self._execute(sql, params) != 1:
+            return False
+        self.stats.transition(from_status, to_status)
+        return True
+
+    def claim(self, visitor_id, worker_id, retry=False):
+        """
+        pending -> processing com lease de LEASE_SECONDS para este worker.
+
+        Returns:
+            bool: False se outro worker já pegou o job ou ele já terminou
+        """
+        return self._transition(visitor_id, 'pending', 'processing', '''
+            UPDATE automations
+            SET status = 'processing', worker_id = ?, retry_count = retry_count + ?,
+                error_message = NULL, updated_at = CURRENT_TIMESTAMP,
+                lease_owner = ?, lease_expires_at = ?
+            WHERE id = ? AND status = 'pending'
+        ''', (worker_id, 1 if retry else 0, self.lease_owner(worker_id),
+              time.time() + self.lease_seconds, visitor_id))
+
+    def claim_next(self, worker_id, max_retries=RETRY_ATTEMPTS):
+        """
+        Tira do banco o próximo job pendente (menor dispatch_key) e faz o
+        claim na mesma transação. Usado quando a fila em memória está vazia:
+        ela é só um cache do que está 'pending' no banco.
+
+        Returns:
+            dict | None: {'visitor_id', 'visitor_data', 'retry_count'}
+        """
+        with self.pool.connection() as conn:
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                row = conn.execute('''
+                    SELECT id, visitor_data, retry_count FROM automations
+                    WHERE status = 'pending' AND retry_count < ?
+                    ORDER BY dispatch_key ASC
+                    LIMIT 1
+                ''', (max_retries,)).fetchone()
+                if not row:
+                    return None
+                conn.execute('''
+                    UPDATE automations
+                    SET status = 'processing', worker_id = ?, error_message = NULL,
+                        updated_at = CURRENT_TIMESTAMP, lease_owner = ?, lease_expires_at = ?
+                    WHERE id = ? AND status = 'pending'
+                ''', (worker_id, self.lease_owner(worker_id), time.time() + self.lease_seconds, row[0]))
+        self.stats.transition('pending', 'processing')
+        return {'visitor_id': row[0], 'visitor_data': json.loads(row[1]), 'retry_count': row[2]}
+
+    def heartbeat(self, visitor_id, worker_id):
+        """
+        Renova o lease do job em processamento.
+
+        Returns:
+            bool: False se o lease venceu e o job não pertence mais a este worker
+        """
+        return self._execute('''
+            UPDATE automations SET lease_expires_at = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ? AND status = 'processing' AND lease_owner = ?
+        ''', (time.time() + self.lease_seconds, visitor_id, self.lease_owner(worker_id))) == 1
+
+    def complete(self, visitor_id, worker_id):
+        """processing (lease deste worker) -> completed"""
+        return self._transition(visitor_id, 'processing', 'completed', '''
+            UPDATE automations
+            SET status = 'completed', updated_at = CURRENT_TIMESTAMP, completed_at = CURRENT_TIMESTAMP,
+                lease_owner = NULL, lease_expires_at = NULL
+            WHERE id = ? AND status = 'processing' AND lease_owner = ?
+        ''', (visitor_id, self.lease_owner(worker_id)))
+
+    def fail(self, visitor_id, worker_id, error=None):
+        """processing (lease deste worker) -> failed"""
+        return self._transition(visitor_id, 'processing', 'failed', '''
+            UPDATE automations
+            SET status = 'failed', error_message = ?, updated_at = CURRENT_TIMESTAMP,
+                lease_owner = NULL, lease_expires_at = NULL
+            WHERE id = ? AND status = 'processing' AND lease_owner = ?
+        ''', (error, visitor_id, self.lease_owner(worker_id)))
+
+    @contextmanager
+    def lease(self, visitor_id, worker_id, interval=None):
+        """
+        Mantém o lease vivo enquanto o bloco roda (heartbeat em segundo plano).
+        Expõe lost (threading.Event) marcado se o lease for perdido.
+        """
+        interval = interval or max(1.0, self.lease_seconds / 3)
+        stop = threading.Event()
+        lost = threading.Event()
+
+        def beat():
+            while not stop.wait(interval):
+                try:
+                    if not self.heartbeat(visitor_id, worker_id):
+                        lost.set()
+                        logging.warning(f"⚠️ Lease de {visitor_id} perdido pelo worker {worker_id}")
+                        return
+                except Exception as e:
+                    logging.warning(f"⚠️ Heartbeat de {visitor_id} falhou: {e}")
+
+        thread = threading.Thread(target=beat, name=f'lease-{visitor_id}', daemon=True)
+        thread.start()
+        try:
+            yield lost
+        finally:
+            stop.set()
+
+    def reap_expired_leases(self, max_retries=RETRY_ATTEMPTS):
+        """
+        Jobs 'processing' com lease vencido (ou sem lease, de versões antigas)
+        voltam para 'pending'; os que já esgotaram as tentativas viram 'failed'.
+        O lease vencido conta como tentativa (retry_count + 1 no próprio UPDATE),
+        seja qual for o caminho que pegou o job (claim, claim_next, outra instância).
+
+        Returns:
+            list: automações devolvidas à fila [{'visitor_id', 'visitor_data', 'retry_count'}]
+        """
+        now = time.time()
+        with self.pool.connection() as conn:
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                rows = conn.execute('''
+                    SELECT id, visitor_data, retry_count FROM automations
+                    WHERE status = 'processing' AND (lease_expires_at IS NULL OR lease_expires_at < ?)
+                ''', (now,)).fetchall()
+                if not rows:
+                    return []
+                conn.execute(f'''
+                    UPDATE automations
+                    SET status = CASE WHEN retry_count + 1 < ? THEN 'pending' ELSE 'failed' END,
+                        error_message = CASE WHEN retry_count + 1 < ? THEN error_message ELSE 'Lease expirado' END,
+                        retry_count = retry_count + 1,
+                        lease_owner = NULL, lease_expires_at = NULL, updated_at = CURRENT_TIMESTAMP
+                    WHERE id IN ({','.join('?' * len(rows))})
+                ''', (max_retries, max_retries, *[row[0] for row in rows]))
+
+        requeued = []
+        for visitor_id, visitor_data, retry_count in rows:
+            if retry_count + 1 < max_retries:
+                self.stats.transition('processing', 'pending')
+                requeued.append({'visitor_id': visitor_id, 'visitor_data': json.loads(visitor_data),
+                                 'retry_count': retry_count + 1})
+            else:
+                self.stats.transition('processing', 'failed')
+        logging.info(f"♻️ {len(rows)} leases vencidos: {len(requeued)} de volta à fila, "
+                     f"{len(rows) - len(requeued)} falharam por tentativas")
+        return requeued
+
+    # ========== LOGS E ESTATÍSTICAS ==========
+
+    def add_log(self, automation_id, level, message):
+        """Adiciona log para uma automação (gravado em lote pelo LogSink)"""
+        self.log_sink.put(automation_id, level, message)
+
+    def _insert_logs(self, rows):
+        """Grava um lote de logs numa única transação"""
+        with self.pool.connection() as conn:
+            with conn:
+                conn.executemany('''
+                    INSERT INTO automation_logs (automation_id, level, message, timestamp)
+                    VALUES (?, ?, ?, ?)
+                ''', rows)
+
+    def refresh_stats(self):
+        """Recarrega o snapshot com uma única query agrupada (usa o índice status+created_at)"""
+        with self.pool.connection() as conn:
+            counts = {
+                status: count
+                for status, count in conn.execute(
+                    'SELECT status, COUNT(*) FROM automations GROUP BY status'
+                )
+            }
+            recent = conn.execute('''
+                SELECT id, CAST(strftime('%s', created_at) AS INTEGER) FROM automations
+                WHERE created_at >= datetime('now', '-24 hours')
+                ORDER BY created_at ASC
+            ''').fetchall()
+        self.stats.load(counts, recent)
+
+    def get_stats(self, fresh=False):
+        """Retorna estatísticas gerais (do snapshot em memória; fresh=True reconcilia com o banco)"""
+        if fresh:
+            self.refresh_stats()
+        return self.stats.snapshot()
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+📝 AUTOMATION LOG SINK - ESCRITA EM LOTE DOS LOGS DE AUTOMAÇÃO
+=============================================================
+add_log fazia connect/insert/commit por linha, no caminho do worker. Agora
+as linhas vão para um buffer limitado em memória e uma thread grava em
+lotes (executemany numa única transação):
+
+- flush ao juntar LOG_BATCH_SIZE linhas ou LOG_FLUSH_INTERVAL segundos
+- buffer cheio: o produtor espera até LOG_PUT_TIMEOUT; se ainda estiver
+  cheio, grava a própria linha direto (nada é descartado)
+- falha na gravação (ex. SQLITE_BUSY durante a retenção ou o checkpoint do
+  WAL): o lote é repetido LOG_WRITE_RETRIES vezes com backoff; se continuar
+  falhando, as linhas vão para LOG_FALLBACK_FILE (JSON por linha), que é
+  regravado no banco quando o sink sobe de novo
+- close() (e atexit) esvazia o buffer antes de sair
+
+Saídas grandes (stdout/stderr dos scripts Selenium) não vão inteiras para o
+banco: o texto completo é salvo comprimido em logs/script_output/ e a linha
+guarda o início, o fim e o caminho do arquivo.
+"""
+
+import os
+import gzip
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+
+LOG_BUFFER_SIZE = int(os.getenv('LOG_BUFFER_SIZE', '10000'))
+LOG_BATCH_SIZE = int(os.getenv('LOG_BATCH_SIZE', '200'))
+LOG_FLUSH_INTERVAL = float(os.getenv('LOG_FLUSH_INTERVAL', '1.0'))
+LOG_PUT_TIMEOUT = float(os.getenv('LOG_PUT_TIMEOUT', '2.0'))
+LOG_INLINE_MAX = int(os.getenv('LOG_INLINE_MAX', '4000'))  # caracteres guardados no banco
+LOG_OUTPUT_DIR = os.getenv('LOG_OUTPUT_DIR', os.path.join('logs', 'script_output'))
+LOG_WRITE_RETRIES = int(os.getenv('LOG_WRITE_RETRIES', '3'))
+LOG_RETRY_BACKOFF = float(os.getenv('LOG_RETRY_BACKOFF', '0.2'))  # segundos, dobra a cada tentativa
+LOG_FALLBACK_FILE = os.getenv('LOG_FALLBACK_FILE', os.path.join('logs', 'automation_logs_fallback.jsonl'))
+
+
+def compact_message(automation_id, message, limit=LOG_INLINE_MAX, output_dir=LOG_OUTPUT_DIR):
+    """
+    Mensagem que cabe no banco. Acima de `limit` caracteres, o texto completo
+    vai para um .log.gz e a mensagem vira início + fim + caminho do arquivo.
+
+    Returns:
+        tuple: (mensagem, truncada?)
+    """
+    if message is None or len(message) <= limit:
+        return message, False
+
+    path = None
+    try:
+        os.makedirs(output_dir, exist_ok=True)
+        safe_id = ''.join(c if c.isalnum() or c in '-_' else '_' for c in str(automation_id))
+        path = os.path.join(output_dir, f"{safe_id}_{time.strftime('%Y%m%d_%H%M%S')}_{time.time_ns() % 1000000:06d}.log.gz")
+        with gzip.open(path, 'wt', encoding='utf-8') as f:
+            f.write(message)
+    except Exception as e:
+        logging.warning(f"⚠️ Erro ao salvar saída completa de {automation_id}: {e}")
+        path = None
+
+    half = limit // 2
+    omitted = len(message) - 2 * half
+    pointer = f"completo em {path}" if path else "arquivo completo indisponível"
+    return f"{message[:half]}\n[... {omitted} caracteres omitidos; {pointer} ...]\n{message[-half:]}", True
+
+
+class LogSink:
+    """
+    Buffer de escrita em lote para automation_logs.
+
+    Args:
+        write_batch: callable(rows) que grava [(automation_id, level, message, timestamp), ...]
+                     numa única transação
+    """
+
+    def __init__(self, write_batch, max_buffer=LOG_BUFFER_SIZE, batch_size=LOG_BATCH_SIZE,
+                 flush_interval=LOG_FLUSH_INTERVAL, put_timeout=LOG_PUT_TIMEOUT,
+                 retries=LOG_WRITE_RETRIES, retry_backoff=LOG_RETRY_BACKOFF, fallback_file=LOG_FALLBACK_FILE):
+        self.write_batch = write_batch
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.fallback_file = fallback_file
+        self.buffer = queue.Queue(maxsize=max_buffer)
+        self.stopping = threading.Event()
+        self.put_lock = threading.Lock()  # checagem de stopping + put atômicos em relação ao close()
+        self.fallback_lock = threading.Lock()
+        self.metrics = {'enqueued': 0, 'written': 0, 'batches': 0, 'direct_writes': 0,
+                        'truncated': 0, 'write_errors': 0, 'write_retries': 0, 'fallback_rows': 0,
+                        'replayed_rows': 0, 'lost_rows': 0}
+        self.metrics_lock = threading.Lock()
+        self.thread = threading.Thread(target=self._loop, name='log-sink', daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    # ========== PRODUTOR ==========
+
+    def put(self, automation_id, level, message):
+        """Enfileira uma linha de log (timestamp UTC do momento da chamada, como CURRENT_TIMESTAMP)"""
+        row = (automation_id, level, message, time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime()))
+        # Sob o lock: close() não marca stopping entre a checagem e o put, então
+        # nenhuma linha entra no buffer depois que ele foi drenado
+        with self.put_lock:
+            if not self.stopping.is_set():
+                try:
+                    self.buffer.put(row, timeout=self.put_timeout)
+                    self._count('enqueued')
+                    return
+                except queue.Full:
+                    logging.warning(f"⚠️ Buffer de logs cheio ({self.buffer.maxsize}) - gravando direto")
+        # Buffer cheio ou sink encerrado: grava no chamador para não perder a linha
+        self._write([row])
+        self._count('direct_writes')
+
+    def flush(self):
+        """Bloqueia até todas as linhas enfileiradas serem gravadas"""
+        self.buffer.join()
+
+    # ========== THREAD DE ESCRITA ==========
+
+    def _loop(self):
+        self._replay_fallback()
+        while True:
+            try:
+                first = self.buffer.get(timeout=self.flush_interval)
+            except queue.Empty:
+                if self.stopping.is_set():
+                    return
+                continue
+
+            batch = [first]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if self.stopping.is_set():
+                    remaining = 0  # encerrando: só drena o que já está no buffer
+                try:
+                    batch.append(self.buffer.get(timeout=remaining) if remaining > 0 else self.buffer.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                self._write(batch)
+            finally:
+                for _ in batch:
+                    self.buffer.task_done()
+
+    def _write(self, rows):
+        compacted = []
+        truncated = 0
+        for automation_id, level, message, timestamp in rows:
+            message, was_truncated = compact_message(automation_id, message)
+            truncated += was_truncated
+            compacted.append((automation_id, level, message, timestamp))
+        for attempt in range(self.retries + 1):
+            try:
+                self.write_batch(compacted)
+                break
+            except Exception as e:
+                self._count('write_errors')
+                if attempt == self.retries:
+                    logging.error(f"❌ Erro ao gravar {len(rows)} logs de automação após "
+                                  f"{attempt + 1} tentativas: {e} - gravando em {self.fallback_file}")
+                    self._write_fallback(compacted)
+                    return
+                self._count('write_retries')
+                time.sleep(self.retry_backoff * (2 ** attempt))
+        with self.metrics_lock:
+            self.metrics['written'] += len(rows)
+            self.metrics['batches'] += 1
+            self.metrics['truncated'] += truncated
+
+    # ========== ARQUIVO DE CONTINGÊNCIA ==========
+
+    def _write_fallback(self, rows):
+        """Anexa as linhas que o banco recusou no arquivo de contingência"""
+        try:
+            with self.fallback_lock:
+                directory = os.path.dirname(self.fallback_file)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                with open(self.fallback_file, 'a', encoding='utf-8') as f:
+                    for row in rows:
+                        f.write(json.dumps(list(row), ensure_ascii=False) + '\n')
+        except Exception as e:
+            with self.metrics_lock:
+                self.metrics['lost_rows'] += len(rows)
+            logging.error(f"❌ {len(rows)} logs de automação perdidos (contingência indisponível): {e}")
+            return
+        with self.metrics_lock:
+            self.metrics['fallback_rows'] += len(rows)
+
+    def _replay_fallback(self):
+        """Regrava no banco as linhas do arquivo de contingência de execuções anteriores"""
+        replay_path = f"{self.fallback_file}.replay"
+        try:
+            with self.fallback_lock:
+                if not os.path.exists(replay_path):
+                    if not os.path.exists(self.fallback_file):
+                        return
+                    os.replace(self.fallback_file, replay_path)
+            with open(replay_path, 'r', encoding='utf-8') as f:
+                rows = [tuple(json.loads(line)) for line in f if line.strip()]
+        except Exception as e:
+            logging.warning(f"⚠️ Erro ao ler logs de contingência ({self.fallback_file}): {e}")
+            return
+
+        for start in range(0, len(rows), self.batch_size):
+            # Falha aqui devolve o lote para o arquivo de contingência
+            self._write(rows[start:start + self.batch_size])
+        os.remove(replay_path)
+        with self.metrics_lock:
+            self.metrics['replayed_rows'] += len(rows)
+        if rows:
+            logging.info(f"📝 {len(rows)} logs de contingência regravados no banco")
+
+    def _count(self, key):
+        with self.metrics_lock:
+            self.metrics[key] += 1
+
+    # ========== ENCERRAMENTO ==========
+
+    def close(self, timeout=30):
+        """Para de aceitar no buffer e grava tudo que falta"""
+        with self.put_lock:
+            if self.stopping.is_set():
+                return
+            # Daqui em diante put() grava direto: o buffer só pode diminuir
+            self.stopping.set()
+        self.thread.join(timeout)
+        # Linhas que entraram no buffer depois da última leitura da thread
+        while not self.thread.is_alive():
+            leftovers = []
+            while len(leftovers) < self.batch_size:
+                try:
+                    leftovers.append(self.buffer.get_nowait())
+                    self.buffer.task_done()
+                except queue.Empty:
+                    break
+            if not leftovers:
+                break
+            self._write(leftovers)
+        if self.thread.is_alive():
+            logging.warning(f"⚠️ Sink de logs não terminou em {timeout}s ({self.buffer.qsize()} linhas pendentes)")
+
+    def get_metrics(self):
+        with self.metrics_lock:
+            metrics = dict(self.metrics)
+        metrics['buffered'] = self.buffer.qsize()
+        return metrics
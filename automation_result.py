@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+📊 AUTOMATION RESULT - RESULTADO ESTRUTURADO DE UM JOB
+=====================================================
+Objeto retornado por HikCentralFormTest.run() e HikCentralReactivator.run()
+quando usados como biblioteca, no lugar de código de saída + stdout.
+"""
+
+import time
+from datetime import datetime
+
+# Erro do resultado quando o servidor perde o lease do job no meio da automação
+LEASE_LOST_ERROR = 'Lease perdido: job devolvido à fila para outro worker'
+
+
+class AutomationResult:
+    """Resultado de um cadastro/reativação com tempos por etapa"""
+
+    def __init__(self, visitor_id, action='create'):
+        self.visitor_id = visitor_id
+        self.action = action
+        self.success = False
+        self.error = None
+        self.failed_step = None
+        self.steps = []
+        self.details = {}  # Informações extras por job (ex.: relatório de esperas)
+        self.started_at = datetime.now()
+        self.finished_at = None
+        self._start = time.perf_counter()
+        self._end = None
+
+    def record(self, name, seconds, ok=True, detail=None):
+        """Registra uma etapa já medida"""
+        step = {'name': name, 'seconds': round(seconds, 3), 'ok': ok}
+        if detail:
+            step['detail'] = detail
+        self.steps.append(step)
+        if not ok and self.failed_step is None:
+            self.failed_step = name
+        return step
+
+    def timed(self, name, func, *args, **kwargs):
+        """Executa uma etapa medindo o tempo; retorno False marca falha"""
+        start = time.perf_counter()
+        try:
+            value = func(*args, **kwargs)
+        except Exception as e:
+            self.record(name, time.perf_counter() - start, ok=False, detail=str(e))
+            raise
+        # Etapas que não retornam nada (None) são consideradas concluídas
+        self.record(name, time.perf_counter() - start, ok=value is not False)
+        return value
+
+    def finish(self, success, error=None):
+        """Fecha o resultado e devolve a própria instância"""
+        self.success = bool(success)
+        if error and not self.error:
+            self.error = str(error)
+        self.finished_at = datetime.now()
+        self._end = time.perf_counter()
+        return self
+
+    @property
+    def duration(self):
+        end = self._end if self._end is not None else time.perf_counter()
+        return end - self._start
+
+    def step_timings(self):
+        """Tempo total por nome de etapa (em segundos)"""
+        timings = {}
+        for step in self.steps:
+            timings[step['name']] = round(timings.get(step['name'], 0) + step['seconds'], 3)
+        return timings
+
+    def to_dict(self):
+        return {
+            'visitor_id': self.visitor_id,
+            'action': self.action,
+            'success': self.success,
+            'error': self.error,
+            'failed_step': self.failed_step,
+            'duration_seconds': round(self.duration, 3),
+            'started_at': self.started_at.isoformat(),
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'steps': list(self.steps),
+            'details': dict(self.details)
+        }
+
+    def summary(self):
+        """Linha curta para logs"""
+        status = 'OK' if self.success else f'FALHA em {self.failed_step or "?"}'
+        timings = ', '.join(f"{name}={seconds:.1f}s" for name, seconds in self.step_timings().items())
+        return f"{self.action} {self.visitor_id}: {status} em {self.duration:.1f}s ({timings})"
+
+    def __repr__(self):
+        return f"<AutomationResult {self.summary()}>"
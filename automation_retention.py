@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧹 AUTOMATION RETENTION - RETENÇÃO E COMPACTAÇÃO DO automation.db
+================================================================
+Nada era apagado de automations, automation_logs e visitor_photos, então o
+banco crescia sem limite e get_pending/estatísticas ficavam mais lentos.
+
+Uma vez por RETENTION_INTERVAL_HOURS o job:
+- arquiva automações concluídas/falhas mais antigas que o TTL em arquivos
+  mensais comprimidos (archive/automations_AAAA-MM.jsonl.gz, pelo created_at)
+- apaga em lotes pequenos (RETENTION_BATCH_SIZE linhas por transação, com
+  pausa entre lotes) para não segurar o lock de escrita dos workers
+- roda incremental_vacuum e checkpoint do WAL e informa o espaço recuperado
+
+A primeira execução agendada acontece RETENTION_START_DELAY_MINUTES depois
+do boot (padrão: um intervalo), não junto com a subida do servidor. A
+conversão de um banco antigo para auto_vacuum=INCREMENTAL exige um VACUUM
+completo, que trava o banco: ela só roda dentro da janela de manutenção
+RETENTION_MAINTENANCE_WINDOW (ex. "02-05", horário local) ou pela linha de
+comando com --full-vacuum; fora disso o job só faz o checkpoint do WAL.
+
+Automações pending/processing nunca são apagadas. TTL 0 desativa a política.
+Os arquivos de foto continuam sendo do PhotoManager; aqui só saem os
+registros antigos de visitor_photos.
+
+Uso manual:
+    python automation_retention.py --dry-run
+    python automation_retention.py
+    python automation_retention.py --full-vacuum   # conversão única, com o servidor parado
+"""
+
+import os
+import sys
+import gzip
+import json
+import time
+import logging
+import argparse
+import threading
+
+RETENTION_COMPLETED_DAYS = int(os.getenv('RETENTION_COMPLETED_DAYS', '30'))
+RETENTION_FAILED_DAYS = int(os.getenv('RETENTION_FAILED_DAYS', '90'))
+RETENTION_LOG_DAYS = int(os.getenv('RETENTION_LOG_DAYS', '30'))
+RETENTION_PHOTO_DAYS = int(os.getenv('RETENTION_PHOTO_DAYS', '180'))
+RETENTION_BATCH_SIZE = int(os.getenv('RETENTION_BATCH_SIZE', '500'))
+RETENTION_BATCH_PAUSE = float(os.getenv('RETENTION_BATCH_PAUSE', '0.05'))
+RETENTION_INTERVAL_HOURS = float(os.getenv('RETENTION_INTERVAL_HOURS', '24'))
+RETENTION_ARCHIVE_DIR = os.getenv('RETENTION_ARCHIVE_DIR', 'archive')
+RETENTION_START_DELAY_MINUTES = os.getenv('RETENTION_START_DELAY_MINUTES')  # vazio: um intervalo
+RETENTION_MAINTENANCE_WINDOW = os.getenv('RETENTION_MAINTENANCE_WINDOW', '')  # "HH-HH"; vazio: nunca automático
+
+
+def in_maintenance_window(window=RETENTION_MAINTENANCE_WINDOW, now=None):
+    """A hora local está dentro da janela "HH-HH" (pode atravessar a meia-noite, ex. "23-04")?"""
+    if not window:
+        return False
+    try:
+        start, end = (int(hour) for hour in window.split('-'))
+    except ValueError:
+        logging.warning(f"⚠️ RETENTION_MAINTENANCE_WINDOW inválida: {window!r} (use HH-HH)")
+        return False
+    hour = (now or time.localtime()).tm_hour
+    if start <= end:
+        return start <= hour < end
+    return hour >= start or hour < end
+
+
+def default_policies():
+    """Políticas por tabela/status: (nome, tabela, coluna de data, filtro extra, TTL em dias, arquivar?)"""
+    return [
+        {'name': 'automations_completed', 'table': 'automations', 'date_column': 'COALESCE(completed_at, updated_at)',
+         'where': "status = 'completed'", 'days': RETENTION_COMPLETED_DAYS, 'archive': True},
+        {'name': 'automations_failed', 'table': 'automations', 'date_column': 'updated_at',
+         'where': "status = 'failed'", 'days': RETENTION_FAILED_DAYS, 'archive': True},
+        {'name': 'automation_logs', 'table': 'automation_logs', 'date_column': 'timestamp',
+         'where': '1 = 1', 'days': RETENTION_LOG_DAYS, 'archive': False},
+        {'name': 'visitor_photos', 'table': 'visitor_photos', 'date_column': 'created_at',
+         'where': '1 = 1', 'days': RETENTION_PHOTO_DAYS, 'archive': False},
+    ]
+
+
+class RetentionJob:
+    """Aplica as políticas de retenção no AutomationDatabase e compacta o arquivo"""
+
+    def __init__(self, db, policies=None, batch_size=RETENTION_BATCH_SIZE,
+                 batch_pause=RETENTION_BATCH_PAUSE, archive_dir=RETENTION_ARCHIVE_DIR,
+                 interval_hours=RETENTION_INTERVAL_HOURS, start_delay_minutes=RETENTION_START_DELAY_MINUTES,
+                 maintenance_window=RETENTION_MAINTENANCE_WINDOW):
+        self.db = db
+        self.policies = policies if policies is not None else default_policies()
+        self.batch_size = batch_size
+        self.batch_pause = batch_pause
+        self.archive_dir = archive_dir
+        self.interval = interval_hours * 3600
+        self.start_delay = self.interval if start_delay_minutes in (None, '') else float(start_delay_minutes) * 60
+        self.maintenance_window = maintenance_window
+        self.running = False
+        self.lock = threading.Lock()  # uma execução por vez (agendada ou manual)
+        self.last_report = None
+
+    # ========== AGENDAMENTO ==========
+
+    def start(self):
+        self.running = True
+        threading.Thread(target=self._loop, name='retention', daemon=True).start()
+        logging.info(f"🧹 Retenção agendada a cada {self.interval / 3600:g}h "
+                     f"(primeira execução em {self.start_delay / 60:g} min)")
+
+    def stop(self):
+        self.running = False
+
+    def _loop(self):
+        # Nada no boot: o servidor sobe e os workers começam sem disputar o banco
+        time.sleep(self.start_delay)
+        while self.running:
+            try:
+                self.run(full_vacuum=in_maintenance_window(self.maintenance_window))
+            except Exception as e:
+                logging.error(f"❌ Erro no job de retenção: {e}")
+            time.sleep(self.interval)
+
+    # ========== EXECUÇÃO ==========
+
+    def run(self, dry_run=False, full_vacuum=False):
+        """
+        Executa todas as políticas e a compactação.
+
+        Args:
+            full_vacuum: permite o VACUUM completo da conversão para
+                         auto_vacuum=INCREMENTAL (só em janela de manutenção)
+
+        Returns:
+            dict: linhas apagadas/arquivadas por política e bytes recuperados
+        """
+        with self.lock:
+            started = time.monotonic()
+            size_before = self._database_bytes()
+            report = {'policies': {}, 'dry_run': dry_run}
+
+            for policy in self.policies:
+                if policy['days'] <= 0:
+                    continue
+                if dry_run:
+                    report['policies'][policy['name']] = {'eligible': self._count(policy)}
+                else:
+                    report['policies'][policy['name']] = self._apply(policy)
+
+            if not dry_run:
+                self.db.refresh_stats()  # automações apagadas saem do snapshot
+                report['vacuum'] = self._compact(full_vacuum)
+
+            size_after = self._database_bytes()
+            report.update({
+                'bytes_before': size_before,
+                'bytes_after': size_after,
+                'bytes_reclaimed': max(0, size_before - size_after),
+                'seconds': round(time.monotonic() - started, 2),
+                'finished_at': time.strftime('%Y-%m-%d %H:%M:%S')
+            })
+            self.last_report = report
+
+        deleted = sum(p.get('deleted', 0) for p in report['policies'].values())
+        logging.info(f"🧹 Retenção{' (simulação)' if dry_run else ''}: {deleted} linhas apagadas, "
+                     f"{report['bytes_reclaimed'] / (1024 * 1024):.1f} MB recuperados em {report['seconds']}s")
+        return report
+
+    def _cutoff(self, policy):
+        return f"datetime('now', '-{int(policy['days'])} days')"
+
+    def _count(self, policy):
+        with self.db.pool.connection() as conn:
+            return conn.execute(f'''
+                SELECT COUNT(*) FROM {policy['table']}
+                WHERE {policy['where']} AND {policy['date_column']} < {self._cutoff(policy)}
+            ''').fetchone()[0]
+
+    def _apply(self, policy):
+        """Arquiva (se configurado) e apaga em lotes de batch_size linhas"""
+        deleted = archived = 0
+        while True:
+            with self.db.pool.connection() as conn:
+                with conn:
+                    cursor = conn.execute(f'''
+                        SELECT rowid, * FROM {policy['table']}
+                        WHERE {policy['where']} AND {policy['date_column']} < {self._cutoff(policy)}
+                        LIMIT ?
+                    ''', (self.batch_size,))
+                    columns = [d[0] for d in cursor.description]
+                    rows = cursor.fetchall()
+                    if not rows:
+                        break
+                    if policy['archive']:
+                        # Arquivo gravado antes do DELETE: se falhar, a transação não apaga nada
+                        archived += self._archive(policy['table'], columns, rows)
+                    rowids = [row[0] for row in rows]
+                    conn.execute(
+                        f"DELETE FROM {policy['table']} WHERE rowid IN ({','.join('?' * len(rowids))})",
+                        rowids
+                    )
+                    deleted += len(rowids)
+            if len(rows) < self.batch_size:
+                break
+            time.sleep(self.batch_pause)  # deixa os workers gravarem entre os lotes
+        return {'deleted': deleted, 'archived': archived}
+
+    def _archive(self, table, columns, rows):
+        """Anexa as linhas (JSON por linha) no arquivo gzip do mês de criação"""
+        os.makedirs(self.archive_dir, exist_ok=True)
+        by_month = {}
+        for row in rows:
+            record = dict(zip(columns[1:], row[1:]))  # sem a rowid
+            month = str(record.get('created_at') or '')[:7] or 'unknown'
+            by_month.setdefault(month, []).append(record)
+
+        for month, records in by_month.items():
+            path = os.path.join(self.archive_dir, f"{table}_{month}.jsonl.gz")
+            # Modo append gera um gzip multi-membro, lido normalmente por gzip.open/zcat
+            with gzip.open(path, 'at', encoding='utf-8') as f:
+                for record in records:
+                    f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        return len(rows)
+
+    # ========== COMPACTAÇÃO ==========
+
+    def _compact(self, full_vacuum=False):
+        """Devolve as páginas livres ao sistema de arquivos"""
+        with self.db.pool.connection() as conn:
+            free_before = conn.execute('PRAGMA freelist_count').fetchone()[0]
+            auto_vacuum = conn.execute('PRAGMA auto_vacuum').fetchone()[0]
+            if auto_vacuum == 2:  # INCREMENTAL
+                # executescript roda o PRAGMA até o fim (execute liberaria só uma página por passo)
+                conn.executescript('PRAGMA incremental_vacuum;')
+                mode = 'incremental'
+            elif not full_vacuum:
+                # Banco criado antes do auto_vacuum: conversão fica para a janela de manutenção
+                logging.info("🧹 automation.db sem auto_vacuum=INCREMENTAL - VACUUM completo adiado "
+                             "para a janela de manutenção (ou --full-vacuum)")
+                mode = 'pending_full_vacuum'
+            else:
+                # Banco criado antes do auto_vacuum: um VACUUM completo faz a conversão
+                logging.info("🧹 Convertendo automation.db para auto_vacuum=INCREMENTAL (VACUUM completo, uma vez)")
+                conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+                conn.execute('VACUUM')
+                mode = 'full'
+            conn.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchall()
+            free_after = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        return {'mode': mode, 'free_pages_before': free_before, 'free_pages_after': free_after}
+
+    def _database_bytes(self):
+        total = 0
+        for suffix in ('', '-wal'):
+            try:
+                total += os.path.getsize(self.db.db_path + suffix)
+            except OSError:
+                pass
+        return total
+
+    def get_metrics(self):
+        return {
+            'interval_hours': self.interval / 3600,
+            'maintenance_window': self.maintenance_window or None,
+            'ttl_days': {p['name']: p['days'] for p in self.policies},
+            'last_report': self.last_report
+        }
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='Retenção e compactação do automation.db')
+    parser.add_argument('--db', default='automation.db')
+    parser.add_argument('--dry-run', action='store_true', help='Só conta as linhas elegíveis')
+    parser.add_argument('--full-vacuum', action='store_true',
+                        help='Permite o VACUUM completo da conversão para auto_vacuum=INCREMENTAL')
+    args = parser.parse_args()
+
+    from automation_database import AutomationDatabase
+    database = AutomationDatabase(args.db)
+    try:
+        print(json.dumps(RetentionJob(database).run(dry_run=args.dry_run, full_vacuum=args.full_vacuum), indent=2, ensure_ascii=False))
+    finally:
+        database.close()
+    sys.exit(0)
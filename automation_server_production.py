@@ -16,16 +16,21 @@ import sys
 import json
 import time
 import queue
-import sqlite3
 import logging
 import threading
 import subprocess
 from datetime import datetime, timedelta
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context
 from functools import wraps
 
 # Importar gerenciador de fotos
-from photo_manager import PhotoManager, save_visitor_photo
+from photo_manager import PhotoManager, save_visitor_photo, save_visitor_photo_from_storage
+from selector_cache import selector_cache
+from hikcentral_routes import route_cache
+from worker_autoscaler import WorkerAutoscaler, MIN_WORKERS, MAX_WORKERS
+from automation_database import AutomationDatabase, RETRY_ATTEMPTS, HISTORY_PAGE_SIZE, HISTORY_MAX_PAGE_SIZE, encode_cursor
+from automation_retention import RetentionJob
+from priority_job_queue import PriorityJobQueue, job_priority
 
 # Configurar logging - Criar diretórios necessários
 import os
@@ -44,259 +49,70 @@ logging.basicConfig(
 
 # Configurações
 API_KEY = os.getenv('API_KEY', 'hik_automation_2024_secure_key')
-MAX_WORKERS = 3
-RETRY_ATTEMPTS = 3
 SCRIPT_PATH = './test_hikcentral_final_windows.py' if os.name == 'nt' else './test_real_hikcentral_automated.py'
+USE_SESSION_POOL = os.getenv('USE_SESSION_POOL', 'true').lower() == 'true'
+LEASE_REAP_INTERVAL = int(os.getenv('LEASE_REAP_INTERVAL', '30'))
 
 # Flask app
 app = Flask(__name__)
 
 # Fila global e lock
-automation_queue = queue.Queue()
+# Fila por prioridade (com envelhecimento), mesma interface do queue.Queue
+automation_queue = PriorityJobQueue()
 automation_lock = threading.Lock()
 
-class AutomationDatabase:
-    """Gerenciador de banco de dados para automações"""
-    
-    def __init__(self, db_path='automation.db'):
-        self.db_path = db_path
-        self.init_database()
-    
-    def init_database(self):
-        """Inicializa o banco de dados"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS automations (
-                id TEXT PRIMARY KEY,
-                visitor_data TEXT NOT NULL,
-                status TEXT DEFAULT 'pending',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                retry_count INTEGER DEFAULT 0,
-                error_message TEXT,
-                worker_id INTEGER,
-                completed_at TIMESTAMP,
-                photo_path TEXT,
-                has_photo BOOLEAN DEFAULT 0
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS automation_logs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                automation_id TEXT,
-                level TEXT,
-                message TEXT,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (automation_id) REFERENCES automations (id)
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS visitor_photos (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                visitor_id TEXT NOT NULL,
-                photo_path TEXT NOT NULL,
-                file_size INTEGER,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                metadata TEXT
-            )
-        ''')
-        
-        conn.commit()
-        conn.close()
-        logging.info("✅ Banco de dados inicializado")
-    
-    def add_automation(self, visitor_id, visitor_data, photo_path=None):
-        """Adiciona nova automação com suporte a foto"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        has_photo = 1 if photo_path else 0
-        
-        cursor.execute('''
-            INSERT OR REPLACE INTO automations 
-            (id, visitor_data, status, created_at, updated_at, photo_path, has_photo)
-            VALUES (?, ?, 'pending', CURRENT_TIMESTAMP, CURRENT_TIMESTAMP, ?, ?)
-        ''', (visitor_id, json.dumps(visitor_data), photo_path, has_photo))
-        
-        conn.commit()
-        conn.close()
-        logging.info(f"✅ Automação {visitor_id} adicionada ao banco (foto: {'sim' if has_photo else 'não'})")
-    
-    def save_visitor_photo_record(self, visitor_id, photo_path, file_size, metadata=None):
-        """Salva registro da foto no banco"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO visitor_photos (visitor_id, photo_path, file_size, metadata)
-            VALUES (?, ?, ?, ?)
-        ''', (visitor_id, photo_path, file_size, json.dumps(metadata) if metadata else None))
-        
-        conn.commit()
-        conn.close()
-        logging.info(f"✅ Registro de foto salvo para {visitor_id}")
-    
-    def update_status(self, visitor_id, status, error=None, worker_id=None):
-        """Atualiza status da automação"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        if status == 'completed':
-            cursor.execute('''
-                UPDATE automations 
-                SET status = ?, updated_at = CURRENT_TIMESTAMP, 
-                    completed_at = CURRENT_TIMESTAMP, worker_id = ?
-                WHERE id = ?
-            ''', (status, worker_id, visitor_id))
-        else:
-            cursor.execute('''
-                UPDATE automations 
-                SET status = ?, error_message = ?, updated_at = CURRENT_TIMESTAMP,
-                    worker_id = ?
-                WHERE id = ?
-            ''', (status, error, worker_id, visitor_id))
-        
-        conn.commit()
-        conn.close()
-        logging.info(f"✅ Status atualizado para {visitor_id}: {status}")
-    
-    def increment_retry(self, visitor_id):
-        """Incrementa contador de retry"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            UPDATE automations 
-            SET retry_count = retry_count + 1, updated_at = CURRENT_TIMESTAMP
-            WHERE id = ?
-        ''', (visitor_id,))
-        
-        conn.commit()
-        conn.close()
-    
-    def get_pending(self):
-        """Recupera automações pendentes"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT id, visitor_data, retry_count 
-            FROM automations 
-            WHERE status IN ('pending', 'processing') 
-            AND retry_count < ?
-            ORDER BY created_at ASC
-        ''', (RETRY_ATTEMPTS,))
-        
-        results = []
-        for row in cursor.fetchall():
-            results.append({
-                'visitor_id': row[0],
-                'visitor_data': json.loads(row[1]),
-                'retry_count': row[2]
-            })
-        
-        conn.close()
-        return results
-    
-    def get_status(self, visitor_id):
-        """Obtém status de uma automação"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT status, created_at, updated_at, retry_count, 
-                   error_message, worker_id, completed_at
-            FROM automations WHERE id = ?
-        ''', (visitor_id,))
-        
-        result = cursor.fetchone()
-        conn.close()
-        
-        if result:
-            return {
-                'status': result[0],
-                'created_at': result[1],
-                'updated_at': result[2],
-                'retry_count': result[3],
-                'error_message': result[4],
-                'worker_id': result[5],
-                'completed_at': result[6]
-            }
-        return None
-    
-    def add_log(self, automation_id, level, message):
-        """Adiciona log para uma automação"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO automation_logs (automation_id, level, message)
-            VALUES (?, ?, ?)
-        ''', (automation_id, level, message))
-        
-        conn.commit()
-        conn.close()
-    
-    def get_stats(self):
-        """Retorna estatísticas gerais"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT COUNT(*) FROM automations WHERE status = "pending"')
-        pending = cursor.fetchone()[0]
-        
-        cursor.execute('SELECT COUNT(*) FROM automations WHERE status = "processing"')
-        processing = cursor.fetchone()[0]
-        
-        cursor.execute('SELECT COUNT(*) FROM automations WHERE status = "completed"')
-        completed = cursor.fetchone()[0]
-        
-        cursor.execute('SELECT COUNT(*) FROM automations WHERE status = "failed"')
-        failed = cursor.fetchone()[0]
-        
-        cursor.execute('''
-            SELECT COUNT(*) FROM automations 
-            WHERE created_at >= datetime('now', '-24 hours')
-        ''')
-        last_24h = cursor.fetchone()[0]
-        
-        conn.close()
-        
-        return {
-            'pending': pending,
-            'processing': processing,
-            'completed': completed,
-            'failed': failed,
-            'last_24h': last_24h,
-            'total': pending + processing + completed + failed
-        }
-
 class AutomationQueueManager:
     """Gerenciador avançado de fila com recuperação automática"""
     
-    def __init__(self, max_workers=MAX_WORKERS):
+    def __init__(self, max_workers=MAX_WORKERS, min_workers=MIN_WORKERS):
         self.max_workers = max_workers
-        self.workers = []
+        self.workers = {}
         self.running = True
         self.db = AutomationDatabase()
+        self.retention = RetentionJob(self.db)
+        self.retention.start()
         self.active_automations = {}
+        self.coalesced_submissions = 0
         self.photo_manager = PhotoManager()
+        self.session_pool = None
+        
+        # Sessões Chrome quentes (uma por worker) em vez de subprocesso por visitante
+        if USE_SESSION_POOL:
+            try:
+                from chrome_session_pool import ChromeSessionPool
+                # Vagas do pool acompanham os workers do autoscaler (começa pelo mínimo)
+                self.session_pool = ChromeSessionPool(size=0)
+            except Exception as e:
+                logging.error(f"❌ Pool de sessões indisponível, usando subprocesso: {e}")
+                self.session_pool = None
+        
+        # Workers sobem/descem conforme fila e folga de CPU/RAM
+        self.autoscaler = WorkerAutoscaler(
+            spawn=self.spawn_worker,
+            # Profundidade real é o 'pending' do banco (snapshot em memória, O(1))
+            queue_depth=lambda: max(automation_queue.qsize(), self.db.get_stats()['pending']),
+            busy_count=self.busy_workers,
+            on_retire=self.retire_worker,
+            min_workers=min_workers,
+            max_workers=max_workers
+        )
         
         # Recuperar pendências após reinicialização
         self.recover_pending_automations()
         
+        # Reaper: devolve à fila só jobs com lease vencido
+        threading.Thread(target=self.lease_reaper, name='lease-reaper', daemon=True).start()
+        
         # Iniciar workers
         self.start_workers()
         
-        logging.info(f"✅ AutomationQueueManager iniciado com {max_workers} workers")
+        logging.info(f"✅ AutomationQueueManager iniciado com {min_workers}-{max_workers} workers (autoscaling)")
     
     def recover_pending_automations(self):
         """Recupera automações pendentes após reinicialização"""
         try:
+            # Jobs 'processing' ficam com o dono do lease (outra instância pode estar rodando);
+            # os de um processo morto voltam pelo reaper quando o lease vencer
             pending = self.db.get_pending()
             logging.info(f"🔄 Recuperando {len(pending)} automações pendentes")
             
@@ -304,38 +120,89 @@ class AutomationQueueManager:
                 automation_queue.put({
                     'visitor_id': item['visitor_id'],
                     'visitor_data': item['visitor_data'],
-                    'retry': True
+                    'priority': job_priority(item['visitor_data']),
+                    # Reiniciar não é tentativa: retry_count só sobe no lease vencido (reaper)
+                    'retry': False
                 })
                 logging.info(f"✅ Automação {item['visitor_id']} re-adicionada à fila")
                 
         except Exception as e:
             logging.error(f"❌ Erro ao recuperar automações pendentes: {e}")
     
+    def lease_reaper(self):
+        """Re-enfileira jobs cujo lease venceu (worker travado ou processo que morreu)"""
+        while self.running:
+            try:
+                for item in self.db.reap_expired_leases():
+                    automation_queue.put({
+                        'visitor_id': item['visitor_id'],
+                        'visitor_data': item['visitor_data'],
+                        'priority': job_priority(item['visitor_data']),
+                        'retry': False  # o reaper já contou a tentativa em retry_count
+                    })
+                    logging.info(f"♻️ Automação {item['visitor_id']} re-adicionada à fila (lease vencido)")
+                # Outras instâncias também mudam status no banco: reconciliar o snapshot
+                self.db.refresh_stats()
+            except Exception as e:
+                logging.error(f"❌ Erro no reaper de leases: {e}")
+            time.sleep(LEASE_REAP_INTERVAL)
+    
     def start_workers(self):
-        """Inicia workers de processamento"""
-        for i in range(self.max_workers):
-            worker = threading.Thread(target=self.worker_process, args=(i,))
-            worker.daemon = True
-            worker.start()
-            self.workers.append(worker)
-            logging.info(f"✅ Worker {i} iniciado")
+        """Inicia o autoscaler, que sobe o mínimo de workers e ajusta conforme a demanda"""
+        self.autoscaler.start()
+    
+    def spawn_worker(self, worker_id):
+        """Inicia a thread de um worker (chamado pelo autoscaler)"""
+        if self.session_pool:
+            self.session_pool.add_slot(worker_id)
+        worker = threading.Thread(target=self.worker_process, args=(worker_id,))
+        worker.daemon = True
+        worker.start()
+        self.workers[worker_id] = worker
+        logging.info(f"✅ Worker {worker_id} iniciado")
+    
+    def retire_worker(self, worker_id):
+        """Worker encerrado pelo autoscaler: libera a sessão Chrome dele"""
+        self.workers.pop(worker_id, None)
+        if self.session_pool:
+            self.session_pool.remove_slot(worker_id)
+    
+    def busy_workers(self):
+        """Workers processando um visitante agora"""
+        with automation_lock:
+            return sum(1 for a in self.active_automations.values() if a['status'] == 'processing')
     
     def worker_process(self, worker_id):
         """Processo principal do worker"""
         logging.info(f"🚀 Worker {worker_id} ativo")
         
         while self.running:
+            # Escala para baixo: sai só entre um job e outro
+            if self.autoscaler.should_retire(worker_id):
+                break
             try:
-                # Aguardar item na fila
+                # A fila em memória é só cache: o job já está gravado como 'pending' no banco
                 try:
                     item = automation_queue.get(timeout=5)
+                    from_cache = True
                 except queue.Empty:
-                    continue
+                    # Cache vazio: pegar direto do banco pendências que não passaram por ele
+                    # (envio de outra instância, processo reiniciado entre a gravação e o put)
+                    item = self.db.claim_next(worker_id)
+                    if not item:
+                        continue
+                    from_cache = False
                 
                 visitor_id = item['visitor_id']
                 visitor_data = item['visitor_data']
                 is_retry = item.get('retry', False)
                 
+                # Claim atômico: entrada repetida na fila (recuperação, reenvio) não processa duas vezes
+                if from_cache and not self.db.claim(visitor_id, worker_id, retry=is_retry):
+                    logging.warning(f"⏭️ Worker {worker_id} - visitante {visitor_id} já processado ou em outro worker, ignorando")
+                    automation_queue.task_done()
+                    continue
+                
                 logging.info(f"🔄 Worker {worker_id} processando visitante {visitor_id}")
                 
                 # Registrar como ativo
@@ -346,27 +213,26 @@ class AutomationQueueManager:
                         'start_time': datetime.now().isoformat()
                     }
                 
-                # Atualizar banco
-                if not is_retry:
-                    self.db.add_automation(visitor_id, visitor_data)
-                else:
-                    self.db.increment_retry(visitor_id)
-                
-                self.db.update_status(visitor_id, 'processing', worker_id=worker_id)
-                
-                # Executar automação
-                success = self.execute_automation(visitor_id, visitor_data, worker_id)
+                # Executar automação (heartbeat mantém o lease enquanto o cadastro roda;
+                # lost marcado = o reaper pode ter entregado o job a outro worker)
+                with self.db.lease(visitor_id, worker_id) as lost:
+                    success = self.execute_automation(visitor_id, visitor_data, worker_id, lease_lost=lost)
                 
-                # Atualizar resultado
+                # Atualizar resultado (complete/fail só valem se o lease ainda for deste worker)
                 with automation_lock:
-                    if success:
+                    if lost.is_set():
+                        self.active_automations[visitor_id]['status'] = 'lease_lost'
+                        self.db.add_log(visitor_id, 'WARNING', f'Lease perdido pelo worker {worker_id}; job abortado')
+                        logging.warning(f"⚠️ Worker {worker_id} - lease de {visitor_id} perdido; cadastro abortado, status fica com o reaper")
+                    elif success:
                         self.active_automations[visitor_id]['status'] = 'completed'
-                        self.db.update_status(visitor_id, 'completed', worker_id=worker_id)
+                        if not self.db.complete(visitor_id, worker_id):
+                            logging.warning(f"⚠️ Worker {worker_id} - lease de {visitor_id} venceu durante o job; status mantido pelo reaper")
                         self.db.add_log(visitor_id, 'INFO', 'Automação concluída com sucesso')
                         logging.info(f"✅ Worker {worker_id} - Visitante {visitor_id} cadastrado com sucesso")
                     else:
                         self.active_automations[visitor_id]['status'] = 'failed'
-                        self.db.update_status(visitor_id, 'failed', 'Erro na execução da automação', worker_id)
+                        self.db.fail(visitor_id, worker_id, 'Erro na execução da automação')
                         self.db.add_log(visitor_id, 'ERROR', 'Falha na execução da automação')
                         logging.error(f"❌ Worker {worker_id} - Falha no visitante {visitor_id}")
                 
@@ -374,16 +240,17 @@ class AutomationQueueManager:
                 threading.Timer(60.0, self.cleanup_active_automation, [visitor_id]).start()
                 
                 # Finalizar item da fila
-                automation_queue.task_done()
+                if from_cache:
+                    automation_queue.task_done()
                 
             except Exception as e:
                 logging.error(f"❌ Erro no worker {worker_id}: {e}")
                 if 'visitor_id' in locals():
-                    self.db.update_status(visitor_id, 'failed', str(e), worker_id)
+                    self.db.fail(visitor_id, worker_id, str(e))
                     self.db.add_log(visitor_id, 'ERROR', f'Erro crítico: {str(e)}')
     
-    def execute_automation(self, visitor_id, visitor_data, worker_id):
-        """Executa o script de automação com suporte a foto"""
+    def execute_automation(self, visitor_id, visitor_data, worker_id, lease_lost=None):
+        """Executa o script de automação com suporte a foto; para se lease_lost for marcado"""
         try:
             logging.info(f"🚀 Worker {worker_id} executando script para {visitor_id}")
             
@@ -397,16 +264,22 @@ class AutomationQueueManager:
             
             # Verificar se há foto para este visitante
             photo_path = None
-            if visitor_data.get('photo_base64'):
-                # Salvar foto temporária para a automação
+            if visitor_data.get('photo_key') or visitor_data.get('photo_base64'):
+                # Salvar foto temporária para a automação (Storage via cache local, ou base64 legado)
                 photo_path = self.photo_manager.save_photo_for_automation(
                     visitor_id, 
-                    visitor_data['photo_base64']
+                    visitor_data.get('photo_base64'),
+                    photo_key=visitor_data.get('photo_key'),
+                    photo_sha256=visitor_data.get('photo_sha256')
                 )
                 if photo_path:
                     script_data['photo_path'] = photo_path
                     logging.info(f"📸 Foto preparada para automação: {photo_path}")
             
+            # Executar dentro do processo com a sessão Chrome quente do worker
+            if self.session_pool:
+                return self.execute_in_pool(visitor_id, visitor_data, script_data, photo_path, worker_id, lease_lost)
+            
             # Salvar dados temporários (compatível Windows/Linux)
             import tempfile
             temp_file = os.path.join(tempfile.gettempdir(), f'visitor_data_{visitor_id}.json')
@@ -427,19 +300,15 @@ class AutomationQueueManager:
             logging.info(f"📁 Diretório atual: {os.getcwd()}")
             logging.info(f"📄 Script existe: {os.path.exists(SCRIPT_PATH)}")
             
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=300  # 5 minutos timeout
-            )
+            result = self.run_script(cmd, lease_lost, timeout=300)  # 5 minutos timeout
             
             # Log completo da saída
-            logging.info(f"📊 Código de retorno: {result.returncode}")
-            if result.stdout:
-                logging.info(f"📋 STDOUT do script:\n{result.stdout}")
-            if result.stderr:
-                logging.error(f"📋 STDERR do script:\n{result.stderr}")
+            if result is not None:
+                logging.info(f"📊 Código de retorno: {result.returncode}")
+                if result.stdout:
+                    logging.info(f"📋 STDOUT do script:\n{result.stdout}")
+                if result.stderr:
+                    logging.error(f"📋 STDERR do script:\n{result.stderr}")
             
             # Limpar arquivos temporários
             if os.path.exists(temp_file):
@@ -451,6 +320,10 @@ class AutomationQueueManager:
                 logging.info(f"🗑️ Foto temporária removida: {photo_path}")
             
             # Verificar resultado
+            if result is None:
+                logging.warning(f"⚠️ Lease de {visitor_id} perdido - script interrompido")
+                self.db.add_log(visitor_id, 'WARNING', 'Script interrompido: lease perdido')
+                return False
             if result.returncode == 0:
                 logging.info(f"✅ Script executado com sucesso para {visitor_id}")
                 self.db.add_log(visitor_id, 'INFO', f'Output: {result.stdout}')
@@ -469,20 +342,86 @@ class AutomationQueueManager:
             self.db.add_log(visitor_id, 'ERROR', f'Erro de execução: {str(e)}')
             return False
     
+    def run_script(self, cmd, lease_lost=None, timeout=300):
+        """
+        subprocess.run que também mata o script se o lease do job for perdido
+        (sem lease, outro worker pode estar cadastrando o mesmo visitante).
+
+        Returns:
+            subprocess.CompletedProcess | None: None se interrompido por lease perdido
+        """
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                stdout, stderr = process.communicate(timeout=1)
+                return subprocess.CompletedProcess(cmd, process.returncode, stdout, stderr)
+            except subprocess.TimeoutExpired:
+                if lease_lost is not None and lease_lost.is_set():
+                    process.kill()
+                    process.communicate()
+                    return None
+                if time.monotonic() >= deadline:
+                    process.kill()
+                    process.communicate()
+                    raise subprocess.TimeoutExpired(cmd, timeout)
+    
+    def execute_in_pool(self, visitor_id, visitor_data, script_data, photo_path, worker_id, lease_lost=None):
+        """Executa a automação na sessão Chrome já autenticada do worker"""
+        job_data = {k: v for k, v in visitor_data.items() if k != 'photo_base64'}
+        job_data.update(script_data)
+        
+        try:
+            # Backlog na fila: o worker deixa o formulário limpo para o próximo visitante
+            result = self.session_pool.run_job(
+                worker_id, visitor_id, job_data,
+                prepare_next=not automation_queue.empty(),
+                lease_lost=lease_lost
+            )
+        finally:
+            if photo_path and os.path.exists(photo_path):
+                os.remove(photo_path)
+                logging.info(f"🗑️ Foto temporária removida: {photo_path}")
+        
+        if result.success:
+            logging.info(f"✅ Automação em sessão quente concluída: {result.summary()}")
+            self.db.add_log(visitor_id, 'INFO', f'Resultado: {json.dumps(result.to_dict())}')
+        else:
+            logging.error(f"❌ Automação em sessão quente falhou: {result.summary()}")
+            self.db.add_log(visitor_id, 'ERROR', f'Resultado: {json.dumps(result.to_dict())}')
+        return result.success
+    
     def cleanup_active_automation(self, visitor_id):
         """Remove automação da lista ativa após completar"""
         with automation_lock:
             if visitor_id in self.active_automations:
                 del self.active_automations[visitor_id]
     
-    def add_to_queue(self, visitor_id, visitor_data):
-        """Adiciona automação à fila"""
+    def add_to_queue(self, visitor_id, visitor_data, priority=None):
+        """
+        Registra a automação como 'pending' e a coloca na fila. Envio repetido
+        (mesmo visitor_id ou CPF com job pendente/em andamento) não gera outro job.
+
+        Returns:
+            dict: handle do job {'visitor_id', 'status', 'coalesced'}
+        """
+        priority = job_priority(visitor_data, priority)
+        # Guardada no visitor_data para a recuperação/reaper re-enfileirarem com a mesma prioridade
+        visitor_data['priority'] = priority
+        handle = self.db.enqueue(visitor_id, visitor_data)
+        if handle['coalesced']:
+            with automation_lock:
+                self.coalesced_submissions += 1
+            return handle
+        
         automation_queue.put({
             'visitor_id': visitor_id,
             'visitor_data': visitor_data,
+            'priority': priority,
             'retry': False
         })
-        logging.info(f"➕ Visitante {visitor_id} adicionado à fila")
+        logging.info(f"➕ Visitante {visitor_id} adicionado à fila (prioridade {priority})")
+        return handle
     
     def get_status(self, visitor_id):
         """Obtém status completo de uma automação"""
@@ -511,10 +450,18 @@ class AutomationQueueManager:
         
         return {
             'queue_size': queue_size,
+            'queue_priorities': automation_queue.get_metrics(),
+            'coalesced_submissions': self.coalesced_submissions,
             'active_automations': active_count,
             'active_list': active_list,
             'max_workers': self.max_workers,
+            'workers': self.autoscaler.get_metrics(),
             'database_stats': db_stats,
+            'log_sink': self.db.log_sink.get_metrics(),
+            'retention': self.retention.get_metrics(),
+            'session_pool': self.session_pool.get_metrics() if self.session_pool else None,
+            'dead_selectors': selector_cache.dead_fallbacks(),
+            'navigation': route_cache.get_metrics(),
             'server_uptime': datetime.now().isoformat()
         }
 
@@ -575,18 +522,35 @@ def start_automation():
                     'error': f'Campo obrigatório ausente ou vazio: {field}'
                 }), 400
         
+        # Adicionar à fila (idempotente: envio repetido devolve o job existente)
+        handle = queue_manager.add_to_queue(visitor_id, visitor_data, data.get('priority'))
+        if handle['coalesced']:
+            return jsonify({
+                'success': True,
+                'message': f"Visitante já está na fila (job {handle['visitor_id']})",
+                'visitor_id': handle['visitor_id'],
+                'status': 'queued' if handle['status'] == 'pending' else handle['status'],
+                'coalesced': True,
+                'timestamp': datetime.now().isoformat()
+            })
+        
         # Processar foto se presente
         photo_saved = False
-        if 'photo_base64' in visitor_data and visitor_data['photo_base64']:
+        if visitor_data.get('photo_key') or visitor_data.get('photo_base64'):
             try:
-                photo_result = save_visitor_photo(
-                    visitor_id, 
-                    visitor_data['photo_base64'],
-                    {
-                        'name': visitor_data.get('name'),
-                        'timestamp': datetime.now().isoformat()
-                    }
-                )
+                photo_metadata = {
+                    'name': visitor_data.get('name'),
+                    'timestamp': datetime.now().isoformat()
+                }
+                if visitor_data.get('photo_key'):
+                    photo_result = save_visitor_photo_from_storage(
+                        visitor_id,
+                        visitor_data['photo_key'],
+                        visitor_data.get('photo_sha256'),
+                        photo_metadata
+                    )
+                else:
+                    photo_result = save_visitor_photo(visitor_id, visitor_data['photo_base64'], photo_metadata)
                 
                 if photo_result['success']:
                     photo_saved = True
@@ -604,14 +568,12 @@ def start_automation():
             except Exception as e:
                 logging.error(f"❌ Erro ao processar foto para {visitor_id}: {e}")
         
-        # Adicionar à fila
-        queue_manager.add_to_queue(visitor_id, visitor_data)
-        
         return jsonify({
             'success': True,
             'message': f'Automação iniciada para visitante {visitor_id}',
             'visitor_id': visitor_id,
             'status': 'queued',
+            'coalesced': False,
             'photo_received': photo_saved,
             'timestamp': datetime.now().isoformat()
         })
@@ -652,6 +614,46 @@ def get_automation_status(visitor_id):
             'error': str(e)
         }), 500
 
+@app.route('/api/hikcentral/history', methods=['GET'])
+@require_api_key
+def get_automation_history():
+    """
+    Histórico de automações (mais recentes primeiro) com paginação por cursor.
+    
+    Query: status, worker_id, since, until (ISO, UTC), limit (máx. 500), cursor
+    (next_cursor da página anterior). A página é lida do banco de uma vez (conexão
+    devolvida ao pool) e a resposta é transmitida linha a linha.
+    """
+    try:
+        limit = max(1, min(int(request.args.get('limit', HISTORY_PAGE_SIZE)), HISTORY_MAX_PAGE_SIZE))
+        rows = queue_manager.db.get_history(
+            status=request.args.get('status'),
+            worker_id=request.args.get('worker_id'),
+            since=request.args.get('since'),
+            until=request.args.get('until'),
+            cursor=request.args.get('cursor'),
+            limit=limit
+        )
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    
+    def generate():
+        yield '{"success": true, "items": ['
+        count = 0
+        last = None
+        has_more = len(rows) > limit  # linha extra: só indica que há próxima página
+        for row in rows[:limit]:
+            yield (',' if count else '') + json.dumps(row, ensure_ascii=False)
+            count += 1
+            last = row
+        next_cursor = encode_cursor(last['created_at'], last['visitor_id']) if has_more else None
+        yield f'], "count": {count}, "next_cursor": {json.dumps(next_cursor)}}}'
+    
+    return Response(stream_with_context(generate()), mimetype='application/json')
+
 @app.route('/api/hikcentral/stats', methods=['GET'])
 @require_api_key
 def get_stats():
@@ -684,7 +686,7 @@ def get_queue_info():
             'queue_info': {
                 'pending_in_queue': stats['queue_size'],
                 'currently_processing': stats['active_automations'],
-                'active_workers': stats['max_workers'],
+                'active_workers': len(stats['workers']['alive']),
                 'processing_list': stats['active_list']
             },
             'timestamp': datetime.now().isoformat()
@@ -705,18 +707,26 @@ def upload_visitor_photo(visitor_id):
     try:
         data = request.get_json()
         
-        if not data or 'photo_base64' not in data:
+        if not data or not ('photo_base64' in data or ('photo_key' in data and 'photo_sha256' in data)):
             return jsonify({
                 'success': False,
-                'error': 'photo_base64 é obrigatório'
+                'error': 'photo_base64 (ou photo_key e photo_sha256) é obrigatório'
             }), 400
         
-        # Salvar foto
-        result = save_visitor_photo(
-            visitor_id,
-            data['photo_base64'],
-            data.get('metadata', {})
-        )
+        # Salvar foto (do Storage quando vier a chave)
+        if 'photo_key' in data:
+            result = save_visitor_photo_from_storage(
+                visitor_id,
+                data['photo_key'],
+                data['photo_sha256'],
+                data.get('metadata', {})
+            )
+        else:
+            result = save_visitor_photo(
+                visitor_id,
+                data['photo_base64'],
+                data.get('metadata', {})
+            )
         
         if result['success']:
             # Salvar registro no banco
@@ -819,7 +829,7 @@ if __name__ == '__main__':
     os.makedirs('logs', exist_ok=True)
     
     logging.info("🚀 Iniciando servidor de automação HikCentral em modo produção")
-    logging.info(f"📊 Configuração: {MAX_WORKERS} workers, {RETRY_ATTEMPTS} tentativas máximas")
+    logging.info(f"📊 Configuração: {MIN_WORKERS}-{MAX_WORKERS} workers (autoscaling), {RETRY_ATTEMPTS} tentativas máximas")
     
     try:
         app.run(
@@ -834,4 +844,8 @@ if __name__ == '__main__':
     except Exception as e:
         logging.error(f"❌ Erro crítico no servidor: {e}")
     finally:
+        queue_manager.running = False
+        if queue_manager.session_pool:
+            queue_manager.session_pool.shutdown()
+        queue_manager.db.close()
         logging.info("🔒 Servidor finalizado") 
\ No newline at end of file
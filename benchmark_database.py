@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BENCHMARK - SQLITE CONEXÃO POR CHAMADA x POOL COM WAL
+Simula o servidor de automação sob carga: workers gravam o ciclo de um job
+(add_automation, processing, logs, completed) enquanto leitores consultam o
+status como o endpoint /api/visitante/<id>/status.
+
+- legado: sqlite3.connect + commit + close a cada método, journal padrão
+- novo:   automation_database.AutomationDatabase (pool + WAL, logs em lote)
+
+Uso:
+    python benchmark_database.py                          # 4 workers, 4 leitores, 5s
+    python benchmark_database.py --workers 8 --seconds 10
+"""
+
+import os
+import sys
+import time
+import sqlite3
+import argparse
+import tempfile
+import threading
+
+import logging
+logging.disable(logging.INFO)  # os métodos logam cada chamada; não medir o logging
+
+from automation_database import AutomationDatabase
+
+
+class LegacyDatabase(AutomationDatabase):
+    """Acesso anterior ao pool: uma conexão nova (journal padrão) por chamada"""
+
+    def __init__(self, db_path):
+        super().__init__(db_path, pool_size=1)  # cria as tabelas
+        self.pool.close_all()
+        conn = sqlite3.connect(db_path)
+        conn.execute("PRAGMA journal_mode=DELETE")  # volta ao journal padrão
+        conn.close()
+
+    def _execute(self, sql, params=()):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            cursor = conn.cursor()
+            cursor.execute(sql, params)
+            conn.commit()
+            return cursor.rowcount
+        finally:
+            conn.close()
+
+    def _write_status(self, visitor_id, sql, params):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            row = conn.execute('SELECT status FROM automations WHERE id = ?', (visitor_id,)).fetchone()
+            conn.execute(sql, params)
+            conn.commit()
+            return row is not None, row[0] if row else None
+        finally:
+            conn.close()
+
+    def add_log(self, automation_id, level, message):
+        self._execute('''
+            INSERT INTO automation_logs (automation_id, level, message)
+            VALUES (?, ?, ?)
+        ''', (automation_id, level, message))
+
+    def _fetchone(self, sql, params=()):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return conn.execute(sql, params).fetchone()
+        finally:
+            conn.close()
+
+    def _fetchall(self, sql, params=()):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+
+VISITOR_DATA = {'name': 'Visitante Benchmark', 'cpf': '00000000000', 'phone': '11999999999'}
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def run(db, workers, readers, seconds):
+    """Roda workers e leitores por `seconds`; retorna jobs/s, latências de status e erros"""
+    stop = threading.Event()
+    lock = threading.Lock()
+    completed = [0]
+    errors = [0]
+    latencies = []
+    ids = ['warmup']
+    db.add_automation('warmup', VISITOR_DATA)
+
+    def worker(worker_id):
+        n = 0
+        while not stop.is_set():
+            visitor_id = f"w{worker_id}-{n}"
+            n += 1
+            try:
+                db.add_automation(visitor_id, VISITOR_DATA)
+                db.update_status(visitor_id, 'processing', worker_id=worker_id)
+                for step in ('navegação', 'formulário', 'foto'):
+                    db.add_log(visitor_id, 'INFO', f'{step} ok')
+                db.update_status(visitor_id, 'completed', worker_id=worker_id)
+                with lock:
+                    completed[0] += 1
+                    ids.append(visitor_id)
+            except sqlite3.OperationalError:
+                with lock:
+                    errors[0] += 1
+
+    def reader():
+        local = []
+        i = 0
+        while not stop.is_set():
+            visitor_id = ids[i % len(ids)]
+            i += 1
+            start = time.perf_counter()
+            try:
+                db.get_status(visitor_id)
+                local.append(time.perf_counter() - start)
+            except sqlite3.OperationalError:
+                with lock:
+                    errors[0] += 1
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(workers)]
+    threads += [threading.Thread(target=reader) for _ in range(readers)]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    return {
+        'jobs_per_sec': completed[0] / seconds,
+        'status_queries': len(latencies),
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'errors': errors[0]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark SQLite conexão por chamada x pool com WAL')
+    parser.add_argument('--workers', type=int, default=4, help='Threads gravando jobs')
+    parser.add_argument('--readers', type=int, default=4, help='Threads consultando status')
+    parser.add_argument('--seconds', type=float, default=5, help='Duração de cada rodada')
+    args = parser.parse_args()
+
+    print(f"[BENCH] {args.workers} workers, {args.readers} leitores, {args.seconds}s por rodada\n")
+    print(f"{'modo':<10}{'jobs/s':>10}{'consultas':>12}{'p50 (ms)':>11}{'p99 (ms)':>11}{'erros':>8}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, factory in (('legado', LegacyDatabase), ('pool+WAL', AutomationDatabase)):
+            db = factory(os.path.join(tmp, f"{name.replace('+', '_')}.db"))
+            try:
+                r = run(db, args.workers, args.readers, args.seconds)
+            finally:
+                db.close()
+            print(f"{name:<10}{r['jobs_per_sec']:>10.1f}{r['status_queries']:>12}"
+                  f"{r['p50_ms']:>11.2f}{r['p99_ms']:>11.2f}{r['errors']:>8}")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BENCHMARK - IMPLICIT WAIT x SONDAS INSTANTÂNEAS
+Mede o custo das etapas cheias de sondas (message box, detecção de visitante,
+gatilhos de upload) contra o HTML salvo do formulário (form_html.html):
+
+- legado: implicitly_wait(10) + find_element dentro de try/except
+- novo:   implicit wait 0 + hikcentral_lookup.probe
+
+Uso:
+    python benchmark_lookup.py                  # implicit wait legado de 10s
+    python benchmark_lookup.py --implicit 2     # rodada rápida
+"""
+
+import os
+import sys
+import time
+import argparse
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+
+from hikcentral_lookup import configure_driver, locator, probe
+
+# Seletores realmente sondados em cada etapa dos scripts
+PROBE_STEPS = {
+    'message_box': [
+        ".el-message-box__wrapper",
+        "//span[contains(text(), 'OK')]",
+        "//span[contains(text(), 'Confirmar')]",
+        "//span[contains(text(), 'Instalar')]",
+        ".el-message-box__close",
+    ],
+    'detection_strategies': [
+        "tr[data-row-key]",
+        "tbody tr:not(.el-table__empty-row)",
+        "button[title='Reservar novamente']",
+        "//td[contains(text(), 'Lucca')]",
+    ],
+    'upload_triggers': [
+        "//canvas[@id='imgCanvas']",
+        "//canvas[contains(@class, 'bg-photo_canvas')]/..",
+        "input.btn-file[type='file'][accept*='image']",
+        "input[type='file']",
+    ],
+    'form_fields': [
+        "input[maxlength='255']",
+        "input[id='myDiv'].el-input__inner",
+        "input.el-input__inner",
+        "input[type='radio']",
+    ],
+}
+
+
+def create_driver():
+    options = Options()
+    options.add_argument("--headless=new")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument("--log-level=3")
+    return webdriver.Chrome(options=options)
+
+
+def run_legacy(driver, selectors, implicit):
+    driver.implicitly_wait(implicit)
+    found = 0
+    start = time.perf_counter()
+    for selector in selectors:
+        try:
+            driver.find_element(*locator(selector))
+            found += 1
+        except Exception:
+            pass
+    return time.perf_counter() - start, found
+
+
+def run_probe(driver, selectors):
+    configure_driver(driver)
+    found = 0
+    start = time.perf_counter()
+    for selector in selectors:
+        if probe(driver, selector):
+            found += 1
+    return time.perf_counter() - start, found
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark implicit wait x sondas instantâneas')
+    parser.add_argument('--html', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'form_html.html'))
+    parser.add_argument('--implicit', type=float, default=10, help='Implicit wait do modo legado (s)')
+    parser.add_argument('--runs', type=int, default=1, help='Repetições por etapa')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.html):
+        print(f"[ERRO] Fixture não encontrada: {args.html}")
+        return False
+
+    driver = create_driver()
+    try:
+        driver.get(f"file://{os.path.abspath(args.html)}")
+
+        print(f"[BENCH] Fixture: {args.html}")
+        print(f"[BENCH] Implicit wait legado: {args.implicit}s | repetições: {args.runs}\n")
+        print(f"{'etapa':<22}{'achados':>9}{'legado (s)':>13}{'sonda (s)':>12}{'economia (s)':>15}")
+
+        total_legacy = total_probe = 0.0
+        for step, selectors in PROBE_STEPS.items():
+            legacy = sum(run_legacy(driver, selectors, args.implicit)[0] for _ in range(args.runs)) / args.runs
+            probes = [run_probe(driver, selectors) for _ in range(args.runs)]
+            probe_time = sum(t for t, _ in probes) / args.runs
+            found = probes[0][1]
+            total_legacy += legacy
+            total_probe += probe_time
+            print(f"{step:<22}{found:>5}/{len(selectors):<3}{legacy:>13.2f}{probe_time:>12.3f}{legacy - probe_time:>15.2f}")
+
+        print(f"{'TOTAL':<22}{'':>9}{total_legacy:>13.2f}{total_probe:>12.3f}{total_legacy - total_probe:>15.2f}")
+        return True
+    finally:
+        driver.quit()
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
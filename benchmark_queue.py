@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BENCHMARK - FILA DURÁVEL NO SQLITE (automations)
+Duas medições sobre AutomationDatabase, num banco temporário:
+
+- throughput: produtores chamam enqueue (INSERT commitado) enquanto
+  consumidores fazem claim_next + complete; mostra jobs/s sustentados
+- crash: um processo filho enfileira e consome sob carga e é morto com
+  SIGKILL; depois confere que todo enqueue confirmado continua no banco
+  (pending, processing com lease a vencer, ou completed)
+
+Uso:
+    python benchmark_queue.py                       # throughput, 5s
+    python benchmark_queue.py --crash --rounds 5    # teste de queda
+"""
+
+import os
+import sys
+import time
+import random
+import signal
+import sqlite3
+import argparse
+import tempfile
+import threading
+import subprocess
+
+import logging
+logging.disable(logging.WARNING)  # enqueue/claim logam cada chamada; não medir o logging
+
+from automation_database import AutomationDatabase
+
+VISITOR_DATA = {'name': 'Visitante Benchmark', 'phone': '11999999999'}
+
+
+def run_load(db, producers, consumers, seconds, on_enqueued=None):
+    """Produtores e consumidores por `seconds`; retorna contagens"""
+    stop = threading.Event()
+    lock = threading.Lock()
+    counts = {'enqueued': 0, 'completed': 0}
+
+    def producer(pid):
+        n = 0
+        while not stop.is_set():
+            visitor_id = f"{os.getpid()}-p{pid}-{n}"
+            n += 1
+            db.enqueue(visitor_id, VISITOR_DATA)
+            if on_enqueued:
+                on_enqueued(visitor_id)
+            with lock:
+                counts['enqueued'] += 1
+
+    def consumer(worker_id):
+        while not stop.is_set():
+            item = db.claim_next(worker_id)
+            if not item:
+                time.sleep(0.01)
+                continue
+            db.complete(item['visitor_id'], worker_id)
+            with lock:
+                counts['completed'] += 1
+
+    threads = [threading.Thread(target=producer, args=(i,), daemon=True) for i in range(producers)]
+    threads += [threading.Thread(target=consumer, args=(i,), daemon=True) for i in range(consumers)]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    return counts
+
+
+# ========== THROUGHPUT ==========
+
+def benchmark(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        db = AutomationDatabase(os.path.join(tmp, 'queue.db'))
+        try:
+            counts = run_load(db, args.producers, args.consumers, args.seconds)
+        finally:
+            db.close()
+    print(f"[BENCH] {args.producers} produtores, {args.consumers} consumidores, {args.seconds}s")
+    print(f"[BENCH] enqueue: {counts['enqueued'] / args.seconds:.0f} jobs/s | "
+          f"claim+complete: {counts['completed'] / args.seconds:.0f} jobs/s")
+    return True
+
+
+# ========== TESTE DE QUEDA ==========
+
+def child(db_path):
+    """Processo morto pelo pai: imprime cada visitor_id depois do commit do enqueue"""
+    db = AutomationDatabase(db_path, lease_seconds=1)
+    output_lock = threading.Lock()
+
+    def acknowledged(visitor_id):
+        with output_lock:
+            sys.stdout.write(visitor_id + '\n')
+            sys.stdout.flush()
+
+    run_load(db, producers=4, consumers=2, seconds=3600, on_enqueued=acknowledged)
+
+
+def crash_round(db_path, kill_after):
+    proc = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--child', db_path],
+                            stdout=subprocess.PIPE, text=True)
+    time.sleep(kill_after)
+    proc.send_signal(signal.SIGKILL)
+    acknowledged = set(line.strip() for line in proc.stdout if line.strip())
+    proc.wait()
+
+    conn = sqlite3.connect(db_path)
+    stored = dict(conn.execute('SELECT id, status FROM automations').fetchall())
+    conn.close()
+    lost = acknowledged - set(stored)
+
+    # Reinício: jobs que estavam em andamento voltam pelo reaper quando o lease vence
+    db = AutomationDatabase(db_path)
+    time.sleep(1.1)
+    recovered = len(db.reap_expired_leases())
+    db.close()
+    return len(acknowledged), len(lost), recovered
+
+
+def crash_test(args):
+    if not hasattr(signal, 'SIGKILL'):
+        print("[ERRO] Teste de queda precisa de SIGKILL (Linux/macOS)")
+        return False
+    total_lost = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'crash.db')
+        for round_number in range(1, args.rounds + 1):
+            kill_after = random.uniform(0.5, 2.0)
+            acknowledged, lost, recovered = crash_round(db_path, kill_after)
+            total_lost += lost
+            print(f"[CRASH] rodada {round_number}: morto após {kill_after:.1f}s | "
+                  f"confirmados={acknowledged} perdidos={lost} leases recuperados={recovered}")
+    print(f"[CRASH] {'OK - nenhum job perdido' if total_lost == 0 else f'FALHA - {total_lost} jobs perdidos'}")
+    return total_lost == 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark e teste de queda da fila durável')
+    parser.add_argument('--producers', type=int, default=4)
+    parser.add_argument('--consumers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--crash', action='store_true', help='Roda o teste de queda (SIGKILL)')
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--child', metavar='DB', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child)
+        return True
+    return crash_test(args) if args.crash else benchmark(args)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BENCHMARK - LATÊNCIA DE PICKUP DA FILA (LISTEN/NOTIFY x POLLING)
+Roda contra um Postgres com database/queue_table.sql aplicado (o Supabase
+ou o stand-in local de database/local_postgres_standin.sql):
+
+- um produtor insere --jobs itens em visitor_registration_queue com
+  intervalos aleatórios (média --spacing segundos)
+- um consumidor faz claim_queue_items e espera pelo QueueChangeFeed
+- mostra a latência created_at -> claim (p50/p90/p99) e quantas consultas
+  foram feitas, quantas vazias
+
+Modos:
+    notify    LISTEN/NOTIFY + polling adaptativo de segurança
+    adaptive  só polling adaptativo (QUEUE_POLL_MIN/MAX_SECONDS)
+    fixed     intervalo fixo (--interval, como o sleep(15) anterior)
+
+Uso:
+    python benchmark_queue_pickup.py --dsn postgresql://localhost/visit_hub_queue
+    python benchmark_queue_pickup.py --dsn ... --mode fixed --interval 15
+"""
+
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+
+import logging
+logging.disable(logging.INFO)
+
+try:
+    import psycopg2
+    import psycopg2.extras
+except ImportError:
+    psycopg2 = None
+
+from queue_change_feed import QueueChangeFeed, QUEUE_POLL_MIN_SECONDS, QUEUE_POLL_MAX_SECONDS
+
+WORKER_ID = 'benchmark-pickup'
+
+
+def produce(dsn, jobs, spacing, done):
+    conn = psycopg2.connect(dsn)
+    conn.autocommit = True
+    try:
+        for n in range(jobs):
+            time.sleep(random.expovariate(1 / spacing))
+            conn.cursor().execute(
+                'INSERT INTO visitor_registration_queue (visitor_data) VALUES (%s)',
+                (json.dumps({'nome': f'Visitante Benchmark {n}', 'action': 'create'}),)
+            )
+    finally:
+        conn.close()
+        done.set()
+
+
+def consume(dsn, feed, jobs, deadline, fixed=False):
+    conn = psycopg2.connect(dsn)
+    conn.autocommit = True
+    claimed = 0
+    try:
+        while claimed < jobs and time.monotonic() < deadline:
+            with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+                cur.execute('SELECT * FROM claim_queue_items(%s, %s)', (10, WORKER_ID))
+                items = cur.fetchall()
+                if items:
+                    cur.execute("UPDATE visitor_registration_queue SET status = 'completed' WHERE id = ANY(%s::uuid[])",
+                                ([str(item['id']) for item in items],))
+            feed.record_claims(items)
+            claimed += len(items)
+            if claimed < jobs:
+                # fixed reproduz o loop antigo: dorme o intervalo mesmo depois de achar item
+                feed.wait(found=0 if fixed else len(items))
+    finally:
+        conn.close()
+    return claimed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Latência de pickup da fila: LISTEN/NOTIFY x polling')
+    parser.add_argument('--dsn', required=True, help='Postgres com queue_table.sql aplicado')
+    parser.add_argument('--mode', choices=('notify', 'adaptive', 'fixed'), default='notify')
+    parser.add_argument('--jobs', type=int, default=30)
+    parser.add_argument('--spacing', type=float, default=2.0, help='Intervalo médio entre inserts (s)')
+    parser.add_argument('--interval', type=float, default=15, help='Intervalo do modo fixed (s)')
+    args = parser.parse_args()
+
+    if psycopg2 is None:
+        print("[ERRO] psycopg2 não instalado (pip install psycopg2-binary)")
+        return False
+
+    if args.mode == 'fixed':
+        feed = QueueChangeFeed(dsn='', min_interval=args.interval, max_interval=args.interval)
+    else:
+        feed = QueueChangeFeed(dsn=args.dsn if args.mode == 'notify' else '',
+                               min_interval=QUEUE_POLL_MIN_SECONDS, max_interval=QUEUE_POLL_MAX_SECONDS)
+    feed.start()
+    if args.mode == 'notify':
+        for _ in range(50):  # espera o LISTEN subir antes de produzir
+            if feed.listening:
+                break
+            time.sleep(0.1)
+
+    done = threading.Event()
+    producer = threading.Thread(target=produce, args=(args.dsn, args.jobs, args.spacing, done), daemon=True)
+    producer.start()
+    deadline = time.monotonic() + args.jobs * args.spacing * 3 + 120
+    claimed = consume(args.dsn, feed, args.jobs, deadline, fixed=args.mode == 'fixed')
+    feed.stop()
+
+    m = feed.get_metrics()
+    print(f"[BENCH] modo={args.mode} itens={claimed}/{args.jobs} espaçamento médio={args.spacing}s")
+    print(f"[BENCH] pickup p50={m['pickup_latency_p50']}s p90={m['pickup_latency_p90']}s "
+          f"p99={m['pickup_latency_p99']}s")
+    print(f"[BENCH] consultas={m['polls']} vazias={m['empty_polls']} "
+          f"acordou por notify={m['wakeups_by_notify']} por timeout={m['wakeups_by_timeout']}")
+    return claimed == args.jobs
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🔥 CHROME SESSION POOL - SESSÕES QUENTES DO HIKCENTRAL
+=====================================================
+Mantém uma sessão Chrome já iniciada e autenticada por worker, para que
+cada cadastro rode dentro do processo do servidor sem pagar o cold start
+do Chrome, a criação de perfil e o login (30-40 s por visitante).
+
+- Uma sessão por worker (sem disputa entre threads)
+- Health check antes de cada job
+- Reciclagem após N jobs ou em caso de crash
+- Métricas expostas em /api/hikcentral/stats
+"""
+
+import os
+import time
+import logging
+import threading
+from datetime import datetime
+
+# Credenciais do HikCentral vêm do .env (antes lidas pelo script em subprocesso)
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    logging.warning("⚠️ python-dotenv não instalado - usando apenas variáveis de ambiente")
+
+from test_form_direct import HikCentralFormTest
+from hikcentral_jobs import build_visitor_job
+from automation_result import AutomationResult
+from hikcentral_session import session_store
+from worker_autoscaler import driver_memory_mb, CHROME_MEMORY_CAP_MB
+
+# Configurações
+SESSION_MAX_JOBS = int(os.getenv('SESSION_MAX_JOBS', '25'))
+SESSION_MAX_AGE = int(os.getenv('SESSION_MAX_AGE', '7200'))  # segundos
+
+
+class PooledSession:
+    """Sessão Chrome autenticada pertencente a um worker"""
+
+    def __init__(self, worker_id, tester):
+        self.worker_id = worker_id
+        self.tester = tester  # HikCentralFormTest dono do driver e do perfil
+        self.created_at = time.time()
+        self.last_used = None
+        self.jobs_done = 0
+        self.form_state = {}  # formulário limpo deixado pelo último job (reuso entre cadastros)
+
+    @property
+    def driver(self):
+        return self.tester.driver
+
+    def age(self):
+        return time.time() - self.created_at
+
+
+class ChromeSessionPool:
+    """Pool de sessões Chrome pré-aquecidas, uma por worker"""
+
+    def __init__(self, size, max_jobs_per_session=SESSION_MAX_JOBS,
+                 max_session_age=SESSION_MAX_AGE, headless=True, memory_cap_mb=CHROME_MEMORY_CAP_MB):
+        self.max_jobs_per_session = max_jobs_per_session
+        self.max_session_age = max_session_age
+        self.headless = headless
+        self.memory_cap_mb = memory_cap_mb
+        self.slots_lock = threading.Lock()
+        self.sessions = {worker_id: None for worker_id in range(size)}
+        self.slot_locks = {worker_id: threading.Lock() for worker_id in range(size)}
+        self.metrics_lock = threading.Lock()
+        self.metrics = {
+            'sessions_created': 0,
+            'sessions_recycled': 0,
+            'session_create_failures': 0,
+            'health_check_failures': 0,
+            'reauthentications': 0,
+            'crashes': 0,
+            'jobs_run': 0,
+            'jobs_succeeded': 0,
+            'jobs_failed': 0,
+            'warm_hits': 0,
+            'forms_reused': 0,
+            'cold_starts': 0,
+            'total_job_seconds': 0.0,
+            'total_warmup_seconds': 0.0,
+            'recycle_reasons': {}
+        }
+
+    @property
+    def size(self):
+        return len(self.sessions)
+
+    def _count(self, key, amount=1):
+        with self.metrics_lock:
+            self.metrics[key] += amount
+
+    # ========== CICLO DE VIDA DAS SESSÕES ==========
+
+    def warm_up(self):
+        """Pré-aquece todas as sessões em paralelo (não bloqueia o servidor)"""
+        for worker_id in list(self.sessions):
+            threading.Thread(
+                target=self._warm_slot,
+                args=(worker_id,),
+                daemon=True
+            ).start()
+        logging.info(f"🔥 Pré-aquecendo {self.size} sessões Chrome")
+
+    def add_slot(self, worker_id, warm=True):
+        """Novo worker do autoscaler: cria a vaga e (opcionalmente) pré-aquece a sessão"""
+        with self.slots_lock:
+            if worker_id in self.sessions:
+                return
+            self.slot_locks[worker_id] = threading.Lock()
+            self.sessions[worker_id] = None
+        if warm:
+            threading.Thread(target=self._warm_slot, args=(worker_id,), daemon=True).start()
+
+    def remove_slot(self, worker_id):
+        """Worker encerrado pelo autoscaler: fecha o Chrome dele e libera a vaga"""
+        lock = self.slot_locks.get(worker_id)
+        if lock is None:
+            return
+        with lock:
+            self._recycle(worker_id, 'scale_down')
+            with self.slots_lock:
+                self.sessions.pop(worker_id, None)
+                self.slot_locks.pop(worker_id, None)
+
+    def _warm_slot(self, worker_id):
+        lock = self.slot_locks.get(worker_id)
+        if lock is None:
+            return
+        with lock:
+            if worker_id in self.sessions and self.sessions[worker_id] is None:
+                try:
+                    self.sessions[worker_id] = self._create_session(worker_id)
+                except Exception as e:
+                    logging.error(f"❌ Falha ao pré-aquecer sessão do worker {worker_id}: {e}")
+
+    def _create_session(self, worker_id):
+        """Inicia Chrome e faz login uma única vez para o worker"""
+        start = time.time()
+        tester = HikCentralFormTest({}, f"pool-worker{worker_id}", self.headless)
+
+        if not tester.setup_driver():
+            self._count('session_create_failures')
+            raise RuntimeError("Chrome não iniciou")
+
+        if not tester.login():
+            self._count('session_create_failures')
+            tester.cleanup()
+            raise RuntimeError("Login no HikCentral falhou")
+
+        elapsed = time.time() - start
+        with self.metrics_lock:
+            self.metrics['sessions_created'] += 1
+            self.metrics['total_warmup_seconds'] += elapsed
+
+        logging.info(f"✅ Sessão Chrome do worker {worker_id} pronta em {elapsed:.1f}s")
+        return PooledSession(worker_id, tester)
+
+    def is_healthy(self, session):
+        """Verifica se o Chrome responde e se a sessão continua autenticada"""
+        try:
+            ready_state = session.driver.execute_script("return document.readyState")
+            current_url = session.driver.current_url.lower()
+            return ready_state == 'complete' and 'login' not in current_url
+        except Exception as e:
+            logging.warning(f"⚠️ Health check da sessão do worker {session.worker_id} falhou: {e}")
+            return False
+
+    def _reauthenticate(self, session):
+        """Sessão do HikCentral expirou (voltou para o login): reautentica no mesmo Chrome"""
+        try:
+            if 'login' not in session.driver.current_url.lower():
+                return True
+        except Exception:
+            return False
+
+        logging.info(f"🍪 Sessão HikCentral do worker {session.worker_id} expirou - reautenticando")
+        if not session.tester.login():
+            return False
+        self._count('reauthentications')
+        return True
+
+    def _recycle_reason(self, session):
+        if session.jobs_done >= self.max_jobs_per_session:
+            return 'max_jobs'
+        if session.age() >= self.max_session_age:
+            return 'max_age'
+        memory_mb = driver_memory_mb(session.driver)
+        if memory_mb is not None and memory_mb > self.memory_cap_mb:
+            logging.info(f"🧠 Chrome do worker {session.worker_id} usando {memory_mb:.0f} MB "
+                         f"(teto {self.memory_cap_mb} MB)")
+            return 'memory_cap'
+        if not self._reauthenticate(session):
+            return 'session_expired'
+        if not self.is_healthy(session):
+            self._count('health_check_failures')
+            return 'unhealthy'
+        return None
+
+    def _recycle(self, worker_id, reason):
+        session = self.sessions.get(worker_id)
+        if worker_id in self.sessions:
+            self.sessions[worker_id] = None
+        if session is None:
+            return
+
+        logging.info(f"♻️ Reciclando sessão do worker {worker_id} ({reason}, {session.jobs_done} jobs)")
+        try:
+            session.tester.cleanup()
+        except Exception as e:
+            logging.warning(f"⚠️ Erro ao encerrar sessão do worker {worker_id}: {e}")
+
+        with self.metrics_lock:
+            self.metrics['sessions_recycled'] += 1
+            reasons = self.metrics['recycle_reasons']
+            reasons[reason] = reasons.get(reason, 0) + 1
+
+    def _acquire(self, worker_id):
+        """Retorna sessão saudável do worker, criando ou reciclando se preciso"""
+        session = self.sessions[worker_id]
+
+        if session is not None:
+            reason = self._recycle_reason(session)
+            if reason:
+                self._recycle(worker_id, reason)
+                session = None
+
+        if session is None:
+            self._count('cold_starts')
+            session = self._create_session(worker_id)
+            self.sessions[worker_id] = session
+        else:
+            self._count('warm_hits')
+
+        return session
+
+    # ========== EXECUÇÃO DE JOBS ==========
+
+    def run_job(self, worker_id, visitor_id, visitor_data, prepare_next=False, lease_lost=None):
+        """
+        Executa um cadastro ou reativação dentro do processo usando a sessão do worker.
+        Com prepare_next (fila com backlog), o formulário fica limpo na página
+        para o próximo job do worker reaproveitar sem navegar. lease_lost
+        (threading.Event do lease do job) interrompe o cadastro antes de gravar.
+
+        Returns:
+            AutomationResult: resultado estruturado com tempos por etapa
+        """
+        self.add_slot(worker_id, warm=False)
+        with self.slot_locks[worker_id]:
+            result = AutomationResult(visitor_id, visitor_data.get('action', 'create'))
+            try:
+                session = result.timed('acquire_session', self._acquire, worker_id)
+            except Exception as e:
+                return result.finish(False, f'Sessão Chrome indisponível: {e}')
+
+            start = time.time()
+            success = False
+
+            try:
+                # Cadastro ou reativação conforme visitor_data['action'], na sessão do worker
+                runner = build_visitor_job(
+                    visitor_data,
+                    visitor_id,
+                    self.headless,
+                    driver=session.driver,
+                    form_state=session.form_state,
+                    lease_lost=lease_lost
+                )
+                if isinstance(runner, HikCentralFormTest):
+                    job_result = runner.run(prepare_next=prepare_next)
+                else:
+                    # Reativação sai da página do formulário: o próximo cadastro navega de novo
+                    session.form_state.pop('prepared', None)
+                    job_result = runner.run()
+                job_result.steps.insert(0, result.steps[0])
+                result = job_result
+                success = result.success
+            except Exception as e:
+                logging.error(f"❌ Crash na sessão do worker {worker_id}: {e}")
+                self._count('crashes')
+                self._recycle(worker_id, 'crash')
+                session = None
+                result.finish(False, e)
+            finally:
+                elapsed = time.time() - start
+                with self.metrics_lock:
+                    self.metrics['jobs_run'] += 1
+                    self.metrics['jobs_succeeded' if success else 'jobs_failed'] += 1
+                    self.metrics['total_job_seconds'] += elapsed
+                    if result.details.get('navigation', {}).get('mode') == 'reused_form':
+                        self.metrics['forms_reused'] += 1
+
+            if session is not None:
+                session.jobs_done += 1
+                session.last_used = time.time()
+
+                # Reciclar já agora para o próximo visitante não pagar o custo
+                reason = self._recycle_reason(session)
+                if reason:
+                    self._recycle(worker_id, reason)
+
+            return result
+
+    def shutdown(self):
+        """Encerra todas as sessões do pool"""
+        for worker_id in list(self.sessions):
+            with self.slot_locks[worker_id]:
+                self._recycle(worker_id, 'shutdown')
+        logging.info("🔒 Pool de sessões Chrome encerrado")
+
+    # ========== MÉTRICAS ==========
+
+    def get_metrics(self):
+        """Métricas do pool para o endpoint de estatísticas"""
+        sessions = []
+        for worker_id, session in list(self.sessions.items()):
+            if session is None:
+                sessions.append({'worker_id': worker_id, 'state': 'empty'})
+                continue
+            sessions.append({
+                'worker_id': worker_id,
+                'state': 'warm',
+                'jobs_done': session.jobs_done,
+                'age_seconds': round(session.age(), 1),
+                'memory_mb': round(driver_memory_mb(session.driver) or 0) or None,
+                'last_used': datetime.fromtimestamp(session.last_used).isoformat() if session.last_used else None
+            })
+
+        with self.metrics_lock:
+            metrics = dict(self.metrics)
+            metrics['recycle_reasons'] = dict(self.metrics['recycle_reasons'])
+
+        jobs_run = metrics['jobs_run']
+        created = metrics['sessions_created']
+        metrics['avg_job_seconds'] = round(metrics['total_job_seconds'] / jobs_run, 2) if jobs_run else None
+        metrics['avg_warmup_seconds'] = round(metrics['total_warmup_seconds'] / created, 2) if created else None
+        metrics['total_job_seconds'] = round(metrics['total_job_seconds'], 2)
+        metrics['total_warmup_seconds'] = round(metrics['total_warmup_seconds'], 2)
+
+        return {
+            'size': self.size,
+            'warm_sessions': sum(1 for s in sessions if s['state'] == 'warm'),
+            'max_jobs_per_session': self.max_jobs_per_session,
+            'max_session_age': self.max_session_age,
+            'memory_cap_mb': self.memory_cap_mb,
+            'headless': self.headless,
+            'sessions': sessions,
+            'metrics': metrics,
+            'hikcentral_session': session_store.get_metrics()
+        }
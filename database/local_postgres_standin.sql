@@ -0,0 +1,36 @@
+-- STAND-IN LOCAL DO SUPABASE PARA A FILA DE CADASTROS
+-- Cria num Postgres comum o mínimo que queue_table.sql espera do Supabase
+-- (schema auth, auth.uid() e os papéis da API), para testar claim e
+-- LISTEN/NOTIFY sem o projeto real:
+--
+--   createdb visit_hub_queue
+--   psql -d visit_hub_queue -f database/local_postgres_standin.sql
+--   psql -d visit_hub_queue -f database/queue_table.sql
+--   python benchmark_queue_pickup.py --dsn postgresql://localhost/visit_hub_queue
+
+CREATE EXTENSION IF NOT EXISTS pgcrypto;  -- gen_random_uuid() antes do Postgres 13
+
+CREATE SCHEMA IF NOT EXISTS auth;
+
+CREATE TABLE IF NOT EXISTS auth.users (
+    id UUID DEFAULT gen_random_uuid() PRIMARY KEY
+);
+
+CREATE OR REPLACE FUNCTION auth.uid()
+RETURNS UUID AS $$
+    SELECT NULLIF(current_setting('request.jwt.claim.sub', true), '')::UUID;
+$$ LANGUAGE sql STABLE;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'anon') THEN
+        CREATE ROLE anon NOLOGIN;
+    END IF;
+    IF NOT EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'authenticated') THEN
+        CREATE ROLE authenticated NOLOGIN;
+    END IF;
+    IF NOT EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'service_role') THEN
+        CREATE ROLE service_role NOLOGIN BYPASSRLS;
+    END IF;
+END
+$$;
@@ -54,6 +54,21 @@ CREATE TRIGGER update_visitor_queue_updated_at
     BEFORE UPDATE ON visitor_registration_queue 
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 
+-- Aviso aos serviços Windows (LISTEN visitor_registration_queue) quando um item
+-- entra ou volta para pending; o payload é o id do item
+CREATE OR REPLACE FUNCTION notify_visitor_queue()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('visitor_registration_queue', NEW.id::text);
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+CREATE TRIGGER notify_visitor_queue_pending
+    AFTER INSERT OR UPDATE OF status ON visitor_registration_queue
+    FOR EACH ROW WHEN (NEW.status = 'pending')
+    EXECUTE FUNCTION notify_visitor_queue();
+
 -- Função para buscar próximo item da fila
 CREATE OR REPLACE FUNCTION get_next_queue_item()
 RETURNS visitor_registration_queue AS $$
@@ -88,6 +103,91 @@ BEGIN
 END;
 $$ LANGUAGE plpgsql SECURITY DEFINER;
 
+-- Colunas de controle do claim (os serviços Windows registram quem pegou o item e quando)
+ALTER TABLE visitor_registration_queue ADD COLUMN IF NOT EXISTS worker_id TEXT;
+ALTER TABLE visitor_registration_queue ADD COLUMN IF NOT EXISTS processing_started_at TIMESTAMP WITH TIME ZONE;
+
+-- Foto no Storage: a linha guarda só a chave do objeto e o SHA-256 dos bytes (photo_base64 fica para itens antigos)
+ALTER TABLE visitor_registration_queue ADD COLUMN IF NOT EXISTS photo_key TEXT;
+ALTER TABLE visitor_registration_queue ADD COLUMN IF NOT EXISTS photo_sha256 TEXT;
+ALTER TABLE visitor_registration_queue ADD COLUMN IF NOT EXISTS photo_size INTEGER;
+
+-- Bucket privado das fotos da fila (só existe no Supabase; num Postgres comum o bloco não faz nada)
+DO $$
+BEGIN
+    IF to_regclass('storage.buckets') IS NOT NULL THEN
+        INSERT INTO storage.buckets (id, name, public)
+        VALUES ('visitor-photos', 'visitor-photos', false)
+        ON CONFLICT (id) DO NOTHING;
+    END IF;
+END
+$$;
+
+-- Índice parcial na ordem de consumo da fila (só itens pendentes)
+CREATE INDEX IF NOT EXISTS idx_queue_claim ON visitor_registration_queue(priority DESC, created_at ASC)
+    WHERE status = 'pending';
+
+-- Campo calculado para o PostgREST (select=...,has_photo): indica se há foto sem trafegar photo_base64
+CREATE OR REPLACE FUNCTION has_photo(item visitor_registration_queue)
+RETURNS BOOLEAN AS $$
+    SELECT (item.photo_key IS NOT NULL AND item.photo_key <> '')
+        OR (item.photo_base64 IS NOT NULL AND item.photo_base64 <> '');
+$$ LANGUAGE sql STABLE;
+
+-- Reservas vencidas: poller que caiu ou reiniciou com itens em processing
+CREATE INDEX IF NOT EXISTS idx_queue_processing_started ON visitor_registration_queue(processing_started_at)
+    WHERE status = 'processing';
+
+-- Função para reservar até n itens da fila de uma vez (claim atômico em lote)
+-- FOR UPDATE SKIP LOCKED: pollers concorrentes pegam itens diferentes, nunca o mesmo
+-- Itens em processing há mais de stale_after_seconds (poller caiu/reiniciou) voltam a
+-- ser reservados por qualquer poller; sem tentativas restantes, viram failed
+DROP FUNCTION IF EXISTS claim_queue_items(INTEGER, TEXT);
+CREATE OR REPLACE FUNCTION claim_queue_items(n INTEGER DEFAULT 1, worker_id TEXT DEFAULT NULL,
+                                             stale_after_seconds INTEGER DEFAULT 900)
+RETURNS SETOF visitor_registration_queue AS $$
+    UPDATE visitor_registration_queue
+    SET 
+        status = 'failed',
+        error_message = COALESCE(error_message, 'Reserva expirada: o poller não concluiu o item'),
+        updated_at = CURRENT_TIMESTAMP
+    WHERE status = 'processing'
+    AND COALESCE(processing_started_at, updated_at)
+        < CURRENT_TIMESTAMP - make_interval(secs => claim_queue_items.stale_after_seconds)
+    AND attempts >= max_attempts;
+
+    WITH claimed AS (
+        UPDATE visitor_registration_queue q
+        SET 
+            status = 'processing',
+            attempts = q.attempts + 1,
+            worker_id = claim_queue_items.worker_id,
+            processing_started_at = CURRENT_TIMESTAMP,
+            updated_at = CURRENT_TIMESTAMP
+        WHERE q.id IN (
+            SELECT id
+            FROM visitor_registration_queue
+            WHERE (
+                status = 'pending'
+                OR (status = 'processing'
+                    AND COALESCE(processing_started_at, updated_at)
+                        < CURRENT_TIMESTAMP - make_interval(secs => claim_queue_items.stale_after_seconds))
+            )
+            AND attempts < max_attempts
+            ORDER BY priority DESC, created_at ASC
+            LIMIT GREATEST(claim_queue_items.n, 0)
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING q.*
+    )
+    SELECT * FROM claimed
+    ORDER BY priority DESC, created_at ASC;
+$$ LANGUAGE sql SECURITY DEFINER;
+
+-- Só o service key (serviços Windows) pode reservar itens da fila
+REVOKE EXECUTE ON FUNCTION claim_queue_items(INTEGER, TEXT, INTEGER) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION claim_queue_items(INTEGER, TEXT, INTEGER) TO service_role;
+
 -- Função para marcar item como concluído
 CREATE OR REPLACE FUNCTION mark_queue_item_completed(item_id UUID)
 RETURNS void AS $$
@@ -130,7 +230,12 @@ GROUP BY status;
 -- Comentários para documentação
 COMMENT ON TABLE visitor_registration_queue IS 'Fila de cadastros de visitantes para processamento pelo Windows';
 COMMENT ON COLUMN visitor_registration_queue.visitor_data IS 'Dados do visitante em formato JSON';
-COMMENT ON COLUMN visitor_registration_queue.photo_base64 IS 'Foto do visitante em base64';
+COMMENT ON COLUMN visitor_registration_queue.photo_base64 IS 'Foto do visitante em base64 (legado; novos itens usam photo_key)';
+COMMENT ON COLUMN visitor_registration_queue.photo_key IS 'Chave da foto no bucket visitor-photos do Storage (queue/<sha[:2]>/<sha>.jpg)';
+COMMENT ON COLUMN visitor_registration_queue.photo_sha256 IS 'SHA-256 (hex) dos bytes da foto: conferido no download e chave do cache local';
 COMMENT ON COLUMN visitor_registration_queue.priority IS 'Prioridade (1=baixa, 5=alta)';
 COMMENT ON COLUMN visitor_registration_queue.attempts IS 'Número de tentativas de processamento';
-COMMENT ON FUNCTION get_next_queue_item() IS 'Retorna próximo item da fila para processamento'; 
\ No newline at end of file
+COMMENT ON FUNCTION get_next_queue_item() IS 'Retorna próximo item da fila para processamento'; 
+COMMENT ON FUNCTION claim_queue_items(INTEGER, TEXT, INTEGER) IS 'Reserva até n itens pendentes (ou em processing há mais de stale_after_seconds) para worker_id (FOR UPDATE SKIP LOCKED) e os retorna como processing';
+COMMENT ON FUNCTION notify_visitor_queue() IS 'pg_notify no canal visitor_registration_queue para itens pending (consumido por queue_change_feed.py)';
+COMMENT ON FUNCTION has_photo(visitor_registration_queue) IS 'Campo calculado: item tem foto no Storage (photo_key) ou em photo_base64';
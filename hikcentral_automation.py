@@ -23,11 +23,15 @@ import os
 import tempfile
 import subprocess
 
+from hikcentral_lookup import configure_driver, probe_visible
+from hikcentral_routes import route_cache
+
 class HikCentralAutomation:
     def __init__(self, headless=True, simulation_mode=False):
         self.headless = headless
         self.simulation_mode = simulation_mode
         self.driver = None
+        self.navigation = None
         self.setup_driver()
     
     def setup_driver(self):
@@ -115,6 +119,9 @@ class HikCentralAutomation:
                 except Exception as e3:
                     print(f"❌ Falha na terceira tentativa: {e3}")
                     raise
+        
+        # Sem implicit wait: ausências são sondadas na hora e esperas são explícitas
+        configure_driver(self.driver)
     
     def close_message_boxes(self):
         """Fecha todas as message boxes visíveis de forma mais robusta"""
@@ -392,11 +399,29 @@ class HikCentralAutomation:
             return False
     
     def navigate_to_form(self):
-        """Navega até o formulário de visitante"""
+        """Navega até o formulário de visitante (deep link aprendido ou cliques)"""
         if self.simulation_mode:
             print("🎭 MODO SIMULAÇÃO: Já estamos no formulário")
             return True
-            
+
+        self.navigation = route_cache.navigate(
+            self.driver, 'visitor_form', self.form_ready, self.navigate_to_form_by_clicks
+        )
+        print(f"🧭 Formulário aberto via {self.navigation['mode']} em {self.navigation['seconds']:.1f}s")
+        return self.navigation['success']
+
+    def form_ready(self):
+        """Formulário de cadastro carregado"""
+        try:
+            WebDriverWait(self.driver, 15).until(
+                EC.visibility_of_element_located((By.CSS_SELECTOR, "input.el-input__inner"))
+            )
+            return True
+        except Exception:
+            return False
+
+    def navigate_to_form_by_clicks(self):
+        """Navega até o formulário de visitante clicando nos menus"""
         try:
             print("🧭 Navegando para o formulário...")
             
@@ -437,12 +462,11 @@ class HikCentralAutomation:
             
             # Fechar tooltips se existirem
             print("🔧 Tentando fechar tooltips...")
-            try:
-                tooltip = self.driver.find_element(By.ID, "visitorTips1")
-                if tooltip.is_displayed():
-                    self.driver.execute_script("arguments[0].style.display = 'none';", tooltip)
-                    print("✅ Tooltip fechado")
-            except:
+            tooltip = probe_visible(self.driver, "visitorTips1", by=By.ID)
+            if tooltip:
+                self.driver.execute_script("arguments[0].style.display = 'none';", tooltip)
+                print("✅ Tooltip fechado")
+            else:
                 print("ℹ️ Nenhum tooltip encontrado")
             
             # Clicar em 'Entrada de visitante não reservada'
@@ -613,15 +637,14 @@ class HikCentralAutomation:
         try:
             # Primeiro, tentar fechar tooltips que possam estar bloqueando
             print("🔧 Tentando fechar tooltips...")
-            try:
-                # Fechar tooltip se existir
-                tooltip = self.driver.find_element(By.ID, "visitorTips1")
-                if tooltip.is_displayed():
-                    # Clicar fora para fechar
-                    self.driver.execute_script("arguments[0].style.display = 'none';", tooltip)
-                    print("✅ Tooltip fechado")
-                    time.sleep(1)
-            except:
+            # Fechar tooltip se existir
+            tooltip = probe_visible(self.driver, "visitorTips1", by=By.ID)
+            if tooltip:
+                # Clicar fora para fechar
+                self.driver.execute_script("arguments[0].style.display = 'none';", tooltip)
+                print("✅ Tooltip fechado")
+                time.sleep(1)
+            else:
                 print("⚠️ Nenhum tooltip encontrado para fechar")
             
             # Aguardar um pouco
@@ -634,8 +657,8 @@ class HikCentralAutomation:
             def fechar_message_box():
                 try:
                     time.sleep(2)
-                    cancel_button = self.driver.find_element(By.XPATH, "//button[contains(@class, 'el-button')]//span[text()=' Cancelar ']")
-                    if cancel_button.is_displayed():
+                    cancel_button = probe_visible(self.driver, "//button[contains(@class, 'el-button')]//span[text()=' Cancelar ']")
+                    if cancel_button:
                         cancel_button.click()
                         print("✅ Message box fechado com botão Cancelar")
                         time.sleep(2)
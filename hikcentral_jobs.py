@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧩 HIKCENTRAL JOBS - EXECUÇÃO EM PROCESSO
+=========================================
+Ponto único para os serviços de polling rodarem cadastros e reativações
+como biblioteca. Selenium, os scripts e o .env são carregados uma vez
+quando o worker importa este módulo, e não a cada visitante.
+"""
+
+from test_form_direct import HikCentralFormTest
+from test_reactivate_visitor import HikCentralReactivator
+
+
+def build_visitor_job(visitor_data, visitor_id, headless=None, driver=None, form_state=None, lease_lost=None):
+    """
+    Monta o job adequado à ação do visitante ('create' ou 'reactivate').
+    Com driver (pool de sessões), o job usa a sessão já autenticada e não a fecha.
+
+    Returns:
+        HikCentralFormTest | HikCentralReactivator
+    """
+    if visitor_data.get('action') == 'reactivate':
+        # Reativação sempre rodou headless por padrão
+        return HikCentralReactivator(visitor_data, visitor_id, True if headless is None else headless,
+                                     driver=driver, lease_lost=lease_lost)
+    # None = padrão do script (variável HEADLESS; headless se não definida)
+    return HikCentralFormTest(visitor_data, visitor_id, headless, driver=driver, form_state=form_state,
+                              lease_lost=lease_lost)
+
+
+def run_visitor_job(visitor_data, visitor_id, headless=None):
+    """
+    Executa o job adequado à ação do visitante ('create' ou 'reactivate')
+
+    Returns:
+        AutomationResult: resultado estruturado com tempos por etapa
+    """
+    return build_visitor_job(visitor_data, visitor_id, headless).run()
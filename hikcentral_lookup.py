@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🔎 HIKCENTRAL LOOKUP - BUSCA DE ELEMENTOS SEM IMPLICIT WAIT
+===========================================================
+Com implicitly_wait(10), todo find_element/find_elements de algo que NÃO
+existe na página (message box ausente, estratégia de detecção que não casa,
+seletor de fallback morto) custa 10 s inteiros.
+
+Regras deste módulo, usadas por HikCentralFormTest, HikCentralReactivator e
+HikCentralAutomation:
+- implicit wait sempre 0 (configure_driver)
+- esperas só explícitas e com limite (find / find_any)
+- sondas instantâneas para "existe agora?" (probe / probe_visible)
+"""
+
+import os
+
+from selenium.common.exceptions import TimeoutException, StaleElementReferenceException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+
+IMPLICIT_WAIT = 0
+DEFAULT_TIMEOUT = float(os.getenv('LOOKUP_TIMEOUT', '10'))
+POLL_INTERVAL = 0.1
+
+CONDITIONS = {
+    'present': EC.presence_of_element_located,
+    'visible': EC.visibility_of_element_located,
+    'clickable': EC.element_to_be_clickable,
+}
+
+
+def configure_driver(driver):
+    """Zera o implicit wait do driver (esperas passam a ser só explícitas)"""
+    driver.implicitly_wait(IMPLICIT_WAIT)
+    return driver
+
+
+def locator(selector, by=None):
+    """Seletores que começam com '//', '(' ou './' são XPath; o resto é CSS"""
+    if by is None:
+        by = By.XPATH if selector.startswith(('//', '(', './')) else By.CSS_SELECTOR
+    return (by, selector)
+
+
+def probe(driver, selector, by=None):
+    """Elementos presentes AGORA (sem esperar); lista vazia se não houver"""
+    try:
+        return driver.find_elements(*locator(selector, by))
+    except Exception:
+        return []
+
+
+def probe_visible(driver, selector, by=None):
+    """Primeiro elemento visível AGORA, ou None"""
+    for element in probe(driver, selector, by):
+        try:
+            if element.is_displayed():
+                return element
+        except StaleElementReferenceException:
+            continue
+    return None
+
+
+def find(driver, selector, timeout=DEFAULT_TIMEOUT, by=None, condition='present'):
+    """Espera explícita e limitada; retorna o elemento ou None se esgotar o tempo"""
+    try:
+        return WebDriverWait(driver, timeout, poll_frequency=POLL_INTERVAL).until(
+            CONDITIONS[condition](locator(selector, by))
+        )
+    except TimeoutException:
+        return None
+
+
+def find_any(driver, selectors, timeout=DEFAULT_TIMEOUT, visible=True):
+    """
+    Espera o primeiro de vários seletores aparecer, sondando todos a cada ciclo
+    (em vez de pagar um timeout inteiro por seletor que falha).
+
+    Returns:
+        tuple: (seletor, elemento) ou (None, None)
+    """
+    def first_match(driver):
+        for selector in selectors:
+            element = probe_visible(driver, selector) if visible else next(iter(probe(driver, selector)), None)
+            if element is not None:
+                return (selector, element)
+        return False
+
+    try:
+        return WebDriverWait(driver, timeout, poll_frequency=POLL_INTERVAL).until(first_match)
+    except TimeoutException:
+        return (None, None)
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧭 HIKCENTRAL ROUTES - NAVEGAÇÃO POR DEEP LINK
+==============================================
+A navegação até o formulário de cadastro e até a lista de informações de
+visitante clicava menu por menu (Visitante -> Entrada de visitante -> ...).
+
+Depois da primeira navegação por cliques bem-sucedida, a rota da SPA (hash
+da URL, ex. "#/visitor/...") é guardada em disco por versão do HikCentral.
+Nos jobs seguintes o driver vai direto para a rota; os cliques só voltam a
+ser usados quando o deep link falha. Uma rota que falha várias vezes seguidas
+tem o deep link desativado por DEEP_LINK_RETRY_SECONDS (ou até os cliques
+levarem a uma rota diferente); depois disso uma nova tentativa reativa o
+deep link se der certo, então uma queda do HikCentral não o desliga de vez.
+
+NAVIGATION_MODE=click desliga o deep link.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from urllib.parse import urlsplit
+
+from selector_cache import HIKCENTRAL_VERSION, DEFAULT_VERSION
+
+ROUTES_FILE = os.getenv('HIKCENTRAL_ROUTES_FILE', 'hikcentral_routes.json')
+NAVIGATION_MODE = os.getenv('NAVIGATION_MODE', 'deep_link')  # 'deep_link' ou 'click'
+DEEP_LINK_MAX_FAILURES = int(os.getenv('DEEP_LINK_MAX_FAILURES', '3'))
+DEEP_LINK_RETRY_SECONDS = int(os.getenv('DEEP_LINK_RETRY_SECONDS', '1800'))  # desativado -> nova tentativa
+
+
+class RouteCache:
+    """Rotas aprendidas da SPA do HikCentral e tempos de navegação por modo"""
+
+    def __init__(self, path=ROUTES_FILE, version=HIKCENTRAL_VERSION,
+                 mode=NAVIGATION_MODE, max_failures=DEEP_LINK_MAX_FAILURES,
+                 retry_after=DEEP_LINK_RETRY_SECONDS):
+        self.path = path
+        self.version = version or DEFAULT_VERSION
+        self.mode = mode
+        self.max_failures = max_failures
+        self.retry_after = retry_after
+        self.lock = threading.RLock()
+        self.data = self._load()
+        self.timings = {}  # página -> modo -> {count, total_seconds}
+
+    # ========== PERSISTÊNCIA ==========
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logging.warning(f"⚠️ Cache de rotas ilegível ({self.path}), recomeçando: {e}")
+            return {}
+
+    def _save(self):
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.data, f, indent=2, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logging.warning(f"⚠️ Erro ao salvar cache de rotas: {e}")
+
+    def set_version(self, version):
+        """Passa a usar as rotas aprendidas para outra versão do HikCentral"""
+        with self.lock:
+            self.version = version
+
+    def _entry(self, page):
+        return self.data.setdefault(self.version, {}).get(page)
+
+    # ========== ROTAS ==========
+
+    def learn(self, page, url):
+        """Guarda o hash da URL atual como rota da página (após navegação por cliques)"""
+        fragment = urlsplit(url).fragment
+        if not fragment or fragment in ('/', '') or 'login' in fragment.lower():
+            return
+        with self.lock:
+            entry = self._entry(page)
+            # Mesma rota: mantém o contador de falhas (desativado, volta a tentar após o cooldown)
+            if entry and entry['route'] == fragment:
+                return
+            self.data.setdefault(self.version, {})[page] = {
+                'route': fragment,
+                'learned_at': time.time(),
+                'failures': 0
+            }
+            self._save()
+        print(f"[NAV] Rota de '{page}' aprendida: #{fragment}")
+
+    def _failure(self, page):
+        with self.lock:
+            entry = self._entry(page)
+            if not entry:
+                return
+            entry['failures'] += 1
+            if entry['failures'] >= self.max_failures:
+                entry['disabled_at'] = time.time()
+                print(f"[NAV] Deep link de '{page}' falhou {entry['failures']}x seguidas - "
+                      f"desativado por {self.retry_after}s")
+            self._save()
+
+    def _success(self, page):
+        with self.lock:
+            entry = self._entry(page)
+            if entry and entry['failures']:
+                entry['failures'] = 0
+                entry.pop('disabled_at', None)
+                self._save()
+
+    def _enabled(self, entry):
+        """Deep link ativo: poucas falhas seguidas, ou cooldown da desativação já passou"""
+        if not entry:
+            return False
+        if entry['failures'] < self.max_failures:
+            return True
+        return time.time() - entry.get('disabled_at', 0) >= self.retry_after
+
+    def at(self, driver, page):
+        """O driver está na rota aprendida da página?"""
+        with self.lock:
+            entry = self._entry(page)
+        try:
+            return bool(entry) and urlsplit(driver.current_url).fragment == entry['route']
+        except Exception:
+            return False
+
+    # ========== NAVEGAÇÃO ==========
+
+    def open(self, driver, page, ready):
+        """
+        Abre a página direto pela rota aprendida.
+
+        Args:
+            ready: callable sem argumentos que espera a página ficar pronta
+                   (retorna verdadeiro quando os elementos esperados apareceram)
+
+        Returns:
+            bool: True se o deep link abriu a página; False para usar os cliques
+        """
+        with self.lock:
+            entry = self._entry(page)
+        if self.mode != 'deep_link' or not self._enabled(entry):
+            return False
+        route = entry['route']
+
+        try:
+            parts = urlsplit(driver.current_url)
+            base = f"{parts.scheme}://{parts.netloc}{parts.path}"
+            # Mesmo hash não dispara navegação no router: passar pela raiz para remontar a página
+            if parts.fragment == route:
+                driver.get(f"{base}#/")
+            print(f"[NAV] Deep link para '{page}': #{route}")
+            driver.get(f"{base}#{route}")
+            if ready():
+                self._success(page)
+                return True
+        except Exception as e:
+            print(f"[WARN] Deep link para '{page}' falhou: {e}")
+
+        print(f"[NAV] Deep link para '{page}' não abriu a página - usando cliques")
+        self._failure(page)
+        return False
+
+    def navigate(self, driver, page, ready, click_through):
+        """
+        Deep link com fallback para os cliques; mede o tempo de navegação.
+
+        Returns:
+            dict: {'success', 'mode', 'seconds'}
+        """
+        started = time.monotonic()
+        mode = 'deep_link'
+        success = self.open(driver, page, ready)
+
+        if not success:
+            mode = 'click_through'
+            success = bool(click_through())
+            if success:
+                self.learn(page, driver.current_url)
+
+        seconds = time.monotonic() - started
+        if success:
+            self.record(page, mode, seconds)
+        return {'success': success, 'mode': mode, 'seconds': round(seconds, 2)}
+
+    # ========== MÉTRICAS ==========
+
+    def record(self, page, mode, seconds):
+        with self.lock:
+            stats = self.timings.setdefault(page, {}).setdefault(mode, {'count': 0, 'total_seconds': 0.0})
+            stats['count'] += 1
+            stats['total_seconds'] += seconds
+
+    def get_metrics(self):
+        """Rotas aprendidas e tempo médio de navegação por página e modo"""
+        metrics = {}
+        with self.lock:
+            pages = set(self.data.get(self.version, {})) | set(self.timings)
+            for page in pages:
+                entry = self._entry(page) or {}
+                metrics[page] = {
+                    'route': entry.get('route'),
+                    'failures': entry.get('failures', 0),
+                    'deep_link_enabled': self._enabled(entry),
+                    'modes': {
+                        mode: {
+                            'count': stats['count'],
+                            'avg_seconds': round(stats['total_seconds'] / stats['count'], 2)
+                        }
+                        for mode, stats in self.timings.get(page, {}).items()
+                    }
+                }
+        return metrics
+
+
+# Instância compartilhada pelos scripts e pelos workers do mesmo processo
+route_cache = RouteCache()
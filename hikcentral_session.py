@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🍪 HIKCENTRAL SESSION - SESSÃO AUTENTICADA REUTILIZÁVEL
+=======================================================
+Cada job (cadastro e reativação) fazia o login completo no HikCentral.
+Este módulo guarda os cookies e o localStorage/sessionStorage (onde o
+HikCentral Web guarda o token) depois de um login bem-sucedido e os injeta
+nos drivers novos.
+
+- A sessão salva só é descartada quando o HikCentral redireciona para o login
+- Um único worker refaz o login por vez (lock entre threads + lockfile entre
+  processos); os demais esperam e reutilizam a sessão nova
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.common.exceptions import TimeoutException
+
+SESSION_FILE = os.getenv('HIKCENTRAL_SESSION_FILE', 'hikcentral_session.json')
+SESSION_MAX_AGE = int(os.getenv('HIKCENTRAL_SESSION_MAX_AGE', '28800'))  # segundos
+SESSION_CHECK_TIMEOUT = int(os.getenv('HIKCENTRAL_SESSION_CHECK_TIMEOUT', '15'))
+LOCK_TIMEOUT = 180  # tempo máximo esperando o login de outro worker
+LOCK_STALE = 120    # lockfile mais velho que isso é de um processo que morreu
+LOCK_POLL = 0.5
+
+# Página principal carregada (menu lateral) ou tela de login?
+SESSION_STATE_JS = """
+if (document.readyState !== 'complete') { return null; }
+var login = document.getElementById('username');
+if (login && login.getClientRects().length) { return 'login'; }
+if (location.href.toLowerCase().indexOf('login') !== -1) { return 'login'; }
+if (document.querySelector('.el-menu, .el-submenu, .el-menu-item')) { return 'ok'; }
+return null;
+"""
+
+DUMP_STORAGE_JS = """
+function dump(storage) {
+    var data = {};
+    for (var i = 0; i < storage.length; i++) {
+        var key = storage.key(i);
+        data[key] = storage.getItem(key);
+    }
+    return data;
+}
+return {local: dump(window.localStorage), session: dump(window.sessionStorage)};
+"""
+
+RESTORE_STORAGE_JS = """
+var data = arguments[0];
+Object.keys(data.local || {}).forEach(function(k) { window.localStorage.setItem(k, data.local[k]); });
+Object.keys(data.session || {}).forEach(function(k) { window.sessionStorage.setItem(k, data.session[k]); });
+"""
+
+COOKIE_FIELDS = ('name', 'value', 'path', 'secure', 'httpOnly', 'expiry')
+
+
+class SessionStore:
+    """Cookies/tokens do HikCentral compartilhados entre drivers, workers e processos"""
+
+    def __init__(self, path=SESSION_FILE, max_age=SESSION_MAX_AGE):
+        self.path = path
+        self.lock_path = f"{path}.lock"
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.metrics_lock = threading.Lock()
+        self.metrics = {
+            'reused': 0,           # sessão salva injetada e válida
+            'shared_refresh': 0,   # outro worker refez o login enquanto este esperava
+            'logins': 0,           # login completo com credenciais
+            'login_failures': 0,
+            'expired': 0,          # sessão salva redirecionou para o login
+        }
+
+    def _count(self, key):
+        with self.metrics_lock:
+            self.metrics[key] += 1
+
+    # ========== PERSISTÊNCIA ==========
+
+    def load(self):
+        """Sessão salva, ou None se não existir / estiver velha demais"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logging.warning(f"⚠️ Sessão do HikCentral ilegível ({self.path}): {e}")
+            return None
+
+        if time.time() - snapshot.get('saved_at', 0) > self.max_age:
+            return None
+        return snapshot
+
+    def _generation(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f).get('generation', 0)
+        except Exception:
+            return 0
+
+    def save(self, driver):
+        """Captura cookies e storage do driver logado e grava (escrita atômica)"""
+        storage = driver.execute_script(DUMP_STORAGE_JS)
+        snapshot = {
+            'generation': self._generation() + 1,
+            'saved_at': time.time(),
+            'origin': self._origin(driver.current_url),
+            'cookies': [
+                {k: cookie[k] for k in COOKIE_FIELDS if k in cookie}
+                for cookie in driver.get_cookies()
+            ],
+            'storage': storage,
+        }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, self.path)
+        return snapshot
+
+    def invalidate(self, generation=None):
+        """Descarta a sessão salva (somente se ainda for a geração informada)"""
+        if generation is not None and self._generation() != generation:
+            return
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def _origin(url):
+        parts = urlsplit(url)
+        return f"{parts.scheme}://{parts.netloc}/"
+
+    # ========== INJEÇÃO ==========
+
+    def restore(self, driver, snapshot, url):
+        """
+        Injeta a sessão salva no driver e abre a URL do HikCentral.
+
+        Returns:
+            bool: True se a página principal carregou sem voltar para o login
+        """
+        try:
+            # Cookies e storage só podem ser gravados estando na origem do HikCentral
+            driver.get(snapshot.get('origin') or self._origin(url))
+            driver.delete_all_cookies()
+            for cookie in snapshot.get('cookies', []):
+                try:
+                    driver.add_cookie(cookie)
+                except Exception as e:
+                    logging.debug(f"Cookie {cookie.get('name')} ignorado: {e}")
+            driver.execute_script(RESTORE_STORAGE_JS, snapshot.get('storage') or {})
+
+            driver.get(url)
+            return self.is_authenticated(driver)
+        except Exception as e:
+            print(f"[SESSION] Falha ao injetar sessão salva: {e}")
+            return False
+
+    @staticmethod
+    def is_authenticated(driver, timeout=SESSION_CHECK_TIMEOUT):
+        """Espera a SPA decidir entre página principal e redirecionamento para o login"""
+        try:
+            state = WebDriverWait(driver, timeout, poll_frequency=0.2).until(
+                lambda d: d.execute_script(SESSION_STATE_JS)
+            )
+        except TimeoutException:
+            return False
+        return state == 'ok'
+
+    # ========== LOCK DE RENOVAÇÃO ==========
+
+    @contextmanager
+    def refresh_lock(self):
+        """Um login por vez: lock entre threads e lockfile entre processos"""
+        with self.lock:
+            deadline = time.time() + LOCK_TIMEOUT
+            while True:
+                try:
+                    fd = os.open(self.lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                    os.write(fd, str(os.getpid()).encode())
+                    os.close(fd)
+                    break
+                except FileExistsError:
+                    try:
+                        if time.time() - os.path.getmtime(self.lock_path) > LOCK_STALE:
+                            print("[SESSION] Removendo lock de login abandonado")
+                            os.remove(self.lock_path)
+                            continue
+                    except FileNotFoundError:
+                        continue
+                    if time.time() > deadline:
+                        raise TimeoutError("Outro worker está há tempo demais fazendo login")
+                    time.sleep(LOCK_POLL)
+            try:
+                yield
+            finally:
+                try:
+                    os.remove(self.lock_path)
+                except FileNotFoundError:
+                    pass
+
+    # ========== FLUXO PRINCIPAL ==========
+
+    def ensure_login(self, driver, login_fn, url):
+        """
+        Deixa o driver autenticado: reutiliza a sessão salva e só chama login_fn
+        (login completo com credenciais) quando ela expirou ou não existe.
+        """
+        snapshot = self.load()
+        seen_generation = snapshot.get('generation') if snapshot else None
+
+        if snapshot:
+            if self.restore(driver, snapshot, url):
+                print("[SESSION] Sessão salva reutilizada - login dispensado")
+                self._count('reused')
+                return True
+            print("[SESSION] Sessão salva expirou (redirecionou para o login)")
+            self._count('expired')
+
+        with self.refresh_lock():
+            # Outro worker pode ter renovado a sessão enquanto este esperava o lock
+            snapshot = self.load()
+            if snapshot and snapshot.get('generation') != seen_generation:
+                if self.restore(driver, snapshot, url):
+                    print("[SESSION] Sessão renovada por outro worker reutilizada")
+                    self._count('shared_refresh')
+                    return True
+
+            self.invalidate(seen_generation)
+            if not login_fn():
+                self._count('login_failures')
+                return False
+
+            self._count('logins')
+            # login_fn pode "seguir mesmo assim" sem ter saído da tela de login
+            if not self.is_authenticated(driver, timeout=5):
+                print("[WARN] Login não confirmado - sessão não será salva")
+                return True
+            try:
+                self.save(driver)
+                print("[SESSION] Sessão do HikCentral salva para os próximos jobs")
+            except Exception as e:
+                print(f"[WARN] Não foi possível salvar a sessão: {e}")
+            return True
+
+    def get_metrics(self):
+        with self.metrics_lock:
+            metrics = dict(self.metrics)
+        snapshot = self.load()
+        metrics['saved_session_age'] = round(time.time() - snapshot['saved_at'], 1) if snapshot else None
+        return metrics
+
+
+# Instância compartilhada pelos scripts e pelos workers do mesmo processo
+session_store = SessionStore()
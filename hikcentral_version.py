@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🏷️ HIKCENTRAL VERSION - VERSÃO DO HIKCENTRAL PARA OS CACHES
+===========================================================
+O cache de seletores e o cache de rotas são separados por versão do
+HikCentral: uma atualização muda o DOM e as rotas da SPA, e o que foi
+aprendido na versão antiga não deve ser usado na nova.
+
+A versão é lida da própria página a cada sessão estabelecida (depois do
+login ou da sessão salva reaproveitada, inclusive reautenticações do pool),
+na ordem:
+1. texto de versão exibido na página (rodapé do login / "Sobre")
+2. meta tag de versão
+3. hash do bundle da aplicação (app.<hash>.js) - muda a cada atualização
+
+HIKCENTRAL_VERSION fixa a versão e desliga a detecção.
+"""
+
+import re
+import logging
+import threading
+
+from selector_cache import HIKCENTRAL_VERSION, selector_cache
+from hikcentral_routes import route_cache
+
+# Texto de versão, meta tag e scripts da página atual
+VERSION_PROBE_JS = """
+var texts = [];
+document.querySelectorAll('[class*="version"], [id*="version"], .about, .login-footer, footer').forEach(function(el) {
+    if (el.textContent) { texts.push(el.textContent.trim().slice(0, 200)); }
+});
+var meta = document.querySelector('meta[name="version"], meta[name="app-version"], meta[name="build-version"]');
+var scripts = Array.prototype.map.call(document.querySelectorAll('script[src]'), function(s) { return s.src; });
+return {texts: texts, meta: meta ? meta.content : null, scripts: scripts};
+"""
+
+_VERSION_TEXT = re.compile(r'\bV?(\d+\.\d+(?:\.\d+){0,2})(?:\s*build\s*(\d+))?', re.IGNORECASE)
+_BUNDLE_HASH = re.compile(r'/(?:app|main|index)[.-]([0-9a-f]{6,})(?:\.chunk)?\.js', re.IGNORECASE)
+
+_lock = threading.Lock()  # troca de versão dos dois caches de uma vez
+
+
+def parse_version(probe):
+    """Versão a partir do resultado do VERSION_PROBE_JS; None se nada identificável"""
+    for text in probe.get('texts') or []:
+        match = _VERSION_TEXT.search(text)
+        if match:
+            version, build = match.groups()
+            return f"v{version}" + (f"-b{build}" if build else '')
+
+    if probe.get('meta'):
+        return probe['meta'].strip()
+
+    for src in probe.get('scripts') or []:
+        match = _BUNDLE_HASH.search(src)
+        if match:
+            return f"bundle-{match.group(1).lower()}"
+    return None
+
+
+def ensure_version(driver):
+    """
+    Detecta a versão na sessão que acabou de ser estabelecida (Chrome novo do
+    pool, reautenticação ou login completo) e passa a usá-la nos caches de
+    seletores e rotas. Como a detecção roda a cada sessão, uma atualização
+    do HikCentral com o servidor no ar troca os caches na próxima sessão.
+
+    Returns:
+        str: versão em uso pelos caches
+    """
+    if HIKCENTRAL_VERSION:
+        return HIKCENTRAL_VERSION
+
+    try:
+        version = parse_version(driver.execute_script(VERSION_PROBE_JS) or {})
+    except Exception as e:
+        logging.warning(f"⚠️ Não foi possível ler a versão do HikCentral: {e}")
+        return selector_cache.version
+
+    with _lock:
+        if not version:
+            # Tenta de novo na próxima sessão; até lá segue com a versão atual
+            print(f"[VERSION] Versão do HikCentral não identificada - usando '{selector_cache.version}'")
+            return selector_cache.version
+        if version != selector_cache.version:
+            print(f"[VERSION] HikCentral {version} (antes '{selector_cache.version}')")
+            selector_cache.set_version(version)
+            route_cache.set_version(version)
+        return version
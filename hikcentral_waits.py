@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+⏱️ HIKCENTRAL WAITS - ESPERAS ORIENTADAS A EVENTOS
+=================================================
+Substitui os time.sleep() fixos do fluxo de cadastro por esperas baseadas
+em condições do DOM:
+- elemento presente / clicável / visível
+- máscara de carregamento do Element-UI (.el-loading-mask) sumiu
+- rede ociosa (nenhum XHR/fetch pendente)
+- message box do Element-UI fechada
+
+Cada etapa (login, navegação, preenchimento, finalização) tem um orçamento
+de tempo próprio, e o relatório mostra quanto foi realmente esperado contra
+o atraso fixo que existia antes.
+"""
+
+import os
+import time
+from contextlib import contextmanager
+
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+
+# Orçamento máximo de espera por etapa (segundos)
+STEP_BUDGETS = {
+    'login': int(os.getenv('WAIT_BUDGET_LOGIN', '60')),
+    'navigate_to_form': int(os.getenv('WAIT_BUDGET_NAVIGATION', '45')),
+    'fill_fields': int(os.getenv('WAIT_BUDGET_FILL', '90')),
+    'finalize': int(os.getenv('WAIT_BUDGET_FINALIZE', '60')),
+}
+DEFAULT_BUDGET = 60
+POLL_INTERVAL = 0.1
+NETWORK_QUIET_PERIOD = 0.3  # segundos sem requisições para considerar a rede ociosa
+
+LOADING_MASK_SELECTOR = ".el-loading-mask"
+MESSAGE_BOX_SELECTOR = ".el-message-box__wrapper"
+SUCCESS_MESSAGE_SELECTOR = ".el-message--success, .el-notification .el-icon-success"
+
+# Conta XHR/fetch pendentes; reinstalado após cada carregamento completo de página
+NETWORK_HOOK_JS = """
+if (!window.__hikNet) {
+    window.__hikNet = {pending: 0};
+    var net = window.__hikNet;
+    var send = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function() {
+        net.pending++;
+        this.addEventListener('loadend', function() { net.pending = Math.max(0, net.pending - 1); });
+        return send.apply(this, arguments);
+    };
+    if (window.fetch) {
+        var origFetch = window.fetch;
+        window.fetch = function() {
+            net.pending++;
+            return origFetch.apply(this, arguments).finally(function() {
+                net.pending = Math.max(0, net.pending - 1);
+            });
+        };
+    }
+}
+return [window.__hikNet.pending,
+        (window.performance && performance.getEntriesByType) ? performance.getEntriesByType('resource').length : 0];
+"""
+
+# Existe algum elemento visível para o seletor CSS? (sem passar pelo implicit wait)
+ANY_VISIBLE_JS = """
+var nodes = document.querySelectorAll(arguments[0]);
+for (var i = 0; i < nodes.length; i++) {
+    var style = window.getComputedStyle(nodes[i]);
+    // getClientRects também cobre elementos position:fixed (offsetParent é null neles)
+    if (nodes[i].getClientRects().length && style.display !== 'none' && style.visibility !== 'hidden') { return true; }
+}
+return false;
+"""
+
+# Existe algum elemento visível para o XPath? (mesmo critério do ANY_VISIBLE_JS)
+ANY_VISIBLE_XPATH_JS = """
+var result = document.evaluate(arguments[0], document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+for (var i = 0; i < result.snapshotLength; i++) {
+    var node = result.snapshotItem(i);
+    var style = window.getComputedStyle(node);
+    if (node.getClientRects().length && style.display !== 'none' && style.visibility !== 'hidden') { return true; }
+}
+return false;
+"""
+
+
+class WaitEngine:
+    """Camada de esperas por condição do DOM com orçamento e relatório por etapa"""
+
+    def __init__(self, driver, budgets=None):
+        self.driver = driver
+        self.budgets = budgets or STEP_BUDGETS
+        self.current_step = None
+        self.deadline = None
+        self.entries = []
+
+    # ========== ORÇAMENTO POR ETAPA ==========
+
+    @contextmanager
+    def step(self, name, budget=None):
+        """Define a etapa atual e o orçamento de espera dela"""
+        previous = (self.current_step, self.deadline)
+        self.current_step = name
+        self.deadline = time.monotonic() + (budget or self.budgets.get(name, DEFAULT_BUDGET))
+        try:
+            yield self
+        finally:
+            self.current_step, self.deadline = previous
+
+    def _timeout(self, timeout):
+        """Limita o timeout ao que resta do orçamento da etapa"""
+        if self.deadline is None:
+            return timeout
+        return max(0, min(timeout, self.deadline - time.monotonic()))
+
+    def _record(self, label, started, legacy, met):
+        self.entries.append({
+            'step': self.current_step or 'unscoped',
+            'label': label,
+            'waited': time.monotonic() - started,
+            'legacy': legacy,
+            'met': met
+        })
+
+    def _until(self, condition, timeout, label, legacy):
+        """Aguarda condição; retorna valor da condição ou None se esgotar o tempo"""
+        started = time.monotonic()
+        try:
+            value = WebDriverWait(self.driver, self._timeout(timeout), poll_frequency=POLL_INTERVAL).until(condition)
+            self._record(label, started, legacy, True)
+            return value
+        except TimeoutException:
+            self._record(label, started, legacy, False)
+            return None
+
+    # ========== ELEMENTOS ==========
+
+    def element(self, locator, timeout=10, legacy=0, label=None):
+        """Elemento presente no DOM (levanta TimeoutException como o WebDriverWait)"""
+        value = self._until(EC.presence_of_element_located(locator), timeout, label or f"present {locator[1]}", legacy)
+        if value is None:
+            raise TimeoutException(f"Elemento não encontrado: {locator[1]}")
+        return value
+
+    def clickable(self, locator, timeout=10, legacy=0, label=None):
+        """Elemento visível e habilitado (levanta TimeoutException)"""
+        value = self._until(EC.element_to_be_clickable(locator), timeout, label or f"clickable {locator[1]}", legacy)
+        if value is None:
+            raise TimeoutException(f"Elemento não clicável: {locator[1]}")
+        return value
+
+    def visible(self, locator, timeout=10, legacy=0, label=None):
+        """Elemento visível; retorna o elemento ou None"""
+        return self._until(EC.visibility_of_element_located(locator), timeout, label or f"visible {locator[1]}", legacy)
+
+    def gone(self, css_selector, timeout=10, legacy=0, label=None):
+        """Nenhum elemento visível para o seletor CSS; retorna True/False"""
+        return bool(self._until(
+            lambda d: not d.execute_script(ANY_VISIBLE_JS, css_selector),
+            timeout, label or f"gone {css_selector}", legacy
+        ))
+
+    # ========== ESTADO DA PÁGINA ==========
+
+    def page_ready(self, timeout=30, legacy=0):
+        """document.readyState == 'complete'"""
+        return bool(self._until(
+            lambda d: d.execute_script("return document.readyState") == 'complete',
+            timeout, 'page ready', legacy
+        ))
+
+    def url_changed(self, predicate, timeout=10, legacy=0, label='url'):
+        """URL atual satisfaz o predicado"""
+        return bool(self._until(lambda d: predicate(d.current_url), timeout, label, legacy))
+
+    def loading_done(self, timeout=15, legacy=0):
+        """Nenhuma máscara de carregamento do Element-UI visível"""
+        return self.gone(LOADING_MASK_SELECTOR, timeout, legacy, label='loading mask gone')
+
+    def network_idle(self, timeout=10, legacy=0, quiet=NETWORK_QUIET_PERIOD):
+        """Nenhum XHR/fetch pendente e nenhum recurso novo durante o período de silêncio"""
+        state = {'since': None, 'resources': None}
+
+        def idle(driver):
+            try:
+                pending, resources = driver.execute_script(NETWORK_HOOK_JS)
+            except Exception:
+                return False
+            now = time.monotonic()
+            if pending or resources != state['resources']:
+                state['since'] = now
+                state['resources'] = resources
+                return False
+            return now - state['since'] >= quiet
+
+        return bool(self._until(idle, timeout, 'network idle', legacy))
+
+    def message_box_closed(self, timeout=5, legacy=0):
+        """Message box do Element-UI fechada (ou inexistente)"""
+        return self.gone(MESSAGE_BOX_SELECTOR, timeout, legacy, label='message box closed')
+
+    def save_confirmed(self, dialog_xpath=None, timeout=20, legacy=0):
+        """
+        Salvamento confirmado pela interface, em vez de um período de silêncio:
+        - 'message': mensagem de sucesso do Element-UI visível
+        - 'closed': o diálogo (dialog_xpath) fechou e a lista recarregou
+          (sem máscara de carregamento e sem XHR/fetch pendente)
+
+        Retorna o sinal observado ou None se nada confirmou dentro do timeout.
+        """
+        def confirmed(driver):
+            try:
+                if driver.execute_script(ANY_VISIBLE_JS, SUCCESS_MESSAGE_SELECTOR):
+                    return 'message'
+                if dialog_xpath is None or driver.execute_script(ANY_VISIBLE_XPATH_JS, dialog_xpath):
+                    return False
+                if driver.execute_script(ANY_VISIBLE_JS, LOADING_MASK_SELECTOR):
+                    return False
+                pending, _resources = driver.execute_script(NETWORK_HOOK_JS)
+                return 'closed' if not pending else False
+            except Exception:
+                return False
+
+        return self._until(confirmed, timeout, 'save confirmed', legacy)
+
+    def settle(self, legacy=0, timeout=10, quiet=NETWORK_QUIET_PERIOD):
+        """
+        Substituto genérico de time.sleep(legacy) após uma ação na SPA:
+        espera a máscara de carregamento sumir e a rede ficar ociosa.
+        """
+        started = time.monotonic()
+        step_entries = len(self.entries)
+        met = self.loading_done(timeout)
+        met = self.network_idle(timeout, quiet=quiet) and met
+        # Consolidar as duas esperas em uma única entrada do relatório
+        del self.entries[step_entries:]
+        self._record('settle', started, legacy, met)
+        return met
+
+    # ========== RELATÓRIO ==========
+
+    def report(self):
+        """Tempo esperado x atraso fixo antigo, agrupado por etapa"""
+        steps = {}
+        for entry in self.entries:
+            step = steps.setdefault(entry['step'], {'waited': 0.0, 'legacy': 0.0, 'waits': 0, 'timeouts': 0})
+            step['waited'] += entry['waited']
+            step['legacy'] += entry['legacy']
+            step['waits'] += 1
+            if not entry['met']:
+                step['timeouts'] += 1
+
+        for step in steps.values():
+            step['saved'] = round(step['legacy'] - step['waited'], 2) + 0.0  # evita -0.0
+            step['waited'] = round(step['waited'], 2)
+            step['legacy'] = round(step['legacy'], 2)
+        return steps
+
+    def print_report(self):
+        print("\n[WAITS] Espera real x atraso fixo antigo:")
+        for name, step in self.report().items():
+            print(f"[WAITS] {name}: {step['waited']:.1f}s esperados (antes {step['legacy']:.1f}s fixos, "
+                  f"economia {step['saved']:.1f}s, {step['waits']} esperas, {step['timeouts']} timeouts)")
+
+    def reset(self):
+        self.entries = []
@@ -16,6 +16,9 @@ from pathlib import Path
 from PIL import Image, ImageOps
 import logging
 
+from photo_storage import photo_cache, materialize_queue_photo
+from supabase_rest import get_client
+
 # Configurações
 PHOTOS_DIR = Path("photos")
 TEMP_DIR = Path("temp")
@@ -59,54 +62,38 @@ class PhotoManager:
             # Decodificar base64
             photo_bytes = base64.b64decode(base64_data)
             
-            # Gerar nome único para arquivo
-            timestamp = int(time.time())
-            photo_filename = f"{visitor_id}_{timestamp}.jpg"
-            photo_path = self.photos_dir / photo_filename
-            
-            # Abrir imagem para processamento
-            with Image.open(io.BytesIO(photo_bytes)) as img:
-                # Converter para RGB se necessário
-                if img.mode != 'RGB':
-                    img = img.convert('RGB')
-                
-                # Rotacionar se necessário (baseado em EXIF)
-                img = ImageOps.exif_transpose(img)
-                
-                # Redimensionar se muito grande
-                if img.size[0] > MAX_PHOTO_SIZE[0] or img.size[1] > MAX_PHOTO_SIZE[1]:
-                    img.thumbnail(MAX_PHOTO_SIZE, Image.Resampling.LANCZOS)
-                    logger.info(f"🔄 Imagem redimensionada para: {img.size}")
-                
-                # Salvar imagem otimizada
-                img.save(photo_path, 'JPEG', quality=JPEG_QUALITY, optimize=True)
-            
-            # Calcular tamanho do arquivo
-            file_size = photo_path.stat().st_size
+            return self._save_optimized_photo(visitor_id, io.BytesIO(photo_bytes), metadata)
             
-            # Criar metadados
-            photo_info = {
-                'visitor_id': visitor_id,
-                'filename': photo_filename,
-                'filepath': str(photo_path),
-                'file_size': file_size,
-                'timestamp': timestamp,
-                'width': img.size[0],
-                'height': img.size[1],
-                'metadata': metadata or {}
-            }
-            
-            # Salvar metadados em JSON
-            metadata_path = self.photos_dir / f"{visitor_id}_{timestamp}.json"
-            with open(metadata_path, 'w') as f:
-                json.dump(photo_info, f, indent=2)
-            
-            logger.info(f"✅ Foto salva: {photo_filename} ({file_size} bytes)")
+        except Exception as e:
+            logger.error(f"❌ Erro ao salvar foto: {e}")
             return {
-                'success': True,
-                'photo_info': photo_info,
-                'message': 'Foto salva com sucesso'
+                'success': False,
+                'error': str(e),
+                'message': 'Erro ao processar foto'
             }
+    
+    def save_photo_from_storage(self, visitor_id: str, photo_key: str, photo_sha256: str,
+                                metadata: dict = None) -> dict:
+        """
+        Salva foto que está no Storage (photo_key/photo_sha256 da fila)
+        
+        Os bytes são baixados em streaming para o cache local de fotos
+        (photo_storage) e abertos direto do disco, sem base64.
+        
+        Args:
+            visitor_id: ID único do visitante
+            photo_key: Chave do objeto no bucket de fotos
+            photo_sha256: SHA-256 dos bytes da foto
+            metadata: Metadados opcionais (nome, cpf, etc.)
+        
+        Returns:
+            dict: Informações da foto salva
+        """
+        try:
+            logger.info(f"📸 Salvando foto do Storage para visitante: {visitor_id}")
+            
+            cached_path = photo_cache.fetch(get_client(), {'photo_key': photo_key, 'photo_sha256': photo_sha256})
+            return self._save_optimized_photo(visitor_id, cached_path, metadata)
             
         except Exception as e:
             logger.error(f"❌ Erro ao salvar foto: {e}")
@@ -116,6 +103,57 @@ class PhotoManager:
                 'message': 'Erro ao processar foto'
             }
     
+    def _save_optimized_photo(self, visitor_id: str, source, metadata: dict = None) -> dict:
+        """Redimensiona e grava a foto (caminho ou arquivo em memória) em photos/ com metadados"""
+        # Gerar nome único para arquivo
+        timestamp = int(time.time())
+        photo_filename = f"{visitor_id}_{timestamp}.jpg"
+        photo_path = self.photos_dir / photo_filename
+        
+        # Abrir imagem para processamento
+        with Image.open(source) as img:
+            # Converter para RGB se necessário
+            if img.mode != 'RGB':
+                img = img.convert('RGB')
+            
+            # Rotacionar se necessário (baseado em EXIF)
+            img = ImageOps.exif_transpose(img)
+            
+            # Redimensionar se muito grande
+            if img.size[0] > MAX_PHOTO_SIZE[0] or img.size[1] > MAX_PHOTO_SIZE[1]:
+                img.thumbnail(MAX_PHOTO_SIZE, Image.Resampling.LANCZOS)
+                logger.info(f"🔄 Imagem redimensionada para: {img.size}")
+            
+            # Salvar imagem otimizada
+            img.save(photo_path, 'JPEG', quality=JPEG_QUALITY, optimize=True)
+        
+        # Calcular tamanho do arquivo
+        file_size = photo_path.stat().st_size
+        
+        # Criar metadados
+        photo_info = {
+            'visitor_id': visitor_id,
+            'filename': photo_filename,
+            'filepath': str(photo_path),
+            'file_size': file_size,
+            'timestamp': timestamp,
+            'width': img.size[0],
+            'height': img.size[1],
+            'metadata': metadata or {}
+        }
+        
+        # Salvar metadados em JSON
+        metadata_path = self.photos_dir / f"{visitor_id}_{timestamp}.json"
+        with open(metadata_path, 'w') as f:
+            json.dump(photo_info, f, indent=2)
+        
+        logger.info(f"✅ Foto salva: {photo_filename} ({file_size} bytes)")
+        return {
+            'success': True,
+            'photo_info': photo_info,
+            'message': 'Foto salva com sucesso'
+        }
+    
     def get_photo_base64(self, visitor_id: str) -> dict:
         """
         Obtém foto em base64 para um visitante
@@ -169,31 +207,38 @@ class PhotoManager:
                 'message': 'Erro ao carregar foto'
             }
     
-    def save_photo_for_automation(self, visitor_id: str, base64_data: str) -> str:
+    def save_photo_for_automation(self, visitor_id: str, base64_data: str = None,
+                                  photo_key: str = None, photo_sha256: str = None) -> str:
         """
         Salva foto especificamente para uso na automação
         
+        Com photo_key/photo_sha256 a foto vem do Storage pelo cache local
+        (hardlink ou cópia, sem decodificar nada); base64_data fica para
+        chamadas antigas.
+        
         Args:
             visitor_id: ID do visitante
-            base64_data: Dados da foto em base64
+            base64_data: Dados da foto em base64 (legado)
+            photo_key: Chave do objeto no bucket de fotos
+            photo_sha256: SHA-256 dos bytes da foto
         
         Returns:
             str: Caminho para arquivo temporário da foto
         """
         try:
-            # Limpar header do base64
-            if ',' in base64_data:
-                base64_data = base64_data.split(',')[1]
-            
             # Gerar arquivo temporário
             temp_filename = f"automation_{visitor_id}_{int(time.time())}.jpg"
             temp_path = self.temp_dir / temp_filename
             
-            # Decodificar e salvar
-            photo_bytes = base64.b64decode(base64_data)
+            item = {'photo_key': photo_key, 'photo_sha256': photo_sha256, 'photo_base64': base64_data}
+            if photo_key:
+                client = get_client()
+            else:
+                client = None  # base64 já veio na requisição: nada a baixar
+                item['has_photo'] = False
             
-            with open(temp_path, 'wb') as f:
-                f.write(photo_bytes)
+            if not materialize_queue_photo(client, item, str(temp_path)):
+                return None
             
             logger.info(f"📸 Foto temporária salva para automação: {temp_filename}")
             return str(temp_path)
@@ -311,6 +356,13 @@ def save_visitor_photo(visitor_id: str, base64_data: str, metadata: dict = None)
     """
     return photo_manager.save_photo_from_base64(visitor_id, base64_data, metadata)
 
+def save_visitor_photo_from_storage(visitor_id: str, photo_key: str, photo_sha256: str,
+                                    metadata: dict = None) -> dict:
+    """
+    Função utilitária para salvar foto de visitante que está no Storage
+    """
+    return photo_manager.save_photo_from_storage(visitor_id, photo_key, photo_sha256, metadata)
+
 def get_visitor_photo_path(visitor_id: str) -> str:
     """
     Função utilitária para obter caminho da foto mais recente
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🗄️ PHOTO STORAGE - FOTOS DA FILA NO STORAGE + CACHE LOCAL POR CONTEÚDO
+=====================================================================
+A foto ia em base64 dentro de visitor_registration_queue.photo_base64:
+33% maior que o JPEG, linhas pesadas no Postgres e decodificação em cada
+serviço (save_photo, PhotoManager.save_photo_from_base64,
+save_photo_for_automation).
+
+Agora o frontend envia os bytes para o bucket PHOTO_BUCKET do Supabase
+Storage (qualquer servidor compatível com a API /storage/v1 serve de
+stand-in local) e a linha da fila guarda só photo_key e photo_sha256.
+
+Do lado Windows, PhotoCache:
+
+- baixa o objeto em streaming (PHOTO_CHUNK_SIZE por vez) direto para o
+  disco, calculando o SHA-256 durante o download, e só publica o arquivo
+  se o hash confere
+- endereça o cache pelo SHA-256: reativação, retentativa ou outro cadastro
+  com a mesma foto reaproveitam o arquivo já baixado
+- limita o cache a PHOTO_CACHE_MAX_MB, removendo os menos usados (mtime)
+- itens antigos com photo_base64 continuam funcionando (decodificados uma
+  vez para o mesmo cache)
+
+materialize_queue_photo() entrega a foto no caminho que o serviço já usava
+(hardlink do cache, ou cópia), então a limpeza do arquivo temporário de
+cada serviço não mexe no cache.
+"""
+
+import os
+import re
+import base64
+import shutil
+import hashlib
+import logging
+import threading
+
+from supabase_queue import fetch_queue_photo
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+PHOTO_BUCKET = os.getenv('PHOTO_BUCKET', 'visitor-photos')
+PHOTO_CACHE_DIR = os.getenv('PHOTO_CACHE_DIR', os.path.join(SCRIPT_DIR, 'photo_cache'))
+PHOTO_CACHE_MAX_MB = float(os.getenv('PHOTO_CACHE_MAX_MB', '200'))
+PHOTO_CHUNK_SIZE = int(os.getenv('PHOTO_CHUNK_SIZE', str(64 * 1024)))
+
+_SHA256 = re.compile(r'^[0-9a-f]{64}$')
+
+
+def photo_key_for(sha256):
+    """Chave do objeto no bucket: queue/<2 primeiros hex>/<sha256>.jpg"""
+    return f"queue/{sha256[:2]}/{sha256}.jpg"
+
+
+def decode_base64_photo(photo_base64):
+    """Bytes de uma foto em base64 (aceita prefixo data:image/...;base64,)"""
+    if photo_base64.startswith('data:image'):
+        photo_base64 = photo_base64.split(',', 1)[1]
+    return base64.b64decode(photo_base64)
+
+
+def upload_photo(client, data, content_type='image/jpeg', bucket=PHOTO_BUCKET):
+    """
+    Envia os bytes da foto para o Storage com chave pelo SHA-256.
+
+    Args:
+        client: supabase_rest.SupabaseRest
+
+    Returns:
+        dict: photo_key, photo_sha256 e photo_size para gravar na linha da fila
+
+    Raises:
+        requests.RequestException: falha de rede ou resposta HTTP de erro
+    """
+    sha256 = hashlib.sha256(data).hexdigest()
+    key = photo_key_for(sha256)
+    # Mesmo conteúdo = mesma chave: repetir o upload (x-upsert) é inofensivo
+    response = client.request('POST', f"/storage/v1/object/{bucket}/{key}", data=data,
+                              headers={'Content-Type': content_type, 'x-upsert': 'true'},
+                              idempotent=True, endpoint=f"POST /storage/v1/object/{bucket}")
+    response.raise_for_status()
+    return {'photo_key': key, 'photo_sha256': sha256, 'photo_size': len(data)}
+
+
+class PhotoCache:
+    """Cache local de fotos endereçado pelo SHA-256 dos bytes"""
+
+    def __init__(self, directory=PHOTO_CACHE_DIR, max_bytes=int(PHOTO_CACHE_MAX_MB * 1024 * 1024),
+                 chunk_size=PHOTO_CHUNK_SIZE, bucket=PHOTO_BUCKET):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        self.bucket = bucket
+        self.locks = {}
+        self.locks_lock = threading.Lock()
+        self.metrics_lock = threading.Lock()
+        self.metrics = {'hits': 0, 'downloads': 0, 'bytes_downloaded': 0, 'legacy_decoded': 0,
+                        'hash_mismatches': 0, 'evicted': 0}
+
+    def path_for(self, sha256):
+        if not _SHA256.match(sha256 or ''):
+            raise ValueError(f"photo_sha256 inválido: {sha256!r}")
+        return os.path.join(self.directory, sha256[:2], f"{sha256}.jpg")
+
+    def _lock_for(self, sha256):
+        with self.locks_lock:
+            return self.locks.setdefault(sha256, threading.Lock())
+
+    def _count(self, name, amount=1):
+        with self.metrics_lock:
+            self.metrics[name] += amount
+
+    # ========== LEITURA ==========
+
+    def get(self, sha256):
+        """Caminho da foto se já estiver no cache (atualiza o mtime para o LRU)"""
+        path = self.path_for(sha256)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        self._count('hits')
+        return path
+
+    def download(self, client, key, sha256):
+        """
+        Baixa o objeto `key` do bucket em streaming para o cache, conferindo o SHA-256.
+
+        Returns:
+            str: caminho da foto no cache
+
+        Raises:
+            requests.RequestException: falha de rede ou resposta HTTP de erro
+            ValueError: bytes baixados não conferem com photo_sha256
+        """
+        with self._lock_for(sha256):
+            # Outro worker pode ter baixado enquanto esperávamos o lock
+            path = self.get(sha256)
+            if path:
+                return path
+
+            path = self.path_for(sha256)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.part"
+            digest = hashlib.sha256()
+            size = 0
+
+            response = client.request('GET', f"/storage/v1/object/{self.bucket}/{key}", stream=True,
+                                      endpoint=f"GET /storage/v1/object/{self.bucket}")
+            try:
+                response.raise_for_status()
+                with open(tmp_path, 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=self.chunk_size):
+                        digest.update(chunk)
+                        f.write(chunk)
+                        size += len(chunk)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            finally:
+                response.close()
+
+            if digest.hexdigest() != sha256:
+                os.remove(tmp_path)
+                self._count('hash_mismatches')
+                raise ValueError(f"Foto {key} não confere com photo_sha256 ({digest.hexdigest()[:12]}...)")
+
+            os.replace(tmp_path, path)
+            self._count('downloads')
+            self._count('bytes_downloaded', size)
+            logging.info(f"📥 Foto baixada para o cache: {key} ({size} bytes)")
+
+        self.evict()
+        return path
+
+    def put_bytes(self, data):
+        """Grava bytes já em memória (photo_base64 legado) no cache; retorna o caminho"""
+        sha256 = hashlib.sha256(data).hexdigest()
+        with self._lock_for(sha256):
+            path = self.get(sha256)
+            if path:
+                return path
+            path = self.path_for(sha256)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.part"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            self._count('legacy_decoded')
+        self.evict()
+        return path
+
+    def fetch(self, client, item):
+        """
+        Foto do item da fila no cache: pelo Storage (photo_key/photo_sha256)
+        ou, em itens antigos, decodificando photo_base64.
+
+        Returns:
+            str | None: caminho no cache, ou None se o item não tem foto
+        """
+        if item.get('photo_key') and item.get('photo_sha256'):
+            return self.get(item['photo_sha256']) or self.download(client, item['photo_key'], item['photo_sha256'])
+
+        photo_base64 = fetch_queue_photo(client, item)
+        if not photo_base64:
+            return None
+        return self.put_bytes(decode_base64_photo(photo_base64))
+
+    # ========== LIMPEZA ==========
+
+    def evict(self):
+        """Remove as fotos menos usadas até o cache caber em max_bytes"""
+        files = []
+        total = 0
+        for root, _dirs, names in os.walk(self.directory):
+            for name in names:
+                if not name.endswith('.jpg'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+        if total <= self.max_bytes:
+            return 0
+        removed = 0
+        for _mtime, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        self._count('evicted', removed)
+        return removed
+
+    def get_metrics(self):
+        with self.metrics_lock:
+            return dict(self.metrics)
+
+
+# Instância global (compartilhada pelos workers do processo)
+photo_cache = PhotoCache()
+
+
+def materialize_queue_photo(client, item, dest_path):
+    """
+    Coloca a foto do item em dest_path (hardlink do cache ou cópia).
+
+    O arquivo em dest_path pode ser apagado pelo serviço depois do job: a
+    cópia do cache continua lá para a próxima reativação.
+
+    Returns:
+        str | None: dest_path, ou None se o item não tem foto
+
+    Raises:
+        requests.RequestException, ValueError: falha no download ou hash divergente
+    """
+    cached_path = photo_cache.fetch(client, item)
+    if not cached_path:
+        return None
+
+    if os.path.exists(dest_path):
+        os.remove(dest_path)
+    try:
+        os.link(cached_path, dest_path)
+    except OSError:
+        shutil.copyfile(cached_path, dest_path)  # outro disco ou sistema de arquivos sem hardlink
+    return dest_path
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🚦 PRIORITY JOB QUEUE - FILA LOCAL COM PRIORIDADE E ENVELHECIMENTO
+=================================================================
+automation_queue era um queue.Queue FIFO, enquanto visitor_registration_queue
+(Supabase) já tem a coluna priority (1=baixa, 5=alta) e get_next_queue_item()
+ordena por priority DESC, created_at ASC.
+
+Esta fila mantém a interface do queue.Queue (put/get/task_done/qsize/empty)
+e entrega primeiro o job de maior prioridade efetiva:
+
+    prioridade efetiva = priority + segundos esperando / QUEUE_AGING_SECONDS
+
+Como todos os jobs envelhecem no mesmo ritmo, a ordem entre dois jobs não
+muda com o tempo e cabe num heap com chave fixa (enfileirado_em -
+priority * QUEUE_AGING_SECONDS): um job de prioridade 1 passa na frente de um
+de prioridade 5 recém-chegado depois de esperar 4 * QUEUE_AGING_SECONDS.
+
+Sem prioridade explícita, reativações (visitante já na portaria) recebem
+PRIORITY_REACTIVATE e o resto PRIORITY_DEFAULT.
+"""
+
+import os
+import time
+import heapq
+import queue
+import itertools
+from collections import deque
+
+PRIORITY_DEFAULT = int(os.getenv('PRIORITY_DEFAULT', '1'))
+PRIORITY_REACTIVATE = int(os.getenv('PRIORITY_REACTIVATE', '3'))
+QUEUE_AGING_SECONDS = float(os.getenv('QUEUE_AGING_SECONDS', '120'))  # espera que vale 1 nível de prioridade
+WAIT_SAMPLES = 500  # esperas guardadas por classe para os percentis
+
+
+def job_priority(visitor_data, explicit=None):
+    """Prioridade do job: explícita (API/Supabase) ou pela ação do visitante"""
+    value = explicit if explicit is not None else (visitor_data or {}).get('priority')
+    if value is not None:
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            pass
+    if (visitor_data or {}).get('action') == 'reactivate':
+        return PRIORITY_REACTIVATE
+    return PRIORITY_DEFAULT
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class PriorityJobQueue(queue.Queue):
+    """queue.Queue com prioridade por item (item['priority']) e envelhecimento"""
+
+    def __init__(self, maxsize=0, aging_seconds=QUEUE_AGING_SECONDS):
+        self.aging_seconds = aging_seconds
+        super().__init__(maxsize)
+
+    # Ganchos do queue.Queue (chamados com self.mutex já adquirido)
+
+    def _init(self, maxsize):
+        self.queue = []
+        self.sequence = itertools.count()  # desempate: ordem de chegada
+        self.depth = {}
+        self.waits = {}
+
+    def _qsize(self):
+        return len(self.queue)
+
+    def _put(self, item):
+        priority = item.get('priority', PRIORITY_DEFAULT) if isinstance(item, dict) else PRIORITY_DEFAULT
+        enqueued_at = time.monotonic()
+        key = enqueued_at - priority * self.aging_seconds
+        heapq.heappush(self.queue, (key, next(self.sequence), priority, enqueued_at, item))
+        self.depth[priority] = self.depth.get(priority, 0) + 1
+
+    def _get(self):
+        _, _, priority, enqueued_at, item = heapq.heappop(self.queue)
+        self.depth[priority] -= 1
+        self.waits.setdefault(priority, deque(maxlen=WAIT_SAMPLES)).append(time.monotonic() - enqueued_at)
+        return item
+
+    # ========== MÉTRICAS ==========
+
+    def get_metrics(self):
+        """Profundidade e espera (p50/p90/p99, s) por classe de prioridade"""
+        with self.mutex:
+            depth = dict(self.depth)
+            waits = {priority: list(samples) for priority, samples in self.waits.items()}
+
+        classes = {}
+        for priority in sorted(set(depth) | set(waits), reverse=True):
+            samples = waits.get(priority, [])
+            classes[str(priority)] = {
+                'queued': depth.get(priority, 0),
+                'dispatched': len(samples),
+                'wait_p50': round(percentile(samples, 50), 2) if samples else None,
+                'wait_p90': round(percentile(samples, 90), 2) if samples else None,
+                'wait_p99': round(percentile(samples, 99), 2) if samples else None
+            }
+        return {'aging_seconds': self.aging_seconds, 'classes': classes}
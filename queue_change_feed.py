@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🔔 QUEUE CHANGE FEED - AVISO DE NOVOS CADASTROS NA FILA (LISTEN/NOTIFY)
+======================================================================
+Os serviços Windows dormiam um intervalo fixo (15s no monitor, POLL_INTERVAL
+nos demais) entre consultas: o cadastro esperava em média meio intervalo só
+para ser visto, e o Supabase recebia consultas mesmo com a fila vazia.
+
+O trigger notify_visitor_queue (database/queue_table.sql) faz pg_notify no
+canal visitor_registration_queue quando um item entra (ou volta) como
+pending. Com QUEUE_LISTEN_DSN configurado (connection string Postgres do
+Supabase, ou um Postgres local), uma thread faz LISTEN e acorda o loop de
+polling na hora; o claim continua sendo a RPC claim_queue_items.
+
+Sem DSN, sem psycopg2 ou com a conexão caída, vale o polling adaptativo:
+depois de um poll com item o próximo é imediato; a partir do primeiro poll
+vazio o intervalo começa em QUEUE_POLL_MIN_SECONDS e dobra a cada consulta
+vazia até QUEUE_POLL_MAX_SECONDS. Com o LISTEN ativo, o intervalo máximo é
+só a rede de segurança para avisos perdidos.
+
+No Supabase, o LISTEN precisa da conexão direta (porta 5432 ou pooler em
+modo session); o pooler em modo transaction (6543) não entrega NOTIFY.
+
+A métrica pickup_latency mede created_at -> claim (primeira tentativa).
+"""
+
+import os
+import re
+import time
+import select
+import logging
+import threading
+from collections import deque
+from datetime import datetime, timezone
+
+try:
+    import psycopg2
+    import psycopg2.extensions
+except ImportError:
+    psycopg2 = None
+
+QUEUE_LISTEN_DSN = os.getenv('QUEUE_LISTEN_DSN', '')
+QUEUE_NOTIFY_CHANNEL = os.getenv('QUEUE_NOTIFY_CHANNEL', 'visitor_registration_queue')
+QUEUE_POLL_MIN_SECONDS = float(os.getenv('QUEUE_POLL_MIN_SECONDS', '2'))
+QUEUE_POLL_MAX_SECONDS = float(os.getenv('QUEUE_POLL_MAX_SECONDS', '60'))
+QUEUE_LISTEN_RECONNECT_MAX = float(os.getenv('QUEUE_LISTEN_RECONNECT_MAX', '60'))
+LATENCY_SAMPLES = 500  # latências guardadas para os percentis
+
+_FRACTION = re.compile(r'\.(\d+)')
+
+
+def parse_timestamp(value):
+    """Timestamp do PostgREST/psycopg2 (ISO com fração variável, 'Z' ou offset) em datetime UTC"""
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        text = str(value).strip().replace(' ', 'T', 1).replace('Z', '+00:00')
+        # Postgres corta zeros à direita da fração; fromisoformat quer 6 dígitos
+        text = _FRACTION.sub(lambda m: '.' + m.group(1)[:6].ljust(6, '0'), text, count=1)
+        parsed = datetime.fromisoformat(text)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class QueueChangeFeed:
+    """Espera por novos itens da fila: LISTEN/NOTIFY quando disponível, polling adaptativo sempre"""
+
+    def __init__(self, dsn=QUEUE_LISTEN_DSN, channel=QUEUE_NOTIFY_CHANNEL,
+                 min_interval=QUEUE_POLL_MIN_SECONDS, max_interval=QUEUE_POLL_MAX_SECONDS):
+        self.dsn = dsn
+        self.channel = channel
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = min_interval
+        self.notified = threading.Event()
+        self.listening = False
+        self.running = False
+        self.metrics_lock = threading.Lock()
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.metrics = {'notifications': 0, 'wakeups_by_notify': 0, 'wakeups_by_timeout': 0,
+                        'polls': 0, 'empty_polls': 0, 'reconnects': 0}
+
+    # ========== LISTEN ==========
+
+    def start(self):
+        """Inicia a thread de LISTEN (se houver DSN e psycopg2); sem ela fica só o polling"""
+        if not self.dsn:
+            logging.info(f"🔔 QUEUE_LISTEN_DSN não configurado - polling adaptativo "
+                         f"({self.min_interval:g}s a {self.max_interval:g}s)")
+            return self
+        if psycopg2 is None:
+            logging.warning("⚠️ psycopg2 não instalado - polling adaptativo sem LISTEN/NOTIFY "
+                            "(pip install psycopg2-binary)")
+            return self
+        self.running = True
+        threading.Thread(target=self._listen_loop, name='queue-listen', daemon=True).start()
+        return self
+
+    def stop(self):
+        self.running = False
+        self.notified.set()
+
+    def _listen_loop(self):
+        backoff = 1
+        while self.running:
+            conn = None
+            try:
+                conn = psycopg2.connect(self.dsn)
+                conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                conn.cursor().execute(f'LISTEN "{self.channel}"')
+                self.listening = True
+                backoff = 1
+                logging.info(f"🔔 LISTEN ativo no canal {self.channel}")
+                # Acorda o consumidor: itens que chegaram enquanto estava desconectado
+                self.notified.set()
+                while self.running:
+                    if select.select([conn], [], [], 5) == ([], [], []):
+                        continue
+                    conn.poll()
+                    if conn.notifies:
+                        with self.metrics_lock:
+                            self.metrics['notifications'] += len(conn.notifies)
+                        conn.notifies.clear()
+                        self.notified.set()
+            except Exception as e:
+                if self.running:
+                    logging.warning(f"⚠️ LISTEN caiu ({e}) - polling adaptativo, reconectando em {backoff}s")
+                    with self.metrics_lock:
+                        self.metrics['reconnects'] += 1
+            finally:
+                self.listening = False
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+            if self.running:
+                time.sleep(backoff)
+                backoff = min(backoff * 2, QUEUE_LISTEN_RECONNECT_MAX)
+
+    # ========== ESPERA ==========
+
+    def wait(self, found=0):
+        """
+        Dorme até o próximo poll. `found` é quantos itens o último poll trouxe:
+        com item não dorme (pode haver mais na fila) e o intervalo volta ao
+        mínimo; vazio, dorme o intervalo atual e o dobra até o máximo.
+
+        Returns:
+            bool: True se acordou por NOTIFY
+        """
+        with self.metrics_lock:
+            self.metrics['polls'] += 1
+            if not found:
+                self.metrics['empty_polls'] += 1
+        if found:
+            self.interval = self.min_interval
+            return False
+
+        # Com LISTEN ativo, o timeout só cobre avisos perdidos
+        timeout = self.max_interval if self.listening else self.interval
+        self.interval = min(self.interval * 2, self.max_interval)
+
+        woke = self.notified.wait(timeout)
+        self.notified.clear()
+        with self.metrics_lock:
+            self.metrics['wakeups_by_notify' if woke else 'wakeups_by_timeout'] += 1
+        return woke
+
+    # ========== MÉTRICAS ==========
+
+    def record_claims(self, items):
+        """Guarda created_at -> agora dos itens recém-reservados (só primeira tentativa)"""
+        now = datetime.now(timezone.utc)
+        samples = []
+        for item in items or []:
+            if (item.get('attempts') or 1) > 1 or not item.get('created_at'):
+                continue  # retentativa: created_at não mede a espera deste claim
+            try:
+                samples.append((now - parse_timestamp(item['created_at'])).total_seconds())
+            except (TypeError, ValueError):
+                continue
+        with self.metrics_lock:
+            self.latencies.extend(samples)
+        return samples
+
+    def get_metrics(self):
+        with self.metrics_lock:
+            metrics = dict(self.metrics)
+            latencies = list(self.latencies)
+        metrics.update({
+            'mode': 'listen' if self.listening else 'polling',
+            'interval': self.interval,
+            'pickup_latency_p50': round(percentile(latencies, 50), 2) if latencies else None,
+            'pickup_latency_p90': round(percentile(latencies, 90), 2) if latencies else None,
+            'pickup_latency_p99': round(percentile(latencies, 99), 2) if latencies else None,
+            'pickup_samples': len(latencies)
+        })
+        return metrics
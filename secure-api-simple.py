@@ -12,6 +12,9 @@ from urllib.parse import urlparse, parse_qs
 import logging
 import requests
 
+from supabase_queue import QUEUE_ITEM_COLUMNS
+from supabase_rest import get_client
+
 # Configurar logging
 logging.basicConfig(
     level=logging.INFO,
@@ -89,20 +92,15 @@ class SecureAPIHandler(BaseHTTPRequestHandler):
             return {'queue': [], 'total': 0, 'error': 'Configuração inválida'}
         
         try:
-            headers = {
-                'apikey': self.SUPABASE_SERVICE_KEY,
-                'Authorization': f'Bearer {self.SUPABASE_SERVICE_KEY}',
-                'Content-Type': 'application/json'
-            }
-            
-            # Consultar visitantes pendentes
-            url = f"{self.SUPABASE_URL}/rest/v1/visitor_registration_queue"
+            # Consultar visitantes pendentes (sessão compartilhada: keep-alive, timeout e retry)
+            # Só colunas leves: photo_base64 fica fora da listagem (has_photo indica se existe)
             params = {
                 'status': 'eq.pending',
-                'select': '*'
+                'select': QUEUE_ITEM_COLUMNS
             }
             
-            response = requests.get(url, headers=headers, params=params, timeout=10)
+            response = get_client(self.SUPABASE_URL, self.SUPABASE_SERVICE_KEY).request(
+                'GET', '/rest/v1/visitor_registration_queue', params=params)
             
             if response.status_code == 200:
                 visitors = response.json()
@@ -130,6 +128,12 @@ class SecureAPIHandler(BaseHTTPRequestHandler):
                 'details': str(e)
             }
     
+    def supabase_metrics(self):
+        """Latência por endpoint das chamadas ao Supabase (histograma do cliente compartilhado)"""
+        if not self.SUPABASE_URL or not self.SUPABASE_SERVICE_KEY:
+            return {}
+        return get_client(self.SUPABASE_URL, self.SUPABASE_SERVICE_KEY).get_metrics()
+    
     def validate_token(self, token):
         """Valida token e retorna dados"""
         return self.VALID_TOKENS.get(token)
@@ -282,6 +286,7 @@ class SecureAPIHandler(BaseHTTPRequestHandler):
                     'total_tokens': len(self.VALID_TOKENS),
                     'active_requests': sum(len(reqs) for reqs in self.request_counts.values()),
                     'blocked_ips': len(self.blocked_ips),
+                    'supabase_requests': self.supabase_metrics(),
                     'timestamp': datetime.now().isoformat()
                 })
             else:
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🎯 SELECTOR CACHE - CACHE DE SELETORES RESOLVIDOS
+=================================================
+Os scripts do HikCentral testam listas de seletores XPath/CSS em ordem até
+um funcionar. Cada seletor que falha custa o timeout do WebDriverWait mais
+o implicit wait do driver.
+
+Este cache guarda em disco (por etapa e por versão do HikCentral, detectada
+quando a sessão é estabelecida - ver hikcentral_version):
+- o último seletor vencedor, que passa a ser testado primeiro
+- acertos e falhas de cada seletor, para ordenar pela taxa de acerto
+- quais fallbacks estão mortos (nunca acertam) ou nunca são usados
+
+Uso nos loops existentes:
+    for selector in selector_cache.candidates('form.entrada', entrada_selectors):
+        ...
+        selector_cache.hit('form.entrada', selector)
+        break
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+
+SELECTOR_CACHE_FILE = os.getenv('SELECTOR_CACHE_FILE', 'selector_cache.json')
+HIKCENTRAL_VERSION = os.getenv('HIKCENTRAL_VERSION', '')  # vazio: detectada na sessão (hikcentral_version)
+DEFAULT_VERSION = 'default'  # até a versão ser detectada
+DEAD_AFTER = int(os.getenv('SELECTOR_DEAD_AFTER', '5'))  # falhas sem nenhum acerto
+
+
+class SelectorCache:
+    """Cache persistente de seletores vencedores por etapa e versão do HikCentral"""
+
+    def __init__(self, path=SELECTOR_CACHE_FILE, version=HIKCENTRAL_VERSION, dead_after=DEAD_AFTER):
+        self.path = path
+        self.version = version or DEFAULT_VERSION
+        self.dead_after = dead_after
+        self.lock = threading.RLock()
+        self.dirty = False
+        self._last_hit = {}  # (thread, etapa) -> seletor que acabou de acertar
+        self.data = self._load()
+
+    # ========== PERSISTÊNCIA ==========
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logging.warning(f"⚠️ Cache de seletores ilegível ({self.path}), recomeçando: {e}")
+            return {}
+
+    def save(self):
+        """Grava o cache em disco (escrita atômica)"""
+        with self.lock:
+            if not self.dirty:
+                return
+            tmp_path = f"{self.path}.tmp"
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(self.data, f, indent=2, ensure_ascii=False)
+                os.replace(tmp_path, self.path)
+                self.dirty = False
+            except Exception as e:
+                logging.warning(f"⚠️ Erro ao salvar cache de seletores: {e}")
+
+    def set_version(self, version):
+        """Passa a usar os seletores aprendidos para outra versão do HikCentral"""
+        with self.lock:
+            self.version = version
+
+    def _step(self, step):
+        steps = self.data.setdefault(self.version, {})
+        return steps.setdefault(step, {'winner': None, 'selectors': {}})
+
+    def _stats(self, step, selector):
+        return self._step(step)['selectors'].setdefault(selector, {'hits': 0, 'misses': 0, 'last_hit': None})
+
+    # ========== ORDENAÇÃO ==========
+
+    @staticmethod
+    def _rate(stats):
+        # Suavização de Laplace: seletor nunca testado fica com 0.5
+        return (stats['hits'] + 1) / (stats['hits'] + stats['misses'] + 2)
+
+    def ordered(self, step, selectors):
+        """Seletores na ordem de tentativa: último vencedor, depois maior taxa de acerto"""
+        with self.lock:
+            entry = self._step(step)
+            winner = entry['winner']
+            known = entry['selectors']
+            for selector in selectors:
+                if selector not in known:
+                    self._stats(step, selector)
+                    self.dirty = True
+
+            def key(item):
+                index, selector = item
+                stats = known.get(selector)
+                rate = self._rate(stats)
+                return (selector != winner, -rate, index)
+
+            return [selector for _, selector in sorted(enumerate(selectors), key=key)]
+
+    def candidates(self, step, selectors):
+        """
+        Itera os seletores na ordem do cache. Um seletor que não recebeu hit()
+        antes da próxima iteração é contado como falha.
+        """
+        thread_key = (threading.get_ident(), step)
+        for selector in self.ordered(step, selectors):
+            with self.lock:
+                self._last_hit.pop(thread_key, None)
+            yield selector
+            with self.lock:
+                if self._last_hit.pop(thread_key, None) != selector:
+                    self.miss(step, selector)
+
+    # ========== REGISTRO ==========
+
+    def hit(self, step, selector):
+        with self.lock:
+            self._last_hit[(threading.get_ident(), step)] = selector
+            entry = self._step(step)
+            stats = self._stats(step, selector)
+            stats['hits'] += 1
+            stats['last_hit'] = time.time()
+            changed = entry['winner'] != selector
+            entry['winner'] = selector
+            self.dirty = True
+        # Vencedor novo vai para o disco na hora; contadores são gravados no fim do job
+        if changed:
+            self.save()
+
+    def miss(self, step, selector):
+        with self.lock:
+            self._stats(step, selector)['misses'] += 1
+            self.dirty = True
+
+    # ========== RELATÓRIO ==========
+
+    def dead_fallbacks(self):
+        """Seletores testados pelo menos dead_after vezes sem nenhum acerto"""
+        dead = {}
+        with self.lock:
+            for step, entry in self.data.get(self.version, {}).items():
+                selectors = [s for s, stats in entry['selectors'].items()
+                             if stats['hits'] == 0 and stats['misses'] >= self.dead_after]
+                if selectors:
+                    dead[step] = selectors
+        return dead
+
+    def report(self):
+        """Estatísticas por etapa da versão atual do HikCentral"""
+        report = {}
+        with self.lock:
+            for step, entry in self.data.get(self.version, {}).items():
+                report[step] = {
+                    'winner': entry['winner'],
+                    'selectors': {
+                        selector: {
+                            'hits': stats['hits'],
+                            'misses': stats['misses'],
+                            'hit_rate': round(stats['hits'] / (stats['hits'] + stats['misses']), 2)
+                            if stats['hits'] + stats['misses'] else None
+                        }
+                        for selector, stats in entry['selectors'].items()
+                    }
+                }
+                unused = [s for s, stats in entry['selectors'].items() if not stats['hits'] and not stats['misses']]
+                if unused:
+                    report[step]['never_reached'] = unused
+        dead = self.dead_fallbacks()
+        for step, selectors in dead.items():
+            report[step]['dead'] = selectors
+        return report
+
+    def print_report(self):
+        dead = self.dead_fallbacks()
+        if not dead:
+            return
+        print(f"\n[SELECTORS] Fallbacks mortos (HikCentral {self.version}):")
+        for step, selectors in dead.items():
+            for selector in selectors:
+                print(f"[SELECTORS] {step}: {selector}")
+
+
+# Instância compartilhada pelos scripts e pelos workers do mesmo processo
+selector_cache = SelectorCache()
+
+
+if __name__ == "__main__":
+    print(json.dumps(selector_cache.report(), indent=2, ensure_ascii=False))
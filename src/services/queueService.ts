@@ -13,6 +13,46 @@ const supabaseAdmin = createClient(supabaseUrl, serviceKey, {
   }
 });
 
+// Bucket privado das fotos da fila (database/queue_table.sql)
+const PHOTO_BUCKET = 'visitor-photos';
+
+/**
+ * Envia a foto para o Storage com chave pelo SHA-256 dos bytes.
+ * A fila guarda só photo_key/photo_sha256 e o Windows baixa o binário
+ * (mesma foto = mesma chave, reaproveitada no cache local).
+ */
+async function uploadPhotoToStorage(photoBase64: string): Promise<{ photo_key: string; photo_sha256: string; photo_size: number }> {
+  const [header, data] = photoBase64.includes(',') ? photoBase64.split(',', 2) : ['', photoBase64];
+  const contentType = header.match(/^data:([^;]+)/)?.[1] || 'image/jpeg';
+
+  const binary = atob(data);
+  const bytes = new Uint8Array(binary.length);
+  for (let i = 0; i < binary.length; i++) {
+    bytes[i] = binary.charCodeAt(i);
+  }
+
+  const digest = await crypto.subtle.digest('SHA-256', bytes);
+  const sha256 = Array.from(new Uint8Array(digest)).map(b => b.toString(16).padStart(2, '0')).join('');
+  const key = `queue/${sha256.slice(0, 2)}/${sha256}.jpg`;
+
+  const response = await fetch(`${supabaseUrl}/storage/v1/object/${PHOTO_BUCKET}/${key}`, {
+    method: 'POST',
+    headers: {
+      'apikey': serviceKey,
+      'authorization': `Bearer ${serviceKey}`,
+      'content-type': contentType,
+      'x-upsert': 'true'
+    },
+    body: bytes
+  });
+
+  if (!response.ok) {
+    throw new Error(`Storage HTTP ${response.status}: ${await response.text()}`);
+  }
+
+  return { photo_key: key, photo_sha256: sha256, photo_size: bytes.length };
+}
+
 export interface VisitorQueueData {
   nome: string;
   telefone: string;
@@ -35,6 +75,18 @@ export class QueueService {
       console.log('📤 Enviando visitante para fila Supabase:', visitorData.nome);
       console.log('📋 Dados recebidos no queueService:', visitorData);
 
+      // Foto vai para o Storage; a fila guarda só chave e hash (base64 só se o upload falhar)
+      let photoFields: Record<string, string | number | null> = { photo_base64: null };
+      if (visitorData.photo_base64) {
+        try {
+          photoFields = await uploadPhotoToStorage(visitorData.photo_base64);
+          console.log('📸 Foto enviada ao Storage:', photoFields.photo_key);
+        } catch (uploadError) {
+          console.warn('⚠️ Upload da foto falhou, enviando em base64:', uploadError);
+          photoFields = { photo_base64: visitorData.photo_base64 };
+        }
+      }
+
       // Dados para inserir
       const insertData = {
         visitor_data: {
@@ -48,7 +100,7 @@ export class QueueService {
           action: visitorData.action || 'create', // ⭐ INCLUIR ação (create/reactivate)
           validade_dias: visitorData.validade_dias || 1 // ⭐ INCLUIR duração em dias
         },
-        photo_base64: visitorData.photo_base64 || null,
+        ...photoFields,
         status: 'pending',
         priority: 1
       };
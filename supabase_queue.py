@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+📬 SUPABASE QUEUE - CLAIM ATÔMICO DA visitor_registration_queue
+==============================================================
+Os serviços de polling faziam GET ?status=eq.pending e depois um PATCH
+status=processing por item: dois pollers (ou duas máquinas Windows) podiam
+pegar o mesmo cadastro entre o GET e o PATCH, e cada item custava duas
+idas ao Supabase.
+
+claim_queue_items() chama a RPC de mesmo nome (database/queue_table.sql),
+que reserva até n itens pendentes com FOR UPDATE SKIP LOCKED e já os
+devolve como 'processing' com worker_id: uma ida ao servidor por lote e
+nenhum item entregue a dois workers. A chamada passa pelo cliente
+compartilhado de supabase_rest (pool, timeout e retry só quando seguro).
+Itens reservados por um poller que caiu ou reiniciou voltam a ser
+reservados depois de QUEUE_CLAIM_STALE_SECONDS em processing.
+
+A fila não traz mais photo_base64 (centenas de KB por visitante): o claim
+e a listagem selecionam só QUEUE_ITEM_COLUMNS, com o campo calculado
+has_photo, e fetch_queue_photo() baixa a foto por id apenas para o job que
+vai rodar e precisa dela (reativações não baixam). Itens novos trazem a
+foto no Storage (photo_key/photo_sha256): ver photo_storage.
+"""
+
+import os
+import socket
+
+# Reserva em processing há mais tempo que isso é considerada abandonada (bem acima de um cadastro)
+QUEUE_CLAIM_STALE_SECONDS = int(os.getenv('QUEUE_CLAIM_STALE_SECONDS', '900'))
+
+# Colunas leves da fila (sem photo_base64); has_photo é o campo calculado has_photo(visitor_registration_queue)
+QUEUE_ITEM_COLUMNS = ('id,visitor_data,status,priority,attempts,max_attempts,error_message,'
+                      'created_at,updated_at,processed_at,worker_id,processing_started_at,has_photo,'
+                      'photo_key,photo_sha256')
+
+
+def default_worker_id(suffix=None):
+    """Identificação do poller gravada em worker_id (máquina:pid[:sufixo])"""
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    return f"{worker_id}:{suffix}" if suffix is not None else worker_id
+
+
+def claim_queue_items(client, n, worker_id):
+    """
+    Reserva até n itens pendentes (ou com reserva vencida) para worker_id
+    (prioridade DESC, created_at ASC).
+
+    Args:
+        client: supabase_rest.SupabaseRest
+
+    Returns:
+        list: itens já marcados como 'processing' (vazia se a fila estiver vazia)
+
+    Raises:
+        requests.RequestException: falha de rede ou resposta HTTP de erro
+    """
+    if n <= 0:
+        return []
+    # Não idempotente: um retry depois de timeout de leitura reservaria itens que ninguém recebe
+    response = client.rpc('claim_queue_items', {'n': int(n), 'worker_id': str(worker_id),
+                                                'stale_after_seconds': QUEUE_CLAIM_STALE_SECONDS},
+                          params={'select': QUEUE_ITEM_COLUMNS})
+    response.raise_for_status()
+    return response.json() or []
+
+
+def fetch_queue_photo(client, item):
+    """
+    photo_base64 do item (itens antigos, sem photo_key): a que já veio na
+    linha (consulta antiga com select=*) ou buscada por id quando has_photo.
+
+    Returns:
+        str | None: foto em base64 (pode ter prefixo data:image) ou None
+    """
+    if item.get('photo_base64'):
+        return item['photo_base64']
+    if not item.get('has_photo') or item.get('photo_key'):
+        return None
+    rows = client.select('visitor_registration_queue', {'id': f"eq.{item['id']}", 'select': 'photo_base64'})
+    return rows[0].get('photo_base64') if rows else None
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🌐 SUPABASE REST - CLIENTE HTTP COMPARTILHADO PARA O POSTGREST
+=============================================================
+check_queue, mark_completed, mark_failed e get_supabase_queue chamavam
+requests.get/patch/post soltos: uma conexão TLS nova por chamada e, na
+maioria, sem timeout (um Supabase lento travava o loop de polling).
+
+SupabaseRest concentra essas chamadas num requests.Session por
+(url, chave), compartilhado pelo processo (get_client):
+
+- keep-alive e pool de conexões (SUPABASE_POOL_SIZE)
+- timeout sempre definido: (SUPABASE_CONNECT_TIMEOUT, SUPABASE_READ_TIMEOUT)
+- retry com backoff exponencial e jitter (full jitter) em 429/5xx e erros
+  de conexão; respeita Retry-After. Chamadas que não são idempotentes (ex.:
+  RPC claim_queue_items) só repetem quando o servidor certamente não
+  executou: 429 ou falha ao conectar
+- histograma de latência e bytes recebidos por endpoint (método + caminho)
+  em get_metrics()
+"""
+
+import os
+import time
+import random
+import logging
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+SUPABASE_CONNECT_TIMEOUT = float(os.getenv('SUPABASE_CONNECT_TIMEOUT', '5'))
+SUPABASE_READ_TIMEOUT = float(os.getenv('SUPABASE_READ_TIMEOUT', '30'))
+SUPABASE_RETRIES = int(os.getenv('SUPABASE_RETRIES', '3'))             # tentativas extras
+SUPABASE_BACKOFF_BASE = float(os.getenv('SUPABASE_BACKOFF_BASE', '0.5'))
+SUPABASE_BACKOFF_MAX = float(os.getenv('SUPABASE_BACKOFF_MAX', '10'))
+SUPABASE_POOL_SIZE = int(os.getenv('SUPABASE_POOL_SIZE', '10'))
+
+RETRY_STATUS = (429, 500, 502, 503, 504)
+LATENCY_BUCKETS_MS = (25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class EndpointStats:
+    """Histograma de latência (ms), bytes recebidos e contadores de um endpoint"""
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)  # último = acima do maior limite
+        self.calls = 0
+        self.retries = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.bytes = 0
+
+    def observe(self, elapsed_ms):
+        index = len(LATENCY_BUCKETS_MS)
+        for i, limit in enumerate(LATENCY_BUCKETS_MS):
+            if elapsed_ms <= limit:
+                index = i
+                break
+        self.buckets[index] += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+
+    def to_dict(self):
+        observed = sum(self.buckets)
+        histogram = {f"le_{limit}ms": count for limit, count in zip(LATENCY_BUCKETS_MS, self.buckets)}
+        histogram[f"gt_{LATENCY_BUCKETS_MS[-1]}ms"] = self.buckets[-1]
+        return {
+            'calls': self.calls,
+            'retries': self.retries,
+            'errors': self.errors,
+            'avg_ms': round(self.total_ms / observed, 1) if observed else None,
+            'max_ms': round(self.max_ms, 1),
+            'bytes': self.bytes,
+            'avg_bytes': round(self.bytes / self.calls) if self.calls else None,
+            'histogram': histogram
+        }
+
+
+class SupabaseRest:
+    """Cliente do PostgREST do Supabase (service key) com pool, timeout, retry e métricas"""
+
+    def __init__(self, url, key, connect_timeout=SUPABASE_CONNECT_TIMEOUT, read_timeout=SUPABASE_READ_TIMEOUT,
+                 retries=SUPABASE_RETRIES, backoff_base=SUPABASE_BACKOFF_BASE,
+                 backoff_max=SUPABASE_BACKOFF_MAX, pool_size=SUPABASE_POOL_SIZE):
+        if not url or not key:
+            raise ValueError("Supabase URL e Service Key são obrigatórios")
+        self.url = url.rstrip('/')
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({
+            'apikey': key,
+            'Authorization': f'Bearer {key}',
+            'Content-Type': 'application/json'
+        })
+
+        self.stats = {}
+        self.stats_lock = threading.Lock()
+
+    # ========== REQUISIÇÃO ==========
+
+    def request(self, method, path, params=None, json=None, headers=None, idempotent=None, data=None, stream=False,
+                endpoint=None):
+        """
+        Chamada ao PostgREST com retry. `path` é relativo à URL do projeto
+        (ex.: /rest/v1/visitor_registration_queue). `data` envia corpo binário
+        (Storage); com `stream` o corpo não é lido aqui e os bytes contados
+        são os do Content-Length. `endpoint` troca o rótulo das métricas
+        (caminhos com chave de objeto viram um rótulo só).
+
+        Returns:
+            requests.Response: a última resposta (o chamador confere o status)
+
+        Raises:
+            requests.RequestException: falha de rede depois das tentativas
+        """
+        method = method.upper()
+        if idempotent is None:
+            idempotent = method in ('GET', 'HEAD', 'PATCH', 'PUT', 'DELETE')
+        endpoint = endpoint or f"{method} {path}"
+
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                response = self.session.request(method, self.url + path, params=params, json=json, data=data,
+                                                headers=headers, timeout=self.timeout, stream=stream)
+            except requests.RequestException as e:
+                self._observe(endpoint, started, error=True)
+                # Sem idempotência só repete se a requisição não chegou a sair
+                retryable = idempotent or isinstance(e, requests.ConnectTimeout)
+                if not retryable or attempt >= self.retries:
+                    raise
+                delay = self._backoff(attempt)
+                logging.warning(f"⚠️ Supabase {endpoint}: {type(e).__name__} - tentativa {attempt + 2} em {delay:.1f}s")
+            else:
+                retryable = response.status_code in RETRY_STATUS and (idempotent or response.status_code == 429)
+                size = int(response.headers.get('Content-Length') or 0) if stream else len(response.content)
+                self._observe(endpoint, started, error=response.status_code >= 500, size=size)
+                if not retryable or attempt >= self.retries:
+                    return response
+                if stream:
+                    response.close()  # devolve a conexão ao pool antes do retry
+                delay = self._backoff(attempt, response.headers.get('Retry-After'))
+                logging.warning(f"⚠️ Supabase {endpoint}: HTTP {response.status_code} - "
+                                f"tentativa {attempt + 2} em {delay:.1f}s")
+            attempt += 1
+            with self.stats_lock:
+                self.stats[endpoint].retries += 1
+            time.sleep(delay)
+
+    def _backoff(self, attempt, retry_after=None):
+        """Full jitter: aleatório entre 0 e base * 2^tentativa (limitado a backoff_max)"""
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass  # Retry-After em formato de data: cai no backoff normal
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _observe(self, endpoint, started, error=False, size=0):
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self.stats_lock:
+            stats = self.stats.setdefault(endpoint, EndpointStats())
+            stats.calls += 1
+            stats.errors += error
+            stats.bytes += size
+            stats.observe(elapsed_ms)
+
+    # ========== ATALHOS POSTGREST ==========
+
+    def select(self, table, params=None):
+        """GET na tabela; lista de linhas (levanta HTTPError em status de erro)"""
+        response = self.request('GET', f"/rest/v1/{table}", params=params)
+        response.raise_for_status()
+        return response.json()
+
+    def update(self, table, filters, data):
+        """PATCH nas linhas que casam com os filtros PostgREST (ex.: {'id': 'eq.<uuid>'})"""
+        return self.request('PATCH', f"/rest/v1/{table}", params=filters, json=data)
+
+    def rpc(self, function, payload=None, params=None, idempotent=False):
+        """POST /rest/v1/rpc/<function>; por padrão só repete quando é seguro (429/sem conexão)"""
+        return self.request('POST', f"/rest/v1/rpc/{function}", params=params, json=payload or {},
+                            idempotent=idempotent)
+
+    # ========== MÉTRICAS ==========
+
+    def get_metrics(self):
+        with self.stats_lock:
+            return {endpoint: stats.to_dict() for endpoint, stats in sorted(self.stats.items())}
+
+    def close(self):
+        self.session.close()
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(url=None, key=None):
+    """Cliente compartilhado do processo para (url, chave); padrão SUPABASE_URL/SUPABASE_SERVICE_KEY"""
+    url = url or os.getenv('SUPABASE_URL')
+    key = key or os.getenv('SUPABASE_SERVICE_KEY')
+    with _clients_lock:
+        client = _clients.get((url, key))
+        if client is None:
+            client = _clients[(url, key)] = SupabaseRest(url, key)
+        return client
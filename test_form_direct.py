@@ -9,6 +9,7 @@ import os
 import sys
 import time
 import json
+import hashlib
 import argparse
 from datetime import datetime, timezone
 from selenium import webdriver
@@ -18,14 +19,118 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.keys import Keys
 
+from automation_result import AutomationResult, LEASE_LOST_ERROR
+from hikcentral_waits import WaitEngine
+from selector_cache import selector_cache
+from hikcentral_lookup import configure_driver, probe, probe_visible, find
+from hikcentral_session import session_store
+from hikcentral_routes import route_cache
+from hikcentral_version import ensure_version
+from worker_autoscaler import CHROME_MEMORY_CAP_MB
+
+# Preenchimento de campos: 'js' (valor + eventos input/change), 'bulk' (send_keys único) ou 'type'
+FILL_MODE = os.getenv('FILL_MODE', 'js')
+TYPING_DELAY = 0.1  # Pausa entre teclas quando é preciso digitar caractere por caractere
+
+# Usa o setter nativo do input para o Vue/Element-UI enxergar a mudança no evento 'input'
+SET_VALUE_JS = """
+var el = arguments[0], value = arguments[1];
+var setter = Object.getOwnPropertyDescriptor(Object.getPrototypeOf(el), 'value').set;
+setter.call(el, value);
+el.dispatchEvent(new Event('input', {bubbles: true}));
+el.dispatchEvent(new Event('change', {bubbles: true}));
+return el.value;
+"""
+
+# Chrome headless por padrão (HEADLESS=false ou --visible para ver a janela)
+HEADLESS = os.getenv('HEADLESS', 'true').lower() == 'true'
+
+# Reuso do formulário entre cadastros seguidos na mesma sessão do pool
+FORM_REUSE = os.getenv('FORM_REUSE', 'true').lower() == 'true'
+
+# Botão Fechar do diálogo do "Aplicar agora": some quando o salvamento termina
+FECHAR_DIALOG_XPATH = "//span[text()='Fechar']/parent::button"
+
+# Erro do resultado quando nenhum seletor de Entrada funcionou (nada foi gravado)
+NOT_SAVED_ERROR = 'Cadastro não gravado: botão Entrada não foi clicado'
+
+# Resultado de finalizar_cadastro()
+FINALIZE_SAVED = 'saved'            # Entrada clicado (cadastro gravado no HikCentral)
+FINALIZE_NOT_SAVED = 'not_saved'    # nenhum seletor de Entrada funcionou
+FINALIZE_LEASE_LOST = 'lease_lost'  # abortado antes de Entrada: job com outro worker
+
+# Campos de texto editáveis do formulário (datas e selects são definidos a cada cadastro)
+# e botões que removem a pessoa selecionada no "Visitado"
+FORM_FIELDS_JS = """
+function formFields() {
+    return Array.prototype.filter.call(
+        document.querySelectorAll('input.el-input__inner, textarea.el-textarea__inner'),
+        function(el) {
+            return el.getClientRects().length && !el.readOnly && !el.disabled &&
+                   !el.closest('.el-date-editor, .el-select');
+        });
+}
+function visitadoRemovers() {
+    var search = document.querySelector("input.el-input__inner[placeholder='Pesquisar']");
+    var item = search && search.closest('.el-form-item');
+    return item ? item.querySelectorAll('.el-tag__close, .el-icon-close, .el-icon-circle-close') : [];
+}
+"""
+
+RESET_FORM_JS = FORM_FIELDS_JS + """
+formFields().forEach(function(el) {
+    if (!el.value) { return; }
+    Object.getOwnPropertyDescriptor(Object.getPrototypeOf(el), 'value').set.call(el, '');
+    el.dispatchEvent(new Event('input', {bubbles: true}));
+    el.dispatchEvent(new Event('change', {bubbles: true}));
+});
+Array.prototype.forEach.call(visitadoRemovers(), function(btn) { btn.click(); });
+document.querySelectorAll("input[type='file']").forEach(function(el) { el.value = ''; });
+var canvas = document.getElementById('imgCanvas');
+if (canvas) { canvas.getContext('2d').clearRect(0, 0, canvas.width, canvas.height); }
+"""
+
+FORM_DIRTY_JS = FORM_FIELDS_JS + """
+var dirty = [];
+formFields().forEach(function(el) {
+    if (el.value) { dirty.push('campo ' + (el.placeholder || el.id || el.name || 'sem nome')); }
+});
+if (visitadoRemovers().length) { dirty.push('visitado selecionado'); }
+document.querySelectorAll("input[type='file']").forEach(function(el) { if (el.value) { dirty.push('arquivo de foto'); } });
+var canvas = document.getElementById('imgCanvas'), photo = null;
+if (canvas) { try { photo = canvas.toDataURL(); } catch (e) { photo = 'tainted'; } }
+return {dirty: dirty, photo: photo};
+"""
+
 class HikCentralFormTest:
-    def __init__(self, visitor_data, visitor_id, headless=False):
-        self.driver = None
+    def __init__(self, visitor_data, visitor_id, headless=None, driver=None, form_state=None, lease_lost=None):
+        # Driver externo (pool de sessões): já vem configurado e logado
+        self.driver = driver
+        # threading.Event do lease do servidor: marcado, outro worker pode assumir o cadastro
+        self.lease_lost = lease_lost
+        self.owns_driver = driver is None
+        # Estado do formulário compartilhado entre jobs da mesma sessão do pool
+        self.form_state = form_state
+        self.photo_uploaded = False
         self.visitor_data = visitor_data
         self.visitor_id = visitor_id
-        self.headless = headless
+        self.headless = HEADLESS if headless is None else headless
         self.temp_profile = None
         self.window_position = self.get_window_position()
+        self._waits = None
+        self.fill_modes = {}
+        self.navigation = None
+
+    def lease_perdido(self):
+        """True se o servidor perdeu o lease deste job (não clicar em Entrada: cadastro duplicado)"""
+        return self.lease_lost is not None and self.lease_lost.is_set()
+
+    @property
+    def waits(self):
+        """Esperas por condição do DOM ligadas ao driver atual"""
+        if self._waits is None or self._waits.driver is not self.driver:
+            self._waits = WaitEngine(self.driver)
+        return self._waits
         
     def get_window_position(self):
         """Calcular posição única da janela para evitar sobreposição"""
@@ -86,8 +191,9 @@ class HikCentralFormTest:
         options.add_argument("--disable-ipc-flooding-protection")
         
         # ✅ CONFIGURAÇÕES DE MEMÓRIA
+        # Heap do V8 limitado a metade do teto por Chrome (o resto fica para DOM, GPU e processos)
         options.add_argument("--memory-pressure-off")
-        options.add_argument("--max_old_space_size=4096")
+        options.add_argument(f"--js-flags=--max-old-space-size={CHROME_MEMORY_CAP_MB // 2}")
         
         # ✅ CONFIGURAÇÕES DE REDE
         options.add_argument("--aggressive-cache-discard")
@@ -107,8 +213,12 @@ class HikCentralFormTest:
         self.temp_profile = temp_profile
         print(f"[INFO] Perfil único criado: {temp_profile}")
         
-        # ✅ POSIÇÃO DA JANELA ÚNICA (SEM HEADLESS)
-        if not self.headless:
+        # ✅ HEADLESS (PADRÃO) OU POSIÇÃO DA JANELA ÚNICA
+        if self.headless:
+            options.add_argument("--headless=new")
+            options.add_argument("--window-size=1920,1080")
+            print("[SETUP] Chrome headless")
+        else:
             pos = self.window_position
             options.add_argument(f"--window-position={pos['x']},{pos['y']}")
             options.add_argument(f"--window-size={pos['width']},{pos['height']}")
@@ -151,7 +261,7 @@ class HikCentralFormTest:
                 time.sleep(2)
         
         # ✅ CONFIGURAÇÕES ADICIONAIS
-        self.driver.implicitly_wait(10)
+        configure_driver(self.driver)  # Sem implicit wait: só esperas explícitas
         self.driver.set_page_load_timeout(60)  # Timeout maior para páginas lentas
         self.driver.set_script_timeout(30)
         
@@ -159,6 +269,13 @@ class HikCentralFormTest:
         return True
 
     def login(self):
+        """Autenticar no HikCentral reutilizando a sessão salva (login completo só se expirou)"""
+        if not session_store.ensure_login(self.driver, self.login_with_credentials, os.getenv('HIKCENTRAL_URL')):
+            return False
+        ensure_version(self.driver)  # Caches de seletores/rotas da versão certa
+        return True
+
+    def login_with_credentials(self):
         """Fazer login no HikCentral com retry"""
         url = os.getenv('HIKCENTRAL_URL')
         username = os.getenv('HIKCENTRAL_USERNAME')
@@ -174,29 +291,21 @@ class HikCentralFormTest:
                 # Navegar para URL
                 self.driver.get(url)
                 print("[WAIT] Aguardando página carregar...")
-                time.sleep(10)  # Tempo para página carregar
+                self.waits.page_ready(legacy=10)
                 
                 # Login usando IDs com wait explícito
                 print("[LOGIN] Procurando campos de login...")
-                username_field = WebDriverWait(self.driver, 30).until(
-                    EC.presence_of_element_located((By.ID, "username"))
-                )
+                username_field = self.waits.clickable((By.ID, "username"), timeout=30)
                 password_field = self.driver.find_element(By.ID, "password")
                 print("[OK] Campos de login encontrados!")
                 
                 # Preencher usuário
                 username_field.clear()
-                for char in username:
-                    username_field.send_keys(char)
-                    time.sleep(0.1)
-                time.sleep(1)
+                self.fill_field(username_field, username)
                 
                 # Preencher senha
                 password_field.clear()
-                for char in password:
-                    password_field.send_keys(char)
-                    time.sleep(0.1)
-                time.sleep(1)
+                self.fill_field(password_field, password)
                 
                 # Clicar login
                 login_btn = self.driver.find_element(By.CSS_SELECTOR, ".login-btn")
@@ -205,16 +314,14 @@ class HikCentralFormTest:
                 
                 # Aguardar carregamento da página principal
                 print("[WAIT] Aguardando carregamento da página principal...")
-                time.sleep(8)
                 
-                # Verificar se login foi bem-sucedido (procurar elemento da página principal)
-                try:
-                    WebDriverWait(self.driver, 10).until(
-                        lambda driver: "login" not in driver.current_url.lower()
-                    )
+                # Verificar se login foi bem-sucedido (saiu da página de login)
+                if self.waits.url_changed(lambda current: "login" not in current.lower(),
+                                          timeout=18, legacy=8, label='login redirect'):
+                    self.waits.settle()
                     print("[OK] Login bem-sucedido!")
                     return True
-                except:
+                else:
                     print(f"[WARN] Login pode não ter funcionado na tentativa {attempt + 1}")
                     if attempt < 2:  # Se não é a última tentativa
                         continue
@@ -233,7 +340,124 @@ class HikCentralFormTest:
         
         return False
     
+    def open_form(self):
+        """Reaproveitar o formulário limpo deixado pelo job anterior ou navegar até ele"""
+        if self.reuse_prepared_form():
+            return True
+
+        if not self.navigate_to_form():
+            return False
+        if self.form_state is None:
+            return True
+
+        # Checkpoint: o formulário recém-aberto pode ter ficado montado com dados do job anterior
+        dirty = self.form_dirty()
+        if dirty:
+            print(f"[FORM] Formulário aberto com resíduos ({', '.join(dirty)}), limpando...")
+            self.reset_form()
+            dirty = self.form_dirty()
+        if dirty:
+            print("[FORM] Limpeza não bastou, recarregando a página...")
+            self.driver.refresh()
+            if not self.navigate_to_form():
+                return False
+            dirty = self.form_dirty()
+            if dirty:
+                print(f"[ERRO] Formulário continua sujo após recarregar: {', '.join(dirty)}")
+                return False
+        return True
+
+    def reuse_prepared_form(self):
+        """Usar o formulário já limpo na página, sem navegar (fila com backlog)"""
+        state = self.form_state
+        if not FORM_REUSE or state is None or not state.pop('prepared', False):
+            return False
+
+        started = time.monotonic()
+        # Foto do visitante anterior pode continuar no estado do componente: só reaproveita se for substituída
+        if state.get('has_photo') and not os.path.exists(self.visitor_data.get('photo_path') or ''):
+            print("[FORM] Job anterior enviou foto e este não tem foto - reabrindo formulário")
+            return False
+        if not route_cache.at(self.driver, 'visitor_form') or not probe_visible(self.driver, "input.el-input__inner"):
+            print("[FORM] Formulário preparado não está mais na página - navegando")
+            return False
+
+        dirty = self.form_dirty()
+        if dirty:
+            print(f"[FORM] Checkpoint falhou ({', '.join(dirty)}) - navegando")
+            return False
+
+        seconds = time.monotonic() - started
+        route_cache.record('visitor_form', 'reused_form', seconds)
+        self.navigation = {'success': True, 'mode': 'reused_form', 'seconds': round(seconds, 2)}
+        print("[FORM] Reaproveitando formulário limpo do cadastro anterior")
+        return True
+
+    def prepare_next_form(self):
+        """Depois do cadastro, deixar o formulário limpo para o próximo visitante da fila"""
+        state = self.form_state
+        state['prepared'] = False
+        remounted = False
+
+        if not route_cache.at(self.driver, 'visitor_form') or not probe_visible(self.driver, "input.el-input__inner"):
+            navigation = self.navigation  # manter no resultado a navegação deste job
+            opened = self.navigate_to_form()
+            self.navigation = navigation
+            if not opened:
+                return False
+            remounted = True
+
+        self.reset_form()
+        dirty = self.form_dirty()
+        if dirty:
+            print(f"[FORM] Formulário não ficou limpo para o próximo cadastro: {', '.join(dirty)}")
+            return False
+
+        state['prepared'] = True
+        state['has_photo'] = self.photo_uploaded and not remounted
+        print("[FORM] Formulário limpo e pronto para o próximo visitante")
+        return True
+
+    def reset_form(self):
+        """Limpar campos de texto, seleção do Visitado e canvas/arquivo da foto"""
+        self.driver.execute_script(RESET_FORM_JS)
+        self.waits.settle(timeout=5)
+
+    def form_dirty(self):
+        """
+        Checkpoint do formulário: lista do que ainda está preenchido (vazia = limpo).
+        O canvas da foto é comparado com o de um formulário recém-montado.
+        """
+        state = self.driver.execute_script(FORM_DIRTY_JS)
+        dirty = list(state['dirty'])
+        photo = hashlib.md5(state['photo'].encode()).hexdigest() if state['photo'] else None
+
+        if self.form_state is not None and photo:
+            pristine = self.form_state.get('pristine_photo')
+            if pristine is None and not dirty and not self.photo_uploaded:
+                self.form_state['pristine_photo'] = photo
+            elif pristine is not None and photo != pristine:
+                dirty.append('foto no canvas')
+        return dirty
+
     def navigate_to_form(self):
+        """Abrir o formulário pela rota aprendida da SPA; cliques só se o deep link falhar"""
+        self.navigation = route_cache.navigate(
+            self.driver, 'visitor_form', self.form_ready, self.navigate_to_form_by_clicks
+        )
+        print(f"[NAV] Formulário aberto via {self.navigation['mode']} em {self.navigation['seconds']:.1f}s")
+        if self.navigation['success'] and self.navigation['mode'] == 'deep_link':
+            self.close_any_message_box()
+        return self.navigation['success']
+
+    def form_ready(self):
+        """Formulário de cadastro carregado (campos visíveis e SPA ociosa)"""
+        if not self.waits.visible((By.CSS_SELECTOR, "input.el-input__inner"), timeout=15, label='form ready'):
+            return False
+        self.waits.settle()
+        return True
+
+    def navigate_to_form_by_clicks(self):
         """Navegar para formulário - EXATAMENTE COMO FUNCIONAVA"""
         print("[NAV] Navegando para formulário...")
         
@@ -243,7 +467,7 @@ class HikCentralFormTest:
             
             # Aguardar a página carregar completamente
             print("[WAIT] Aguardando interface carregar...")
-            time.sleep(5)
+            self.waits.settle(legacy=5)
             
             # Tentar múltiplas estratégias para encontrar Visitante
             visitante_found = False
@@ -255,7 +479,7 @@ class HikCentralFormTest:
                 "//li[contains(text(), 'Visitante')]"
             ]
             
-            for strategy in strategies:
+            for strategy in selector_cache.candidates('form.visitante_menu', strategies):
                 try:
                     print(f"[DEBUG] Tentando estratégia: {strategy}")
                     visitante_elements = WebDriverWait(self.driver, 10).until(
@@ -269,11 +493,10 @@ class HikCentralFormTest:
                         
                         # Scroll para o elemento
                         self.driver.execute_script("arguments[0].scrollIntoView(true);", target_element)
-                        time.sleep(1)
                         
                         target_element.click()
                         print("[OK] Clicado em 'Visitante'")
-                        time.sleep(5)
+                        selector_cache.hit('form.visitante_menu', strategy)
                         visitante_found = True
                         break
                 except Exception as e:
@@ -286,15 +509,15 @@ class HikCentralFormTest:
             
             # Aguardar submenu carregar
             print("[WAIT] Aguardando submenu carregar...")
-            time.sleep(5)
             
             # Clicar em "Entrada de visitante" na lista central - CÓDIGO ORIGINAL
             print("[NAV] Clicando em 'Entrada de visitante' na lista central...")
-            entrada_central = self.driver.find_element(By.CSS_SELECTOR, "div[title='Entrada de visitante'].guide-step-name")
+            entrada_central = self.waits.clickable(
+                (By.CSS_SELECTOR, "div[title='Entrada de visitante'].guide-step-name"), timeout=20, legacy=10
+            )
             if entrada_central:
                 entrada_central.click()
                 print("[OK] Clicado em 'Entrada de visitante' na lista central!")
-                time.sleep(1)  # Otimizado para 1s
             else:
                 print("[ERRO] 'Entrada de visitante' não encontrado na lista central")
                 return False
@@ -302,10 +525,9 @@ class HikCentralFormTest:
             # Clicar novamente no menu para remover tooltip - CÓDIGO ORIGINAL
             print("[FIX] Clicando novamente no menu para remover tooltip...")
             try:
-                entrada_sidebar = self.driver.find_element(By.XPATH, "//span[text()='Entrada de visitante']")
+                entrada_sidebar = self.waits.clickable((By.XPATH, "//span[text()='Entrada de visitante']"), timeout=5, legacy=1)
                 entrada_sidebar.click()
                 print("[OK] Tooltip removido!")
-                time.sleep(1)  # Otimizado
             except Exception as e:
                 print(f"[WARN] Erro ao remover tooltip: {e}")
             
@@ -313,21 +535,19 @@ class HikCentralFormTest:
             print("[NAV] Procurando 'Entrada de visitante não reservada'...")
             try:
                 # Procurar pelo span específico
-                span_nao_reservada = WebDriverWait(self.driver, 10).until(
-                    EC.element_to_be_clickable((By.XPATH, "//span[text()='Entrada de visitante não reservada']"))
+                span_nao_reservada = self.waits.clickable(
+                    (By.XPATH, "//span[text()='Entrada de visitante não reservada']"), timeout=10, legacy=1
                 )
                 
                 print("[OK] 'Entrada de visitante não reservada' encontrado!")
                 
                 # Scroll para o elemento
                 self.driver.execute_script("arguments[0].scrollIntoView(true);", span_nao_reservada)
-                time.sleep(2)
                 
                 # ESTRATÉGIA 1: Tentar clicar normalmente
                 try:
                     span_nao_reservada.click()
                     print("[OK] Clicado em 'Entrada de visitante não reservada' (normal)!")
-                    time.sleep(2)  # Otimizado de 5s para 2s
                 except Exception as e:
                     print(f"[WARN] Clique normal falhou: {e}")
                     
@@ -335,7 +555,6 @@ class HikCentralFormTest:
                     try:
                         self.driver.execute_script("arguments[0].click();", span_nao_reservada)
                         print("[OK] Clicado em 'Entrada de visitante não reservada' (JavaScript)!")
-                        time.sleep(2)  # Otimizado de 5s para 2s
                     except Exception as e2:
                         print(f"[WARN] Clique JavaScript falhou: {e2}")
             
@@ -345,14 +564,15 @@ class HikCentralFormTest:
             
             # Aguardar formulário carregar
             print("[WAIT] Aguardando formulário de cadastro carregar...")
-            time.sleep(2)  # Otimizado de 5s para 2s
+            self.waits.visible((By.CSS_SELECTOR, "input.el-input__inner"), timeout=15, legacy=6)
+            self.waits.settle()
             
             # FECHAR MESSAGE BOX SE EXISTIR
             print("[FIX] Verificando se há message box para fechar...")
             try:
                 # Procurar pela message box wrapper
-                message_box = self.driver.find_element(By.CSS_SELECTOR, ".el-message-box__wrapper")
-                if message_box.is_displayed():
+                message_box = probe_visible(self.driver, ".el-message-box__wrapper")
+                if message_box:
                     print("[FOUND] Message box encontrada, tentando fechar...")
                     
                     # Estratégias para fechar a message box
@@ -369,15 +589,12 @@ class HikCentralFormTest:
                     box_closed = False
                     for selector in close_selectors:
                         try:
-                            if selector.startswith("//"):
-                                close_btn = self.driver.find_element(By.XPATH, selector)
-                            else:
-                                close_btn = self.driver.find_element(By.CSS_SELECTOR, selector)
+                            close_btn = probe_visible(self.driver, selector)
                             
-                            if close_btn.is_displayed() and close_btn.is_enabled():
+                            if close_btn and close_btn.is_enabled():
                                 close_btn.click()
                                 print(f"[OK] Message box fechada com: {selector}")
-                                time.sleep(2)
+                                self.waits.message_box_closed(legacy=2)
                                 box_closed = True
                                 break
                         except:
@@ -389,7 +606,7 @@ class HikCentralFormTest:
                             from selenium.webdriver.common.keys import Keys
                             self.driver.find_element(By.TAG_NAME, "body").send_keys(Keys.ESCAPE)
                             print("[OK] Message box fechada com ESC")
-                            time.sleep(2)
+                            self.waits.message_box_closed(legacy=2)
                         except:
                             print("[WARN] Não foi possível fechar message box")
                 else:
@@ -412,7 +629,7 @@ class HikCentralFormTest:
         
         try:
             # Aguardar formulário carregar
-            time.sleep(5)
+            self.waits.visible((By.CSS_SELECTOR, "input.el-input__inner"), timeout=10, legacy=5)
             
             # Procurar todos os inputs
             all_inputs = self.driver.find_elements(By.TAG_NAME, "input")
@@ -505,11 +722,48 @@ class HikCentralFormTest:
         except Exception as e:
             print(f"[ERRO] Erro no debug: {e}")
     
+    def fill_field(self, field, value, mode=None):
+        """
+        Preencher campo em uma única chamada, digitando só como último recurso
+
+        Returns:
+            str: modo que efetivamente preencheu o campo ('js', 'bulk' ou 'type')
+        """
+        value = str(value)
+        mode = mode or FILL_MODE
+        used = 'type'
+
+        if mode == 'js':
+            try:
+                if self.driver.execute_script(SET_VALUE_JS, field, value) == value:
+                    used = 'js'
+            except Exception as e:
+                print(f"[WARN] Preenchimento via JavaScript falhou: {e}")
+            if used != 'js':
+                mode = 'bulk'
+
+        if used == 'type' and mode == 'bulk':
+            field.clear()
+            field.send_keys(value)
+            if (field.get_attribute('value') or '') == value:
+                used = 'bulk'
+            else:
+                print("[WARN] Valor não conferiu após envio único, digitando caractere por caractere...")
+
+        if used == 'type':
+            field.clear()
+            for char in value:
+                field.send_keys(char)
+                time.sleep(TYPING_DELAY)
+
+        self.fill_modes[used] = self.fill_modes.get(used, 0) + 1
+        return used
+
     def close_any_message_box(self):
         """Fechar qualquer message box que possa estar aberta"""
         try:
-            message_box = self.driver.find_element(By.CSS_SELECTOR, ".el-message-box__wrapper")
-            if message_box.is_displayed():
+            message_box = probe_visible(self.driver, ".el-message-box__wrapper")
+            if message_box:
                 print("[FIX] Fechando message box interceptadora...")
                 
                 close_selectors = [
@@ -524,15 +778,12 @@ class HikCentralFormTest:
                 
                 for selector in close_selectors:
                     try:
-                        if selector.startswith("//"):
-                            close_btn = self.driver.find_element(By.XPATH, selector)
-                        else:
-                            close_btn = self.driver.find_element(By.CSS_SELECTOR, selector)
+                        close_btn = probe_visible(self.driver, selector)
                         
-                        if close_btn.is_displayed() and close_btn.is_enabled():
+                        if close_btn and close_btn.is_enabled():
                             close_btn.click()
                             print(f"[OK] Message box fechada!")
-                            time.sleep(2)
+                            self.waits.message_box_closed(legacy=2)
                             return True
                     except:
                         continue
@@ -542,7 +793,7 @@ class HikCentralFormTest:
                     from selenium.webdriver.common.keys import Keys
                     self.driver.find_element(By.TAG_NAME, "body").send_keys(Keys.ESCAPE)
                     print("[OK] Message box fechada com ESC")
-                    time.sleep(2)
+                    self.waits.message_box_closed(legacy=2)
                     return True
                 except:
                     pass
@@ -558,7 +809,7 @@ class HikCentralFormTest:
         
         try:
             # Aguardar formulário carregar
-            time.sleep(1)  # Otimizado
+            self.waits.settle(legacy=1)
             
             # Fechar qualquer message box
             self.close_any_message_box()
@@ -569,14 +820,13 @@ class HikCentralFormTest:
             if photo_path and os.path.exists(photo_path):
                 try:
                     # Verificar se o canvas de foto está visível (já estamos na aba básica)
-                    try:
-                        canvas = self.driver.find_element(By.CSS_SELECTOR, "canvas#imgCanvas.bg-photo_canvas")
-                        if canvas.is_displayed():
-                            print("[OK] Canvas de foto está visível!")
-                        else:
-                            print("[WARN] Canvas de foto não está visível")
-                    except:
+                    canvas = probe(self.driver, "canvas#imgCanvas.bg-photo_canvas")
+                    if not canvas:
                         print("[WARN] Canvas de foto não encontrado")
+                    elif canvas[0].is_displayed():
+                        print("[OK] Canvas de foto está visível!")
+                    else:
+                        print("[WARN] Canvas de foto não está visível")
                         
                     # Procurar primeiro a área/elemento que ativa o upload (lado direito do canvas)
                     print("[DEBUG] Primeiro, tentando ativar área de upload...")
@@ -592,27 +842,24 @@ class HikCentralFormTest:
                     ]
                     
                     upload_activated = False
-                    for trigger_selector in trigger_selectors:
+                    for trigger_selector in selector_cache.candidates('form.upload_trigger', trigger_selectors):
                         try:
                             print(f"[DEBUG] Tentando ativar com: {trigger_selector}")
-                            if trigger_selector.startswith("//"):
-                                trigger_elements = self.driver.find_elements(By.XPATH, trigger_selector)
-                            else:
-                                trigger_elements = self.driver.find_elements(By.CSS_SELECTOR, trigger_selector)
+                            trigger_elements = probe(self.driver, trigger_selector)
                             
                             for trigger in trigger_elements:
                                 if trigger.is_displayed():
                                     # Mover mouse para o elemento (hover)
                                     from selenium.webdriver.common.action_chains import ActionChains
                                     ActionChains(self.driver).move_to_element(trigger).perform()
-                                    time.sleep(1)
                                     
                                     # Tentar clicar
                                     try:
                                         trigger.click()
                                         print(f"[OK] Área de upload ativada com: {trigger_selector}")
+                                        selector_cache.hit('form.upload_trigger', trigger_selector)
                                         upload_activated = True
-                                        time.sleep(2)
+                                        self.waits.settle(legacy=3)
                                         break
                                     except:
                                         continue
@@ -632,13 +879,10 @@ class HikCentralFormTest:
                     
                     upload_element = None
                     print("[DEBUG] Procurando elemento de upload na aba básica...")
-                    for selector in upload_selectors:
+                    for selector in selector_cache.candidates('form.upload_input', upload_selectors):
                         try:
                             print(f"[DEBUG] Tentando seletor: {selector}")
-                            if selector.startswith("//"):
-                                elements = self.driver.find_elements(By.XPATH, selector)
-                            else:
-                                elements = self.driver.find_elements(By.CSS_SELECTOR, selector)
+                            elements = probe(self.driver, selector)
                             
                             print(f"[DEBUG] Encontrados {len(elements)} elementos")
                             for i, element in enumerate(elements):
@@ -646,6 +890,7 @@ class HikCentralFormTest:
                                 if element.is_displayed():
                                     upload_element = element
                                     print(f"[OK] Elemento de upload encontrado com: {selector}")
+                                    selector_cache.hit('form.upload_input', selector)
                                     break
                             
                             if upload_element:
@@ -657,8 +902,9 @@ class HikCentralFormTest:
                     if upload_element:
                         # Enviar foto
                         upload_element.send_keys(photo_path)
+                        self.photo_uploaded = True
                         print(f"[OK] Foto enviada: {photo_path}")
-                        time.sleep(3)
+                        self.waits.settle(legacy=3)
                     else:
                         # ESTRATÉGIA ALTERNATIVA: Usar o primeiro input file encontrado, mesmo que invisível
                         print("[DEBUG] Tentando usar input file invisível...")
@@ -671,8 +917,9 @@ class HikCentralFormTest:
                                 
                                 # Forçar envio mesmo invisível
                                 first_file_input.send_keys(photo_path)
+                                self.photo_uploaded = True
                                 print(f"[OK] Foto enviada via input invisível: {photo_path}")
-                                time.sleep(3)
+                                self.waits.settle(legacy=3)
                                 upload_element = first_file_input  # Para continuar com o resto do processo
                             else:
                                 print("[WARN] Nenhum input file encontrado")
@@ -683,13 +930,12 @@ class HikCentralFormTest:
                     if upload_element:
                         print("[DEBUG] Procurando botão 'Guardar' no modal...")
                         
-                        # Aguardar um pouco para o modal carregar completamente
-                        time.sleep(3)
+                        # Aguardar o modal carregar completamente
+                        self.waits.visible((By.XPATH, "//span[text()='Guardar']"), timeout=10, legacy=3)
                         
                         # Primeiro tentar rolar para baixo no modal para ver o botão
                         try:
                             self.driver.execute_script("window.scrollBy(0, 200);")  # Rolar página para baixo
-                            time.sleep(1)
                             print("[OK] Página rolada para baixo")
                         except:
                             pass
@@ -703,25 +949,23 @@ class HikCentralFormTest:
                         ]
                         
                         guardar_found = False
-                        for selector in guardar_selectors:
+                        for selector in selector_cache.candidates('form.guardar', guardar_selectors):
                             try:
                                 print(f"[DEBUG] Tentando seletor Guardar: {selector}")
-                                if selector.startswith("//"):
-                                    guardar_btn = self.driver.find_element(By.XPATH, selector)
-                                else:
-                                    guardar_btn = self.driver.find_element(By.CSS_SELECTOR, selector)
-                                
-                                print(f"[DEBUG] Botão encontrado: displayed={guardar_btn.is_displayed()}, enabled={guardar_btn.is_enabled()}")
+                                guardar_btn = probe_visible(self.driver, selector)
+                                if not guardar_btn:
+                                    print(f"[DEBUG] Nenhum botão visível com: {selector}")
+                                    continue
                                 
-                                if guardar_btn.is_displayed() and guardar_btn.is_enabled():
+                                if guardar_btn.is_enabled():
                                     # Scroll para o botão se necessário
                                     self.driver.execute_script("arguments[0].scrollIntoView(true);", guardar_btn)
-                                    time.sleep(1)
                                     
                                     guardar_btn.click()
                                     print("[OK] Botão 'Guardar' clicado após upload!")
+                                    selector_cache.hit('form.guardar', selector)
                                     guardar_found = True
-                                    time.sleep(2)
+                                    self.waits.settle(legacy=3)
                                     break
                             except Exception as e:
                                 print(f"[DEBUG] Erro com seletor {selector}: {e}")
@@ -756,13 +1000,14 @@ class HikCentralFormTest:
                     ]
                     
                     nome_field = None
-                    for selector in nome_selectors:
+                    for selector in selector_cache.candidates('form.nome', nome_selectors):
                         try:
                             fields = self.driver.find_elements(By.CSS_SELECTOR, selector)
                             for field in fields:
                                 if field.is_displayed() and field.is_enabled():
                                     nome_field = field
                                     print(f"[OK] Campo nome encontrado com: {selector}")
+                                    selector_cache.hit('form.nome', selector)
                                     break
                             if nome_field:
                                 break
@@ -773,7 +1018,6 @@ class HikCentralFormTest:
                         
                         # Scroll e foco
                         self.driver.execute_script("arguments[0].scrollIntoView(true);", nome_field)
-                        time.sleep(1)
                         
                         # Tentar clicar, se interceptar, fechar message box
                         try:
@@ -782,21 +1026,15 @@ class HikCentralFormTest:
                             if "click intercepted" in str(e):
                                 print("[FIX] Clique interceptado, fechando message box...")
                                 self.close_any_message_box()
-                                time.sleep(1)
                                 nome_field.click()
                             else:
                                 raise e
                         
                         nome_field.clear()
-                        time.sleep(0.5)
                         
-                        # Digitar caractere por caractere
-                        for char in nome_value:
-                            nome_field.send_keys(char)
-                            time.sleep(0.1)
+                        self.fill_field(nome_field, nome_value)
                         
                         print(f"[OK] Nome testado: {nome_value}")
-                        time.sleep(0.5)  # Otimizado
                     else:
                         print("[WARN] Campo nome não encontrado")
                 except Exception as e:
@@ -812,12 +1050,11 @@ class HikCentralFormTest:
                 print(f"[DEBUG] Apelido extraído: '{apelido_value}'")
                 try:
                     # Procurar campo apelido pelo ID específico
-                    apelido_field = self.driver.find_element(By.CSS_SELECTOR, "input[id='myDiv'].el-input__inner")
+                    apelido_field = find(self.driver, "input[id='myDiv'].el-input__inner", timeout=5, condition='visible')
                     
-                    if apelido_field.is_displayed() and apelido_field.is_enabled():
+                    if apelido_field and apelido_field.is_enabled():
                         # Scroll e foco
                         self.driver.execute_script("arguments[0].scrollIntoView(true);", apelido_field)
-                        time.sleep(1)
                         
                         # Tentar clicar, se interceptar, fechar message box
                         try:
@@ -826,21 +1063,15 @@ class HikCentralFormTest:
                             if "click intercepted" in str(e):
                                 print("[FIX] Clique interceptado no apelido, fechando message box...")
                                 self.close_any_message_box()
-                                time.sleep(1)
                                 apelido_field.click()
                             else:
                                 raise e
                         
                         apelido_field.clear()
-                        time.sleep(0.5)
                         
-                        # Digitar caractere por caractere
-                        for char in apelido_value:
-                            apelido_field.send_keys(char)
-                            time.sleep(0.1)
+                        self.fill_field(apelido_field, apelido_value)
                         
                         print(f"[OK] Apelido testado: {apelido_value}")
-                        time.sleep(0.5)  # Otimizado
                     else:
                         print("[WARN] Campo apelido não visível/habilitado")
                 except Exception as e:
@@ -854,16 +1085,15 @@ class HikCentralFormTest:
             try:
                 # Fechar qualquer elemento que possa interceptar
                 self.close_any_message_box()
-                time.sleep(1)
                 
                 # Procurar dropdown Objetivo da Visita
-                objetivo_dropdown = WebDriverWait(self.driver, 5).until(
-                    EC.element_to_be_clickable((By.XPATH, "//span[text()='Objetivo da Visita']/../following-sibling::*//*[@class='el-input__inner']"))
+                objetivo_dropdown = self.waits.clickable(
+                    (By.XPATH, "//span[text()='Objetivo da Visita']/../following-sibling::*//*[@class='el-input__inner']"),
+                    timeout=5, legacy=2
                 )
                 
                 # Scroll para elemento
                 self.driver.execute_script("arguments[0].scrollIntoView(true);", objetivo_dropdown)
-                time.sleep(1)
                 
                 # Tentar clique normal primeiro
                 try:
@@ -874,17 +1104,16 @@ class HikCentralFormTest:
                         self.driver.execute_script("arguments[0].click();", objetivo_dropdown)
                     else:
                         raise e
-                        
-                time.sleep(2)
                 
                 # Selecionar "Fazer passeio e visita" usando seletor exato
                 try:
-                    objetivo_option = WebDriverWait(self.driver, 5).until(
-                        EC.element_to_be_clickable((By.XPATH, "//li[contains(@class, 'el-select-dropdown__item')]//span[contains(text(), 'Fazer passeio e visita')]"))
+                    objetivo_option = self.waits.clickable(
+                        (By.XPATH, "//li[contains(@class, 'el-select-dropdown__item')]//span[contains(text(), 'Fazer passeio e visita')]"),
+                        timeout=5, legacy=2
                     )
                     objetivo_option.click()
+                    self.waits.gone(".el-select-dropdown", timeout=3, legacy=0.5)
                     print("[OK] Objetivo da visita selecionado: Fazer passeio e visita")
-                    time.sleep(0.5)  # Otimizado
                 except:
                     # Fallback: Business
                     try:
@@ -892,8 +1121,8 @@ class HikCentralFormTest:
                             EC.element_to_be_clickable((By.XPATH, "//li[contains(@class, 'el-select-dropdown__item')]//span[contains(text(), 'Business')]"))
                         )
                         business_option.click()
+                        self.waits.gone(".el-select-dropdown", timeout=3, legacy=0.5)
                         print("[OK] Objetivo da visita selecionado: Business")
-                        time.sleep(0.5)  # Otimizado
                     except:
                         print("[WARN] Não foi possível selecionar objetivo da visita")
             except Exception as e:
@@ -907,16 +1136,15 @@ class HikCentralFormTest:
             try:
                 # Fechar qualquer elemento que possa interceptar
                 self.close_any_message_box()
-                time.sleep(1)
                 
                 # Procurar dropdown Grupo de visitantes
-                grupo_dropdown = WebDriverWait(self.driver, 5).until(
-                    EC.element_to_be_clickable((By.XPATH, "//span[text()='Grupo de visitantes']/../following-sibling::*//*[@class='el-input__inner']"))
+                grupo_dropdown = self.waits.clickable(
+                    (By.XPATH, "//span[text()='Grupo de visitantes']/../following-sibling::*//*[@class='el-input__inner']"),
+                    timeout=5, legacy=2
                 )
                 
                 # Scroll para elemento
                 self.driver.execute_script("arguments[0].scrollIntoView(true);", grupo_dropdown)
-                time.sleep(1)
                 
                 # Tentar clique normal primeiro
                 try:
@@ -927,17 +1155,16 @@ class HikCentralFormTest:
                         self.driver.execute_script("arguments[0].click();", grupo_dropdown)
                     else:
                         raise e
-                        
-                time.sleep(2)
                 
                 # Selecionar "VisitanteS" usando seletor exato
                 try:
-                    grupo_option = WebDriverWait(self.driver, 5).until(
-                        EC.element_to_be_clickable((By.XPATH, "//li[contains(@class, 'el-select-dropdown__item')]//span[contains(text(), 'VisitanteS')]"))
+                    grupo_option = self.waits.clickable(
+                        (By.XPATH, "//li[contains(@class, 'el-select-dropdown__item')]//span[contains(text(), 'VisitanteS')]"),
+                        timeout=5, legacy=2
                     )
                     grupo_option.click()
+                    self.waits.gone(".el-select-dropdown", timeout=3, legacy=0.5)
                     print("[OK] Grupo de visitantes selecionado: VisitanteS")
-                    time.sleep(0.5)  # Otimizado
                 except:
                     # Fallback: Corretores
                     try:
@@ -945,8 +1172,8 @@ class HikCentralFormTest:
                             EC.element_to_be_clickable((By.XPATH, "//li[contains(@class, 'el-select-dropdown__item')]//span[contains(text(), 'Corretores')]"))
                         )
                         corretores_option.click()
+                        self.waits.gone(".el-select-dropdown", timeout=3, legacy=0.5)
                         print("[OK] Grupo de visitantes selecionado: Corretores")
-                        time.sleep(0.5)  # Otimizado
                     except:
                         print("[WARN] Não foi possível selecionar grupo de visitantes")
             except Exception as e:
@@ -960,7 +1187,7 @@ class HikCentralFormTest:
                 )
                 outras_tab.click()
                 print("[OK] 'Outras informações' clicado!")
-                time.sleep(3)
+                self.waits.settle(legacy=3)
             except Exception as e:
                 print(f"[WARN] Erro ao navegar para outras informações: {e}")
             
@@ -987,7 +1214,6 @@ class HikCentralFormTest:
                 # Clicar usando JavaScript para garantir funcionamento
                 self.driver.execute_script("arguments[0].click();", gender_radio)
                 print(f"[OK] Gênero {genero_visitante} selecionado!")
-                time.sleep(2)
             except Exception as e:
                 print(f"[WARN] Erro ao selecionar gênero: {e}")
                 # Tentar estratégia alternativa
@@ -999,7 +1225,6 @@ class HikCentralFormTest:
                     )
                     gender_label.click()
                     print(f"[OK] Gênero {genero_visitante} selecionado via label!")
-                    time.sleep(2)
                 except Exception as e2:
                     print(f"[WARN] Estratégia alternativa de gênero falhou: {e2}")
             
@@ -1010,13 +1235,13 @@ class HikCentralFormTest:
             if phone_value:
                 try:
                     # Procurar campo telefone pelo tips específico
-                    phone_field = self.driver.find_element(By.CSS_SELECTOR, 
-                        "input[tips*='1 a 32 caracteres permitidos, incluindo dígitos e sinais'][maxlength='32'].el-input__inner")
+                    phone_field = find(self.driver,
+                        "input[tips*='1 a 32 caracteres permitidos, incluindo dígitos e sinais'][maxlength='32'].el-input__inner",
+                        timeout=5, condition='visible')
                     
-                    if phone_field.is_displayed() and phone_field.is_enabled():
+                    if phone_field and phone_field.is_enabled():
                         # Scroll e foco
                         self.driver.execute_script("arguments[0].scrollIntoView(true);", phone_field)
-                        time.sleep(1)
                         
                         # Tentar clicar, se interceptar, fechar message box
                         try:
@@ -1025,21 +1250,15 @@ class HikCentralFormTest:
                             if "click intercepted" in str(e):
                                 print("[FIX] Clique interceptado no telefone, fechando message box...")
                                 self.close_any_message_box()
-                                time.sleep(1)
                                 phone_field.click()
                             else:
                                 raise e
                         
                         phone_field.clear()
-                        time.sleep(0.5)
                         
-                        # Digitar caractere por caractere
-                        for char in phone_value:
-                            phone_field.send_keys(char)
-                            time.sleep(0.1)
+                        self.fill_field(phone_field, phone_value)
                         
                         print(f"[OK] Telefone testado: {phone_value}")
-                        time.sleep(2)
                     else:
                         print("[WARN] Campo telefone não visível/habilitado")
                 except Exception as e:
@@ -1053,7 +1272,7 @@ class HikCentralFormTest:
                 )
                 id_tab.click()
                 print("[OK] 'Informação de ID' clicado!")
-                time.sleep(3)
+                self.waits.settle(legacy=3)
                 
                 # Preencher CPF no campo "Número de ID" 
                 cpf_value = self.visitor_data.get('cpf', '')
@@ -1061,12 +1280,11 @@ class HikCentralFormTest:
                 if cpf_value:
                     try:
                         # Procurar campo pelo ID específico "myDivs"
-                        cpf_field = self.driver.find_element(By.CSS_SELECTOR, "input[id='myDivs'].el-input__inner")
+                        cpf_field = find(self.driver, "input[id='myDivs'].el-input__inner", timeout=5, condition='visible')
                         
-                        if cpf_field.is_displayed() and cpf_field.is_enabled():
+                        if cpf_field and cpf_field.is_enabled():
                             # Scroll e foco
                             self.driver.execute_script("arguments[0].scrollIntoView(true);", cpf_field)
-                            time.sleep(1)
                             
                             # Tentar clicar
                             try:
@@ -1075,21 +1293,15 @@ class HikCentralFormTest:
                                 if "click intercepted" in str(e):
                                     print("[FIX] Clique interceptado no CPF, fechando message box...")
                                     self.close_any_message_box()
-                                    time.sleep(1)
                                     cpf_field.click()
                                 else:
                                     raise e
                             
                             cpf_field.clear()
-                            time.sleep(0.5)
                             
-                            # Digitar caractere por caractere
-                            for char in cpf_value:
-                                cpf_field.send_keys(char)
-                                time.sleep(0.1)
+                            self.fill_field(cpf_field, cpf_value)
                             
                             print(f"[OK] CPF preenchido no 'Numero de ID': {cpf_value}")
-                            time.sleep(2)
                         else:
                             print("[WARN] Campo Numero de ID não visível/habilitado")
                     except Exception as e:
@@ -1106,7 +1318,7 @@ class HikCentralFormTest:
                 )
                 acesso_tab.click()
                 print("[OK] 'Informação de acesso' clicado!")
-                time.sleep(3)
+                self.waits.settle(legacy=3)
             except Exception as e:
                 print(f"[WARN] Erro ao navegar para informação de acesso: {e}")
             
@@ -1120,11 +1332,10 @@ class HikCentralFormTest:
                 
                 # Scroll para o elemento
                 self.driver.execute_script("arguments[0].scrollIntoView(true);", expandir_icon)
-                time.sleep(1)
                 
                 expandir_icon.click()
                 print("[OK] 'Expandir' clicado!")
-                time.sleep(3)
+                self.waits.visible((By.CSS_SELECTOR, "input[maxlength='128'].el-input__inner"), timeout=5, legacy=3)
             except Exception as e:
                 print(f"[WARN] Erro ao clicar em expandir: {e}")
             
@@ -1134,13 +1345,13 @@ class HikCentralFormTest:
             if rg_value:
                 try:
                     # Procurar campo RG pelo tips específico
-                    rg_field = self.driver.find_element(By.CSS_SELECTOR, 
-                        "input[tips*='Intervalo: [0 a 128] não é possível introduzir carateres'][maxlength='128'].el-input__inner")
+                    rg_field = find(self.driver,
+                        "input[tips*='Intervalo: [0 a 128] não é possível introduzir carateres'][maxlength='128'].el-input__inner",
+                        timeout=5, condition='visible')
                     
-                    if rg_field.is_displayed() and rg_field.is_enabled():
+                    if rg_field and rg_field.is_enabled():
                         # Scroll e foco
                         self.driver.execute_script("arguments[0].scrollIntoView(true);", rg_field)
-                        time.sleep(1)
                         
                         # Tentar clicar, se interceptar, fechar message box
                         try:
@@ -1149,21 +1360,15 @@ class HikCentralFormTest:
                             if "click intercepted" in str(e):
                                 print("[FIX] Clique interceptado no RG, fechando message box...")
                                 self.close_any_message_box()
-                                time.sleep(1)
                                 rg_field.click()
                             else:
                                 raise e
                         
                         rg_field.clear()
-                        time.sleep(0.5)
                         
-                        # Digitar caractere por caractere
-                        for char in rg_value:
-                            rg_field.send_keys(char)
-                            time.sleep(0.1)
+                        self.fill_field(rg_field, rg_value)
                         
                         print(f"[OK] RG testado: {rg_value}")
-                        time.sleep(2)
                     else:
                         print("[WARN] Campo RG não visível/habilitado")
                 except Exception as e:
@@ -1181,15 +1386,13 @@ class HikCentralFormTest:
                     ]
                     
                     placa_field = None
-                    for selector in placa_selectors:
+                    for selector in selector_cache.candidates('form.placa', placa_selectors):
                         try:
-                            if selector.startswith("//"):
-                                placa_field = self.driver.find_element(By.XPATH, selector)
-                            else:
-                                placa_field = self.driver.find_element(By.CSS_SELECTOR, selector)
+                            placa_field = find(self.driver, selector, timeout=3, condition='visible')
                             
-                            if placa_field.is_displayed() and placa_field.is_enabled():
+                            if placa_field and placa_field.is_enabled():
                                 print(f"[OK] Campo placa encontrado com: {selector}")
+                                selector_cache.hit('form.placa', selector)
                                 break
                         except:
                             continue
@@ -1197,7 +1400,6 @@ class HikCentralFormTest:
                     if placa_field:
                         # Scroll e foco
                         self.driver.execute_script("arguments[0].scrollIntoView(true);", placa_field)
-                        time.sleep(1)
                         
                         # Tentar clicar, se interceptar, fechar message box
                         try:
@@ -1206,21 +1408,15 @@ class HikCentralFormTest:
                             if "click intercepted" in str(e):
                                 print("[FIX] Clique interceptado na placa, fechando message box...")
                                 self.close_any_message_box()
-                                time.sleep(1)
                                 placa_field.click()
                             else:
                                 raise e
                         
                         placa_field.clear()
-                        time.sleep(0.5)
                         
-                        # Digitar caractere por caractere
-                        for char in placa_value:
-                            placa_field.send_keys(char)
-                            time.sleep(0.1)
+                        self.fill_field(placa_field, placa_value)
                         
                         print(f"[OK] Placa testada: {placa_value}")
-                        time.sleep(2)
                     else:
                         print("[WARN] Campo placa não encontrado")
                 except Exception as e:
@@ -1230,250 +1426,347 @@ class HikCentralFormTest:
 
             print("\n[OK] TESTE DE PREENCHIMENTO CONCLUIDO!")
             print("Processo otimizado - finalizando rapidamente...")
-            time.sleep(1)  # Otimizado de 30s para 1s
             
         except Exception as e:
             print(f"[ERRO] Erro no teste de preenchimento: {e}")
     
     def run_test(self):
-        """Executar teste completo"""
+        """Executar teste completo (compatível com o uso via linha de comando)"""
+        return self.run().success
+
+    def run(self, visitor_data=None, prepare_next=False):
+        """
+        Executar cadastro completo e retornar AutomationResult com tempos por etapa
+
+        Args:
+            prepare_next: fila com backlog - deixar o formulário limpo para o próximo job
+        """
+        if visitor_data is not None:
+            self.visitor_data = visitor_data
+
+        result = AutomationResult(self.visitor_id, self.visitor_data.get('action', 'create'))
+
         print("\n[INICIO] INICIANDO TESTE DIRETO DO FORMULARIO")
         print("="*60)
         
         try:
-            # Setup
-            if not self.setup_driver():
-                return False
-            
-            # Login
-            if not self.login():
-                return False
-            
-            # Navegar para formulário
-            if not self.navigate_to_form():
-                return False
+            if self.owns_driver:
+                # Setup
+                if not result.timed('setup_driver', self.setup_driver):
+                    return result.finish(False, 'Falha ao iniciar Chrome')
+
+                # Login
+                with self.waits.step('login'):
+                    if not result.timed('login', self.login):
+                        return result.finish(False, 'Falha no login do HikCentral')
+            else:
+                print("[POOL] Reutilizando sessão Chrome já autenticada")
+
+            # Lease perdido: o job já pode estar com outro worker
+            if self.lease_perdido():
+                return result.finish(False, LEASE_LOST_ERROR)
+
+            # Navegar para formulário (ou reaproveitar o que o job anterior deixou limpo)
+            with self.waits.step('navigate_to_form'):
+                if not result.timed('navigate_to_form', self.open_form):
+                    return result.finish(False, 'Falha na navegação até o formulário')
             
             # Debug dos campos
-            self.debug_form_fields()
+            with self.waits.step('debug_form_fields'):
+                result.timed('debug_form_fields', self.debug_form_fields)
+            
+            if self.lease_perdido():
+                return result.finish(False, LEASE_LOST_ERROR)
             
             # Testar preenchimento
-            self.test_field_filling()
+            with self.waits.step('fill_fields'):
+                result.timed('fill_fields', self.test_field_filling)
             
-            # ============ FINALIZAR CADASTRO - BOTÃO ENTRADA OTIMIZADO ============
-            print("[FINAL] Clicando no botão Entrada para finalizar cadastro...")
-            try:
-                # Rolar para baixo para ver o botão
-                self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-                time.sleep(0.3)  # Reduzido de 1s para 0.3s
+            if self.lease_perdido():
+                return result.finish(False, LEASE_LOST_ERROR)
+            
+            # Finalizar cadastro (Entrada -> Visualizar -> Aplicar agora -> Fechar)
+            with self.waits.step('finalize'):
+                started = time.perf_counter()
+                try:
+                    outcome = self.finalizar_cadastro()
+                except Exception as e:
+                    result.record('finalize', time.perf_counter() - started, ok=False, detail=str(e))
+                    raise
+                result.record('finalize', time.perf_counter() - started, ok=outcome == FINALIZE_SAVED,
+                              detail=None if outcome == FINALIZE_SAVED else outcome)
+            if outcome == FINALIZE_LEASE_LOST:
+                return result.finish(False, LEASE_LOST_ERROR)
+            if outcome != FINALIZE_SAVED:
+                return result.finish(False, NOT_SAVED_ERROR)
+            
+            # Próximo visitante já na fila: formulário limpo sem sair da página
+            if prepare_next and FORM_REUSE and self.form_state is not None:
+                # Cadastro já concluído: falha aqui só faz o próximo job navegar de novo
+                started = time.perf_counter()
+                try:
+                    with self.waits.step('prepare_next_form'):
+                        prepared = self.prepare_next_form()
+                except Exception as e:
+                    print(f"[WARN] Erro ao preparar formulário para o próximo cadastro: {e}")
+                    prepared = False
+                result.record('prepare_next_form', time.perf_counter() - started,
+                              detail=None if prepared else 'formulário não preparado')
+            
+            return result.finish(True)
+            
+        except Exception as e:
+            print(f"[ERRO] Erro durante teste: {e}")
+            return result.finish(False, e)
+        finally:
+            # Driver emprestado pelo pool continua vivo para o próximo job
+            if self.navigation:
+                result.details['navigation'] = dict(self.navigation)
+            if self.fill_modes:
+                result.details['fill_modes'] = dict(self.fill_modes)
+            if self._waits is not None:
+                result.details['waits'] = self._waits.report()
+                self._waits.print_report()
+            selector_cache.save()
+            selector_cache.print_report()
+            if self.owns_driver:
+                result.timed('cleanup', self.cleanup)
+            print(f"[RESULT] {result.summary()}")
+
+    def finalizar_cadastro(self):
+        """
+        Finalizar cadastro clicando em Entrada e aplicando as alterações.
+
+        Returns:
+            str: FINALIZE_SAVED, FINALIZE_NOT_SAVED ou FINALIZE_LEASE_LOST
+        """
+        # ============ FINALIZAR CADASTRO - BOTÃO ENTRADA OTIMIZADO ============
+        print("[FINAL] Clicando no botão Entrada para finalizar cadastro...")
+        entrada_clicked = False
+        try:
+            # Rolar para baixo para ver o botão
+            self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+            
+            # Encontrar e clicar no botão Entrada - TIMEOUT AGRESSIVO
+            entrada_selectors = [
+                "//button[@title='Entrada']//span[text()='Entrada']",
+                "//button[contains(@class, 'btn-primary')]//span[text()='Entrada']",
+                "button[title='Entrada']",
+                "//button[contains(@class, 'el-button--primary') and contains(., 'Entrada')]"
+            ]
+            
+            for selector in selector_cache.candidates('form.entrada', entrada_selectors):
+                try:
+                    if selector.startswith("//"):
+                        entrada_btn = WebDriverWait(self.driver, 1).until(  # Reduzido de 3s para 1s
+                            EC.element_to_be_clickable((By.XPATH, selector))
+                        )
+                    else:
+                        entrada_btn = WebDriverWait(self.driver, 1).until(  # Reduzido de 3s para 1s
+                            EC.element_to_be_clickable((By.CSS_SELECTOR, selector))
+                        )
+                    
+                    # Rolar até o botão
+                    self.driver.execute_script("arguments[0].scrollIntoView(true);", entrada_btn)
+                    
+                    # Última verificação antes de gravar: sem lease, outro worker pode estar cadastrando
+                    if self.lease_perdido():
+                        print("[ABORT] Lease perdido - cadastro abortado sem clicar em Entrada")
+                        return FINALIZE_LEASE_LOST
+                    
+                    # Tentar clicar
+                    try:
+                        entrada_btn.click()
+                    except:
+                        self.driver.execute_script("arguments[0].click();", entrada_btn)
+                    
+                    print(f"[OK] Botão Entrada clicado com sucesso usando: {selector}")
+                    selector_cache.hit('form.entrada', selector)
+                    entrada_clicked = True
+                    break
+                    
+                except Exception as e:
+                    print(f"[WARN] Selector {selector} não funcionou: {e}")
+                    continue
+            
+            if not entrada_clicked:
+                print("[ERRO] Não foi possível clicar no botão Entrada - cadastro não gravado")
+                return FINALIZE_NOT_SAVED
+
+            self.waits.settle(legacy=5, timeout=15)  # Estabilizar a página
+            print("[SUCCESS] CADASTRO FINALIZADO COM ENTRADA!")
                 
-                # Encontrar e clicar no botão Entrada - TIMEOUT AGRESSIVO
-                entrada_selectors = [
-                    "//button[@title='Entrada']//span[text()='Entrada']",
-                    "//button[contains(@class, 'btn-primary')]//span[text()='Entrada']",
-                    "button[title='Entrada']",
-                    "//button[contains(@class, 'el-button--primary') and contains(., 'Entrada')]"
+            # ============ VISUALIZAR E APLICAR AGORA - OTIMIZADO ============
+            print("[FINAL] Clicando em Visualizar e Aplicar agora...")
+            try:
+                # 1. Clicar em VISUALIZAR no topo - COM TIMEOUT REDUZIDO
+                visualizar_selectors = [
+                    "//button[contains(@class, 'el-button--link')]//span[text()='Visualizar']",
+                    "//button[@title='']//span[text()='Visualizar']",
+                    "//span[text()='Visualizar']/parent::button"
                 ]
                 
-                entrada_clicked = False
-                for selector in entrada_selectors:
+                visualizar_clicked = False
+                for selector in selector_cache.candidates('form.visualizar', visualizar_selectors):
                     try:
-                        if selector.startswith("//"):
-                            entrada_btn = WebDriverWait(self.driver, 1).until(  # Reduzido de 3s para 1s
-                                EC.element_to_be_clickable((By.XPATH, selector))
-                            )
-                        else:
-                            entrada_btn = WebDriverWait(self.driver, 1).until(  # Reduzido de 3s para 1s
-                                EC.element_to_be_clickable((By.CSS_SELECTOR, selector))
-                            )
+                        visualizar_btn = WebDriverWait(self.driver, 3).until(  # Aumentado para 3s para dar tempo
+                            EC.element_to_be_clickable((By.XPATH, selector))
+                        )
                         
-                        # Rolar até o botão
-                        self.driver.execute_script("arguments[0].scrollIntoView(true);", entrada_btn)
-                        time.sleep(0.1)  # Reduzido de 0.5s para 0.1s
+                        # Rolar para o topo da página
+                        self.driver.execute_script("window.scrollTo(0, 0);")
                         
-                        # Tentar clicar
+                        # Clicar em Visualizar
                         try:
-                            entrada_btn.click()
+                            visualizar_btn.click()
                         except:
-                            self.driver.execute_script("arguments[0].click();", entrada_btn)
+                            self.driver.execute_script("arguments[0].click();", visualizar_btn)
                         
-                        print(f"[OK] Botão Entrada clicado com sucesso usando: {selector}")
-                        entrada_clicked = True
+                        print(f"[OK] Botão Visualizar clicado usando: {selector}")
+                        selector_cache.hit('form.visualizar', selector)
+                        visualizar_clicked = True
                         break
                         
                     except Exception as e:
-                        print(f"[WARN] Selector {selector} não funcionou: {e}")
+                        print(f"[WARN] Selector Visualizar {selector} falhou: {e}")
                         continue
                 
-                if entrada_clicked:
-                    time.sleep(5)  # Aumentado para 5s para estabilizar a página
-                    print("[SUCCESS] CADASTRO FINALIZADO COM ENTRADA!")
-                    
-                # ============ VISUALIZAR E APLICAR AGORA - OTIMIZADO ============
-                print("[FINAL] Clicando em Visualizar e Aplicar agora...")
-                try:
-                    # 1. Clicar em VISUALIZAR no topo - COM TIMEOUT REDUZIDO
-                    visualizar_selectors = [
-                        "//button[contains(@class, 'el-button--link')]//span[text()='Visualizar']",
-                        "//button[@title='']//span[text()='Visualizar']",
-                        "//span[text()='Visualizar']/parent::button"
-                    ]
-                    
-                    visualizar_clicked = False
-                    for selector in visualizar_selectors:
+                if not visualizar_clicked:
+                    print("[WARN] Não foi possível clicar em Visualizar")
+                    # Não retorna aqui, continua para tentar Aplicar agora
+                
+                self.waits.settle(legacy=2)  # Botões do Visualizar carregarem
+                
+                # 2. Clicar em APLICAR AGORA - COM TIMEOUT REDUZIDO
+                aplicar_selectors = [
+                    "//button[contains(@class, 'el-button--primary')]//span[text()='Aplicar agora']",
+                    "//button[@data-v-3f3e8cbf]//span[text()='Aplicar agora']",
+                    "//span[text()='Aplicar agora']/parent::button"
+                ]
+                
+                aplicar_clicked = False
+                for selector in selector_cache.candidates('form.aplicar', aplicar_selectors):
+                    try:
+                        aplicar_btn = WebDriverWait(self.driver, 3).until(  # Aumentado para 3s para dar tempo
+                            EC.element_to_be_clickable((By.XPATH, selector))
+                        )
+                        
+                        # Clicar em Aplicar agora
                         try:
-                            visualizar_btn = WebDriverWait(self.driver, 3).until(  # Aumentado para 3s para dar tempo
-                                EC.element_to_be_clickable((By.XPATH, selector))
-                            )
-                            
-                            # Rolar para o topo da página
-                            self.driver.execute_script("window.scrollTo(0, 0);")
-                            time.sleep(0.1)  # Reduzido de 0.3s para 0.1s
-                            
-                            # Clicar em Visualizar
-                            try:
-                                visualizar_btn.click()
-                            except:
-                                self.driver.execute_script("arguments[0].click();", visualizar_btn)
-                            
-                            print(f"[OK] Botão Visualizar clicado usando: {selector}")
-                            visualizar_clicked = True
-                            break
-                            
-                        except Exception as e:
-                            print(f"[WARN] Selector Visualizar {selector} falhou: {e}")
-                            continue
-                    
-                    if not visualizar_clicked:
-                        print("[WARN] Não foi possível clicar em Visualizar")
-                        # Não retorna aqui, continua para tentar Aplicar agora
-                    
-                    time.sleep(2)  # Aumentado para 2s para dar tempo dos botões carregarem
+                            aplicar_btn.click()
+                        except:
+                            self.driver.execute_script("arguments[0].click();", aplicar_btn)
+                        
+                        print(f"[OK] Botão Aplicar agora clicado usando: {selector}")
+                        selector_cache.hit('form.aplicar', selector)
+                        aplicar_clicked = True
+                        break
+                        
+                    except Exception as e:
+                        print(f"[WARN] Selector Aplicar {selector} falhou: {e}")
+                        continue
+                
+                if aplicar_clicked:
+                    print("[WAIT] Aguardando aparecer botão Fechar...")
+                    self.waits.visible((By.XPATH, FECHAR_DIALOG_XPATH), timeout=10, legacy=3)
                     
-                    # 2. Clicar em APLICAR AGORA - COM TIMEOUT REDUZIDO
-                    aplicar_selectors = [
-                        "//button[contains(@class, 'el-button--primary')]//span[text()='Aplicar agora']",
-                        "//button[@data-v-3f3e8cbf]//span[text()='Aplicar agora']",
-                        "//span[text()='Aplicar agora']/parent::button"
+                    # 3. Clicar em FECHAR
+                    fechar_selectors = [
+                        "//button[contains(@class, 'el-button--default')]//span[text()='Fechar']",
+                        "//button[@title='']//span[text()='Fechar']",
+                        "//span[text()='Fechar']/parent::button"
                     ]
                     
-                    aplicar_clicked = False
-                    for selector in aplicar_selectors:
+                    fechar_clicked = False
+                    for selector in selector_cache.candidates('form.fechar', fechar_selectors):
                         try:
-                            aplicar_btn = WebDriverWait(self.driver, 3).until(  # Aumentado para 3s para dar tempo
+                            fechar_btn = WebDriverWait(self.driver, 3).until(
                                 EC.element_to_be_clickable((By.XPATH, selector))
                             )
                             
-                            # Clicar em Aplicar agora
+                            # Clicar em Fechar
                             try:
-                                aplicar_btn.click()
+                                fechar_btn.click()
                             except:
-                                self.driver.execute_script("arguments[0].click();", aplicar_btn)
+                                self.driver.execute_script("arguments[0].click();", fechar_btn)
                             
-                            print(f"[OK] Botão Aplicar agora clicado usando: {selector}")
-                            aplicar_clicked = True
+                            print(f"[OK] Botão Fechar clicado usando: {selector}")
+                            selector_cache.hit('form.fechar', selector)
+                            fechar_clicked = True
                             break
                             
                         except Exception as e:
-                            print(f"[WARN] Selector Aplicar {selector} falhou: {e}")
+                            print(f"[WARN] Selector Fechar {selector} falhou: {e}")
                             continue
                     
-                    if aplicar_clicked:
-                        print("[WAIT] Aguardando aparecer botão Fechar...")
-                        time.sleep(3)  # Aguardar botão Fechar aparecer
-                        
-                        # 3. Clicar em FECHAR
-                        fechar_selectors = [
-                            "//button[contains(@class, 'el-button--default')]//span[text()='Fechar']",
-                            "//button[@title='']//span[text()='Fechar']",
-                            "//span[text()='Fechar']/parent::button"
-                        ]
-                        
-                        fechar_clicked = False
-                        for selector in fechar_selectors:
-                            try:
-                                fechar_btn = WebDriverWait(self.driver, 3).until(
-                                    EC.element_to_be_clickable((By.XPATH, selector))
-                                )
-                                
-                                # Clicar em Fechar
-                                try:
-                                    fechar_btn.click()
-                                except:
-                                    self.driver.execute_script("arguments[0].click();", fechar_btn)
-                                
-                                print(f"[OK] Botão Fechar clicado usando: {selector}")
-                                fechar_clicked = True
-                                break
-                                
-                            except Exception as e:
-                                print(f"[WARN] Selector Fechar {selector} falhou: {e}")
-                                continue
-                        
-                        if fechar_clicked:
-                            print("[WAIT] Aguardando finalização completa (20s)...")
-                            time.sleep(20)  # Aguardar 20 segundos para finalizar
-                            print("[SUCCESS] CADASTRO TOTALMENTE FINALIZADO E SINCRONIZADO!")
+                    if fechar_clicked:
+                        print("[WAIT] Aguardando confirmação do salvamento...")
+                        # Antes eram 20s fixos; agora até a mensagem de sucesso ou o diálogo
+                        # fechar e a lista recarregar
+                        signal = self.waits.save_confirmed(FECHAR_DIALOG_XPATH, timeout=20, legacy=20)
+                        if signal:
+                            print(f"[SUCCESS] CADASTRO TOTALMENTE FINALIZADO E SINCRONIZADO! (confirmação: {signal})")
                         else:
-                            print("[WARN] Não foi possível clicar em Fechar, mas cadastro foi aplicado")
-                            time.sleep(10)  # Aguardar menos tempo se não conseguir fechar
+                            print("[WARN] Salvamento não confirmado pela interface em 20s")
                     else:
-                        print("[WARN] Não foi possível clicar em Aplicar agora")
-                        
-                except Exception as e:
-                    print(f"[ERRO] Erro na finalização com Visualizar/Aplicar: {e}")
-                        
+                        print("[WARN] Não foi possível clicar em Fechar, mas cadastro foi aplicado")
+                        # Diálogo continua aberto: só a mensagem de sucesso confirma
+                        if not self.waits.save_confirmed(timeout=10, legacy=10):
+                            print("[WARN] Salvamento não confirmado pela interface em 10s")
                 else:
-                    print("[WARN] Não foi possível clicar no botão Entrada")
+                    print("[WARN] Não foi possível clicar em Aplicar agora")
                     
             except Exception as e:
-                print(f"[ERRO] Erro ao finalizar com botão Entrada: {e}")
-            
-            return True
-            
+                print(f"[ERRO] Erro na finalização com Visualizar/Aplicar: {e}")
+                
         except Exception as e:
-            print(f"[ERRO] Erro durante teste: {e}")
-            return False
-        finally:
-            # ✅ LIMPEZA AUTOMÁTICA MELHORADA
-            print("[CLEANUP] Iniciando limpeza automática...")
-            
-            # Fechar driver
-            if self.driver:
-                try:
-                    self.driver.quit()
-                    print("[CLEANUP] Driver fechado")
-                except Exception as e:
-                    print(f"[WARN] Erro ao fechar driver: {e}")
-            
-            # Aguardar processos finalizarem
-            time.sleep(2)
-            
-            # Limpar diretório temporário do Chrome
-            if self.temp_profile and os.path.exists(self.temp_profile):
-                try:
-                    import shutil
-                    shutil.rmtree(self.temp_profile, ignore_errors=True)
-                    print(f"[CLEANUP] Perfil temporário removido: {self.temp_profile}")
-                except Exception as e:
-                    print(f"[WARN] Erro ao limpar perfil temporário: {e}")
-            
-            # Limpeza final de processos órfãos
+            print(f"[ERRO] Erro ao finalizar com botão Entrada: {e}")
+
+        # Entrada grava o cadastro; Visualizar/Aplicar só sincronizam com os dispositivos
+        return FINALIZE_SAVED if entrada_clicked else FINALIZE_NOT_SAVED
+
+    def cleanup(self):
+        """Fechar driver e remover perfil temporário do Chrome"""
+        # ✅ LIMPEZA AUTOMÁTICA MELHORADA
+        print("[CLEANUP] Iniciando limpeza automática...")
+        
+        # Fechar driver
+        if self.driver:
             try:
-                import psutil
-                chrome_count = 0
-                for proc in psutil.process_iter(['pid', 'name']):
-                    try:
-                        if proc.info['name'] and 'chrome' in proc.info['name'].lower():
-                            chrome_count += 1
-                    except (psutil.NoSuchProcess, psutil.AccessDenied):
-                        continue
-                
-                print(f"[CLEANUP] Processos Chrome restantes: {chrome_count}")
-                
+                self.driver.quit()
+                print("[CLEANUP] Driver fechado")
             except Exception as e:
-                print(f"[WARN] Erro na verificação final: {e}")
+                print(f"[WARN] Erro ao fechar driver: {e}")
+        
+        # Aguardar processos finalizarem
+        time.sleep(2)
+        
+        # Limpar diretório temporário do Chrome
+        if self.temp_profile and os.path.exists(self.temp_profile):
+            try:
+                import shutil
+                shutil.rmtree(self.temp_profile, ignore_errors=True)
+                print(f"[CLEANUP] Perfil temporário removido: {self.temp_profile}")
+            except Exception as e:
+                print(f"[WARN] Erro ao limpar perfil temporário: {e}")
+        
+        # Limpeza final de processos órfãos
+        try:
+            import psutil
+            chrome_count = 0
+            for proc in psutil.process_iter(['pid', 'name']):
+                try:
+                    if proc.info['name'] and 'chrome' in proc.info['name'].lower():
+                        chrome_count += 1
+                except (psutil.NoSuchProcess, psutil.AccessDenied):
+                    continue
             
-            print("[CLEANUP] Limpeza concluída")
+            print(f"[CLEANUP] Processos Chrome restantes: {chrome_count}")
+            
+        except Exception as e:
+            print(f"[WARN] Erro na verificação final: {e}")
+        
+        print("[CLEANUP] Limpeza concluída")
 
     def preencher_campo_visitado(self):
         """Preencher campo 'Visitado' com nome do morador usando API normalizada"""
@@ -1509,12 +1802,13 @@ class HikCentralFormTest:
             ]
             
             visitado_field = None
-            for selector in visitado_selectors:
+            for selector in selector_cache.candidates('form.visitado', visitado_selectors):
                 try:
-                    field = self.driver.find_element(By.XPATH, selector)
-                    if field.is_displayed() and field.is_enabled():
+                    field = find(self.driver, selector, timeout=3, condition='visible')
+                    if field and field.is_enabled():
                         visitado_field = field
                         print(f"[OK] Campo visitado encontrado com: {selector}")
+                        selector_cache.hit('form.visitado', selector)
                         break
                 except:
                     continue
@@ -1525,7 +1819,6 @@ class HikCentralFormTest:
             
             # 2. SCROLL E CLICAR NO CAMPO
             self.driver.execute_script("arguments[0].scrollIntoView(true);", visitado_field)
-            time.sleep(1)
             
             try:
                 visitado_field.click()
@@ -1533,40 +1826,37 @@ class HikCentralFormTest:
                 if "click intercepted" in str(e):
                     print("[FIX] Clique interceptado no visitado, fechando message box...")
                     self.close_any_message_box()
-                    time.sleep(1)
                     visitado_field.click()
                 else:
                     raise e
             
             # 3. LIMPAR CAMPO E DIGITAR NOME NORMALIZADO
             visitado_field.clear()
-            time.sleep(0.5)
-            
-            print(f"[INFO] Digitando nome normalizado: {nome_busca}")
             
-            # Digitar caractere por caractere
-            for char in nome_busca:
-                visitado_field.send_keys(char)
-                time.sleep(0.1)
+            print(f"[INFO] Preenchendo nome normalizado: {nome_busca}")
+            pesquisar_locator = (By.XPATH, "//li[contains(@class, 'el-autocomplete-suggestion__item')]//label[text()='Pesquisar por nome da pessoa']")
             
-            time.sleep(2)  # Aguardar sugestões aparecerem
+            # Envio único (teclas reais disparam o autocomplete); digitação só se as sugestões não abrirem
+            self.fill_field(visitado_field, nome_busca, mode='bulk')
+            if not self.waits.visible(pesquisar_locator, timeout=3, legacy=2):
+                print("[WARN] Sugestões não apareceram, digitando caractere por caractere...")
+                self.fill_field(visitado_field, nome_busca, mode='type')
             
-            # 4. CLICAR NA OPÇÃO "Pesquisar por nome da pessoa"
+            # 4. CLICAR NA OPÇÃO "Pesquisar por nome da pessoa" (aguarda sugestões aparecerem)
             print("[INFO] Procurando opção 'Pesquisar por nome da pessoa'...")
+            resultados = (By.XPATH, "//ul[@class='person-search-panel']//li[contains(@class, 'person-info-search-item-template')]")
             try:
-                pesquisar_option = WebDriverWait(self.driver, 5).until(
-                    EC.element_to_be_clickable((By.XPATH, "//li[contains(@class, 'el-autocomplete-suggestion__item')]//label[text()='Pesquisar por nome da pessoa']"))
-                )
+                pesquisar_option = self.waits.clickable(pesquisar_locator, timeout=7)
                 pesquisar_option.click()
                 print("[OK] Opção 'Pesquisar por nome da pessoa' clicada")
-                time.sleep(3)  # Aguardar resultados da busca
+                self.waits.visible(resultados, timeout=10, legacy=3)  # Aguardar resultados da busca
             except Exception as e:
                 print(f"[WARN] Erro ao clicar em 'Pesquisar por nome da pessoa': {e}")
                 # Tentar alternativa: pressionar Enter
                 try:
                     visitado_field.send_keys(Keys.ENTER)
                     print("[OK] Pressionado Enter como alternativa")
-                    time.sleep(3)
+                    self.waits.visible(resultados, timeout=10, legacy=3)
                 except:
                     print("[ERROR] Não foi possível iniciar busca")
                     return
@@ -1585,8 +1875,8 @@ class HikCentralFormTest:
                 morador_card = None
                 for selector in morador_selectors:
                     try:
-                        card = self.driver.find_element(By.XPATH, selector)
-                        if card.is_displayed():
+                        card = probe_visible(self.driver, selector)
+                        if card:
                             # Encontrar o elemento clicável (li pai)
                             morador_card = card.find_element(By.XPATH, "./ancestor::li[contains(@class, 'person-info-search-item-template')]")
                             print(f"[OK] Morador encontrado com: {selector}")
@@ -1608,7 +1898,7 @@ class HikCentralFormTest:
                 # Clicar no card do morador
                 self.driver.execute_script("arguments[0].click();", morador_card)
                 print(f"[OK] Morador '{nome_busca}' selecionado!")
-                time.sleep(2)
+                self.waits.settle(legacy=2)
                 
             except Exception as e:
                 print(f"[ERROR] Erro ao selecionar morador: {e}")
@@ -1673,22 +1963,26 @@ class HikCentralFormTest:
             ]
             
             data_field = None
-            for selector in data_selectors:
+            for selector in selector_cache.candidates('form.data_saida', data_selectors):
                 try:
                     if "h-icon-calendar" in selector:
                         # Clicar no ícone do calendário
-                        calendar_icon = self.driver.find_element(By.CSS_SELECTOR, selector)
-                        if calendar_icon.is_displayed():
+                        calendar_icon = probe_visible(self.driver, selector)
+                        if calendar_icon:
                             calendar_icon.click()
-                            time.sleep(1)
+                            self.waits.visible((By.CSS_SELECTOR, ".el-picker-panel"), timeout=3, legacy=1)
                             # Depois encontrar o input
-                            data_field = self.driver.find_element(By.CSS_SELECTOR, "input.el-input__inner[title*='23:59:59']")
+                            data_field = find(self.driver, "input.el-input__inner[title*='23:59:59']", timeout=3)
+                            if not data_field:
+                                continue
+                            selector_cache.hit('form.data_saida', selector)
                             break
                     else:
-                        field = self.driver.find_element(By.CSS_SELECTOR, selector)
-                        if field.is_displayed() and field.is_enabled():
+                        field = probe_visible(self.driver, selector)
+                        if field and field.is_enabled():
                             data_field = field
                             print(f"[OK] Campo de data encontrado com: {selector}")
+                            selector_cache.hit('form.data_saida', selector)
                             break
                 except:
                     continue
@@ -1699,7 +1993,6 @@ class HikCentralFormTest:
             
             # Scroll para o elemento
             self.driver.execute_script("arguments[0].scrollIntoView(true);", data_field)
-            time.sleep(1)
             
             # Clicar no campo para ativar
             try:
@@ -1707,10 +2000,9 @@ class HikCentralFormTest:
             except Exception as e:
                 if "click intercepted" in str(e):
                     self.close_any_message_box()
-                    time.sleep(1)
                     data_field.click()
             
-            time.sleep(1)
+            self.waits.visible((By.CSS_SELECTOR, ".el-picker-panel"), timeout=3, legacy=1)
             
             # Ler data atual do campo para calcular corretamente
             try:
@@ -1763,9 +2055,7 @@ class HikCentralFormTest:
             # Estratégia 1: Selecionar tudo e apagar
             try:
                 data_field.send_keys(Keys.CONTROL + "a")
-                time.sleep(0.3)
                 data_field.send_keys(Keys.BACKSPACE)
-                time.sleep(0.3)
                 print("[OK] Estratégia 1: Ctrl+A + Backspace")
             except:
                 print("[WARN] Estratégia 1 falhou")
@@ -1773,9 +2063,7 @@ class HikCentralFormTest:
             # Estratégia 2: Limpar com clear() e JavaScript
             try:
                 data_field.clear()
-                time.sleep(0.2)
                 self.driver.execute_script("arguments[0].value = '';", data_field)
-                time.sleep(0.2)
                 print("[OK] Estratégia 2: clear() + JavaScript")
             except:
                 print("[WARN] Estratégia 2 falhou")
@@ -1793,29 +2081,26 @@ class HikCentralFormTest:
             valor_atual = data_field.get_attribute('value') or ""
             print(f"[DEBUG] Campo após limpeza: '{valor_atual}'")
             
-            # Digitar nova data caractere por caractere
+            # Enviar nova data de uma vez
             print(f"[DEBUG] Digitando: {nova_data}")
-            for i, char in enumerate(nova_data):
-                try:
-                    data_field.send_keys(char)
-                    time.sleep(0.05)
-                except:
-                    print(f"[WARN] Erro ao digitar caractere {i}: '{char}'")
+            try:
+                data_field.send_keys(nova_data)
+            except Exception as e:
+                print(f"[WARN] Erro ao digitar data: {e}")
             
-            time.sleep(0.5)
             valor_final = data_field.get_attribute('value') or ""
             print(f"[DEBUG] Campo após digitação: '{valor_final}'")
             
             # Clicar em área vazia para fechar calendário (lado direito da tela)
             try:
                 self.driver.execute_script("document.elementFromPoint(window.innerWidth - 50, 200).click();")
-                time.sleep(1)
+                self.waits.gone(".el-picker-panel", timeout=3, legacy=1)
                 print("[OK] Calendário fechado")
             except:
                 # Fallback: pressionar Escape
                 try:
                     data_field.send_keys(Keys.ESCAPE)
-                    time.sleep(1)
+                    self.waits.gone(".el-picker-panel", timeout=3, legacy=1)
                     print("[FALLBACK] Calendário fechado com Escape")
                 except:
                     print("[WARN] Não foi possível fechar calendário")
@@ -1825,11 +2110,17 @@ class HikCentralFormTest:
         except Exception as e:
             print(f"[WARN] Erro ao configurar duração: {e}")
 
+def run(visitor_data, visitor_id=None, headless=None, driver=None):
+    """Executar um cadastro como biblioteca (sem subprocesso nem JSON temporário)"""
+    visitor_id = visitor_id or visitor_data.get('visitor_id') or "lib-job"
+    return HikCentralFormTest(visitor_data, visitor_id, headless, driver=driver).run()
+
 def main():
     parser = argparse.ArgumentParser(description='Teste direto do formulário HikCentral')
     parser.add_argument('--visitor-data', help='Caminho para JSON com dados do visitante')
     parser.add_argument('--visitor-id', help='ID do visitante')
-    parser.add_argument('--headless', action='store_true', help='Executar em modo headless')
+    parser.add_argument('--headless', action='store_true', help='Executar em modo headless (padrão)')
+    parser.add_argument('--visible', action='store_true', help='Mostrar a janela do Chrome')
     args = parser.parse_args()
     
     # Dados de teste padrão
@@ -1873,9 +2164,9 @@ def main():
         print(f"[ERRO] Erro ao carregar .env: {e}")
         return False
     
-    # ✅ MODO VISUAL POR PADRÃO (SEM HEADLESS)
-    print("[SETUP] MODO VISUAL ATIVADO - Chrome será visível")
-    headless_mode = args.headless if hasattr(args, 'headless') else False
+    # ✅ HEADLESS POR PADRÃO (--visible ou HEADLESS=false mostram a janela)
+    headless_mode = True if args.headless else (False if args.visible else HEADLESS)
+    print(f"[SETUP] {'MODO HEADLESS' if headless_mode else 'MODO VISUAL ATIVADO - Chrome será visível'}")
     tester = HikCentralFormTest(visitor_data, visitor_id, headless_mode)
     
     try:
@@ -16,18 +16,32 @@ from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.common.action_chains import ActionChains
 from webdriver_manager.chrome import ChromeDriverManager
 from selenium.webdriver.chrome.service import Service
 
+from automation_result import AutomationResult, LEASE_LOST_ERROR
+from selector_cache import selector_cache
+from hikcentral_lookup import configure_driver, probe_visible, find
+from hikcentral_session import session_store
+from hikcentral_routes import route_cache
+from hikcentral_version import ensure_version
+
 class HikCentralReactivator:
-    def __init__(self, visitor_data, visitor_id, headless=True):
+    def __init__(self, visitor_data, visitor_id, headless=True, driver=None, lease_lost=None):
         self.visitor_data = visitor_data
         self.visitor_id = visitor_id
         self.headless = headless  # Sempre headless por padrão
-        self.driver = None
+        # Driver externo (pool de sessões): já vem configurado e logado
+        self.driver = driver
+        self.owns_driver = driver is None
+        # threading.Event do lease do servidor: marcado, outro worker pode assumir a reativação
+        self.lease_lost = lease_lost
+        self.aborted_lease_lost = False  # reactivate_visitor parou antes de Reservar
+        self.navigation = None
         
         # URLs e credenciais do ambiente
         self.hikcentral_url = os.getenv('HIKCENTRAL_URL', 'http://192.168.1.100:8090')
@@ -89,7 +103,7 @@ class HikCentralReactivator:
         print("[INFO] Configuração Chrome otimizada para reativação")
 
         if self.headless:
-            options.add_argument("--headless")
+            options.add_argument("--headless=new")
             print("[INFO] Modo headless ativado - execução sem interface visual")
 
         # Estratégias de inicialização Chrome - MELHORADAS
@@ -104,7 +118,7 @@ class HikCentralReactivator:
             self.driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
             
             # Configurar timeouts adequados
-            self.driver.implicitly_wait(10)
+            configure_driver(self.driver)  # Sem implicit wait: só esperas explícitas
             self.driver.set_page_load_timeout(30)
             
             print("[OK] Chrome configurado com sucesso (básico)")
@@ -118,6 +132,7 @@ class HikCentralReactivator:
                 print("[FALLBACK] Tentando com WebDriver Manager...")
                 self.driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
                 self.driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+                configure_driver(self.driver)
                 print("[OK] Chrome configurado com sucesso (WebDriver Manager)")
                 return True
             except Exception as e2:
@@ -131,6 +146,7 @@ class HikCentralReactivator:
                     minimal_options.add_argument("--disable-dev-shm-usage")
                     
                     self.driver = webdriver.Chrome(options=minimal_options)
+                    configure_driver(self.driver)
                     print("[OK] Chrome configurado (minimalista)")
                     return True
                 except Exception as e3:
@@ -179,6 +195,13 @@ class HikCentralReactivator:
         return False
 
     def login(self):
+        """Autenticar no HikCentral reutilizando a sessão salva (login completo só se expirou)"""
+        if not session_store.ensure_login(self.driver, self.login_with_credentials, self.hikcentral_url):
+            return False
+        ensure_version(self.driver)  # Caches de seletores/rotas da versão certa
+        return True
+
+    def login_with_credentials(self):
         """Fazer login no HikCentral - COPIADO DO SCRIPT FUNCIONAL"""
         url = os.getenv('HIKCENTRAL_URL')
         username = os.getenv('HIKCENTRAL_USERNAME')
@@ -188,10 +211,11 @@ class HikCentralReactivator:
         
         try:
             self.driver.get(url)
-            time.sleep(5)
             
             # Login usando IDs - EXATAMENTE COMO FUNCIONAVA
-            username_field = self.driver.find_element(By.ID, "username")
+            username_field = find(self.driver, "username", timeout=30, by=By.ID, condition='clickable')
+            if not username_field:
+                raise Exception("Campo de usuário não apareceu")
             password_field = self.driver.find_element(By.ID, "password")
             
             # Preencher usuário
@@ -224,10 +248,23 @@ class HikCentralReactivator:
             return False
 
     def navigate_to_visitor_info(self):
+        """Abrir informações de visitante pela rota aprendida da SPA e selecionar o grupo VisitanteS"""
+        print("[NAV] Navegando para informações de visitantes...")
+        self.navigation = route_cache.navigate(
+            self.driver, 'visitor_info', self.visitor_info_ready, self.open_visitor_info_by_clicks
+        )
+        print(f"[NAV] Informações de visitante abertas via {self.navigation['mode']} em {self.navigation['seconds']:.1f}s")
+        if not self.navigation['success']:
+            return False
+        return self.select_visitor_group()
+
+    def visitor_info_ready(self):
+        """Lista de informações de visitante carregada (árvore de grupos visível)"""
+        return find(self.driver, "//span[contains(text(), 'VisitanteS')]", timeout=10, condition='visible') is not None
+
+    def open_visitor_info_by_clicks(self):
         """Navegar para área de informações de visitantes - CORRIGIDO: SEM CLICAR NO SIDEBAR"""
         try:
-            print("[NAV] Navegando para informações de visitantes...")
-            
             # 1. Procurar elemento Visitante - CÓDIGO ORIGINAL QUE FUNCIONAVA
             print("[NAV] Procurando menu 'Visitante'...")
             visitante_elements = self.driver.find_elements(By.XPATH, "//*[contains(text(), 'Visitante')]")
@@ -255,12 +292,11 @@ class HikCentralReactivator:
             ]
             
             entrada_clicked = False
-            for selector in entrada_selectors:
+            for selector in selector_cache.candidates('reactivate.entrada', entrada_selectors):
                 try:
-                    if selector.startswith("//"):
-                        entrada_element = self.driver.find_element(By.XPATH, selector)
-                    else:
-                        entrada_element = self.driver.find_element(By.CSS_SELECTOR, selector)
+                    entrada_element = find(self.driver, selector, timeout=3)
+                    if not entrada_element:
+                        raise Exception("não encontrado")
                     
                     if entrada_element.is_displayed():
                         # Scroll para o elemento antes de clicar
@@ -268,6 +304,7 @@ class HikCentralReactivator:
                         time.sleep(0.5)
                         entrada_element.click()
                         print(f"[OK] 'Entrada de visitante' clicado usando: {selector}")
+                        selector_cache.hit('reactivate.entrada', selector)
                         entrada_clicked = True
                         time.sleep(2)
                         break
@@ -302,18 +339,18 @@ class HikCentralReactivator:
             ]
             
             info_clicked = False
-            for selector in info_selectors:
+            for selector in selector_cache.candidates('reactivate.info_visitante', info_selectors):
                 try:
-                    if selector.startswith("//"):
-                        info_element = self.driver.find_element(By.XPATH, selector)
-                    else:
-                        info_element = self.driver.find_element(By.CSS_SELECTOR, selector)
+                    info_element = find(self.driver, selector, timeout=3)
+                    if not info_element:
+                        raise Exception("não encontrado")
                     
                     if info_element.is_displayed():
                         self.driver.execute_script("arguments[0].scrollIntoView(true);", info_element)
                         time.sleep(0.5)
                         info_element.click()
                         print(f"[OK] 'Informação de visitante' clicado usando: {selector}")
+                        selector_cache.hit('reactivate.info_visitante', selector)
                         info_clicked = True
                         time.sleep(2)
                         break
@@ -325,6 +362,15 @@ class HikCentralReactivator:
                 print("[ERRO] Não foi possível clicar em 'Informação de visitante'")
                 return False
             
+            return True
+            
+        except Exception as e:
+            print(f"[ERRO] Erro na navegação: {e}")
+            return False
+
+    def select_visitor_group(self):
+        """Selecionar o grupo 'VisitanteS' na árvore da lista de visitantes"""
+        try:
             # 5. Clicar em "VisitanteS"
             print("[NAV] Clicando em 'VisitanteS'...")
             visitantes_selectors = [
@@ -334,18 +380,18 @@ class HikCentralReactivator:
             ]
             
             visitantes_clicked = False
-            for selector in visitantes_selectors:
+            for selector in selector_cache.candidates('reactivate.grupo_visitantes', visitantes_selectors):
                 try:
-                    if selector.startswith("//"):
-                        visitantes_element = self.driver.find_element(By.XPATH, selector)
-                    else:
-                        visitantes_element = self.driver.find_element(By.CSS_SELECTOR, selector)
+                    visitantes_element = find(self.driver, selector, timeout=3)
+                    if not visitantes_element:
+                        raise Exception("não encontrado")
                     
                     if visitantes_element.is_displayed():
                         self.driver.execute_script("arguments[0].scrollIntoView(true);", visitantes_element)
                         time.sleep(0.5)
                         visitantes_element.click()
                         print(f"[OK] 'VisitanteS' clicado usando: {selector}")
+                        selector_cache.hit('reactivate.grupo_visitantes', selector)
                         visitantes_clicked = True
                         time.sleep(2)
                         break
@@ -396,9 +442,6 @@ class HikCentralReactivator:
             
             # Verificar se encontrou resultado - VERIFICAÇÃO MELHORADA
             try:
-                # Aguardar um pouco para a tabela carregar
-                time.sleep(2)
-                
                 # Múltiplas estratégias para detectar visitante
                 detection_strategies = [
                     # Estratégia 1: Tabela com data-row-key
@@ -411,6 +454,21 @@ class HikCentralReactivator:
                     lambda: self.driver.find_elements(By.XPATH, "//td[contains(text(), 'Lucca')]"),
                 ]
                 
+                # Aguardar a tabela carregar: todas as estratégias são sondas instantâneas
+                def any_strategy_matches(driver):
+                    for strategy in detection_strategies:
+                        try:
+                            if strategy():
+                                return True
+                        except Exception:
+                            continue
+                    return False
+                
+                try:
+                    WebDriverWait(self.driver, 5, poll_frequency=0.2).until(any_strategy_matches)
+                except TimeoutException:
+                    pass
+                
                 for i, strategy in enumerate(detection_strategies, 1):
                     try:
                         results = strategy()
@@ -438,6 +496,10 @@ class HikCentralReactivator:
             print(f"[ERRO] Erro na busca: {e}")
             return False
 
+    def lease_perdido(self):
+        """True se o servidor perdeu o lease deste job (não clicar em Reservar: reativação duplicada)"""
+        return self.lease_lost is not None and self.lease_lost.is_set()
+
     def reactivate_visitor(self, morador_nome):
         """Reativar o visitante encontrado"""
         try:
@@ -458,14 +520,13 @@ class HikCentralReactivator:
             ]
             
             reservar_clicked = False
-            for selector in reservar_selectors:
+            for selector in selector_cache.candidates('reactivate.reservar', reservar_selectors):
                 try:
                     print(f"[DEBUG] Tentando seletor: {selector}")
                     
-                    if selector.startswith("//"):
-                        reservar_element = self.driver.find_element(By.XPATH, selector)
-                    else:
-                        reservar_element = self.driver.find_element(By.CSS_SELECTOR, selector)
+                    reservar_element = find(self.driver, selector, timeout=3)
+                    if not reservar_element:
+                        raise Exception("não encontrado")
                     
                     if reservar_element.is_displayed() and reservar_element.is_enabled():
                         # Scroll para o elemento
@@ -480,6 +541,7 @@ class HikCentralReactivator:
                             self.driver.execute_script("arguments[0].click();", reservar_element)
                         
                         print(f"[OK] Botão 'Reservar novamente' clicado usando: {selector}")
+                        selector_cache.hit('reactivate.reservar', selector)
                         reservar_clicked = True
                         time.sleep(2)
                         break
@@ -520,12 +582,13 @@ class HikCentralReactivator:
             ]
             
             visitado_input = None
-            for selector in visitado_selectors:
+            for selector in selector_cache.candidates('reactivate.visitado', visitado_selectors):
                 try:
                     visitado_input = WebDriverWait(self.driver, 5).until(
                         EC.presence_of_element_located((By.CSS_SELECTOR, selector))
                     )
                     print(f"[OK] Campo visitado encontrado com: {selector}")
+                    selector_cache.hit('reactivate.visitado', selector)
                     break
                 except:
                     continue
@@ -575,6 +638,10 @@ class HikCentralReactivator:
             reservar_final_btn = WebDriverWait(self.driver, 10).until(
                 EC.element_to_be_clickable((By.XPATH, "//button[@title='Reservar']//span[text()='Reservar']"))
             )
+            if self.lease_perdido():
+                print("[ABORT] Lease perdido - reativação abortada sem clicar em Reservar")
+                self.aborted_lease_lost = True
+                return False
             reservar_final_btn.click()
             print("[SUCCESS] Botão 'Reservar' final clicado - REATIVAÇÃO CONCLUÍDA!")
             time.sleep(3)
@@ -586,56 +653,87 @@ class HikCentralReactivator:
             return False
 
     def run_reactivation(self):
-        """Executar processo completo de reativação"""
+        """Executar processo completo de reativação (uso via linha de comando)"""
+        return self.run().success
+
+    def run(self, visitor_data=None):
+        """Executar reativação completa e retornar AutomationResult com tempos por etapa"""
+        if visitor_data is not None:
+            self.visitor_data = visitor_data
+
+        result = AutomationResult(self.visitor_id, 'reactivate')
+
         try:
             print("[START] Iniciando processo de reativação...")
             
-            # Setup Chrome
-            if not self.setup_chrome():
-                return False
+            if self.owns_driver:
+                # Setup Chrome
+                if not result.timed('setup_driver', self.setup_chrome):
+                    return result.finish(False, 'Falha ao iniciar Chrome')
+                
+                # Login
+                if not result.timed('login', self.login):
+                    return result.finish(False, 'Falha no login do HikCentral')
+            else:
+                print("[POOL] Reutilizando sessão Chrome já autenticada")
             
-            # Login
-            if not self.login():
-                return False
+            # Lease perdido: o job já pode estar com outro worker
+            if self.lease_perdido():
+                return result.finish(False, LEASE_LOST_ERROR)
             
             # Navegar para área de visitantes
-            if not self.navigate_to_visitor_info():
-                return False
+            if not result.timed('navigate_to_visitor_info', self.navigate_to_visitor_info):
+                return result.finish(False, 'Falha na navegação até informações de visitante')
             
             # Buscar visitante por CPF
             cpf = self.visitor_data.get('cpf', '')
-            if not self.search_visitor_by_cpf(cpf):
+            if not result.timed('search_visitor', self.search_visitor_by_cpf, cpf):
                 print(f"[ERRO] Visitante com CPF {cpf} não encontrado para reativação")
-                return False
+                return result.finish(False, f'Visitante com CPF {cpf} não encontrado')
             
             # Reativar visitante
             morador_nome = self.visitor_data.get('morador_nome', 'lucca lacerda')  # Default para teste
-            if not self.reactivate_visitor(morador_nome):
-                return False
+            if self.lease_perdido():
+                return result.finish(False, LEASE_LOST_ERROR)
+            if not result.timed('reactivate', self.reactivate_visitor, morador_nome):
+                if self.aborted_lease_lost:
+                    return result.finish(False, LEASE_LOST_ERROR)
+                return result.finish(False, 'Falha ao reativar visitante')
             
             print("[SUCCESS] REATIVAÇÃO CONCLUÍDA COM SUCESSO!")
-            return True
+            return result.finish(True)
             
         except Exception as e:
             print(f"[ERRO] Erro durante reativação: {e}")
-            return False
+            return result.finish(False, e)
         finally:
-            if self.driver:
-                try:
-                    self.driver.quit()
-                    print("[CLEANUP] Chrome fechado")
-                except:
-                    pass
-            
-            # Limpar diretório temporário do Chrome
-            if hasattr(self, 'temp_profile'):
-                try:
-                    import shutil
-                    if os.path.exists(self.temp_profile):
-                        shutil.rmtree(self.temp_profile, ignore_errors=True)
-                        print(f"[CLEANUP] Diretório temporário removido: {self.temp_profile}")
-                except Exception as e:
-                    print(f"[WARN] Erro ao limpar diretório temporário: {e}")
+            if self.navigation:
+                result.details['navigation'] = dict(self.navigation)
+            selector_cache.save()
+            selector_cache.print_report()
+            # Driver emprestado pelo pool continua vivo para o próximo job
+            if self.owns_driver:
+                result.timed('cleanup', self.cleanup)
+            print(f"[RESULT] {result.summary()}")
+
+    def cleanup(self):
+        """Fechar Chrome e remover diretório temporário"""
+        if self.driver:
+            try:
+                self.driver.quit()
+                print("[CLEANUP] Chrome fechado")
+            except:
+                pass
+        
+        # Limpar diretório temporário do Chrome
+        if hasattr(self, 'temp_profile'):
+            try:
+                import shutil
+                if os.path.exists(self.temp_profile):
+                    shutil.rmtree(self.temp_profile, ignore_errors=True)
+                    print(f"[CLEANUP] Diretório temporário removido: {self.temp_profile}")
+            except Exception as e:
+                print(f"[WARN] Erro ao limpar diretório temporário: {e}")
 
     def configurar_duracao_reativacao(self):
         """Configurar duração da reativação (sempre alterar data da direita)"""
@@ -662,12 +760,13 @@ class HikCentralReactivator:
             ]
             
             data_field = None
-            for selector in data_selectors:
+            for selector in selector_cache.candidates('reactivate.data_saida', data_selectors):
                 try:
-                    field = self.driver.find_element(By.CSS_SELECTOR, selector)
-                    if field.is_displayed() and field.is_enabled():
+                    field = probe_visible(self.driver, selector)
+                    if field and field.is_enabled():
                         data_field = field
                         print(f"[OK] Campo de data da direita encontrado com: {selector}")
+                        selector_cache.hit('reactivate.data_saida', selector)
                         break
                 except:
                     continue
@@ -813,6 +912,11 @@ class HikCentralReactivator:
         except Exception as e:
             print(f"[WARN] Erro ao configurar duração da reativação: {e}")
 
+def run(visitor_data, visitor_id=None, headless=True):
+    """Executar uma reativação como biblioteca (sem subprocesso nem JSON temporário)"""
+    visitor_id = visitor_id or visitor_data.get('visitor_id') or "lib-job"
+    return HikCentralReactivator(visitor_data, visitor_id, headless).run()
+
 def main():
     parser = argparse.ArgumentParser(description='Reativar visitante no HikCentral')
     parser.add_argument('--visitor-id', required=True, help='ID do visitante')
@@ -2,16 +2,13 @@
 # -*- coding: utf-8 -*-
 """
 WINDOWS POLLING SERVICE - DUAL WORKERS
-Sistema com 2 cadastros simultâneos para condomínios grandes
+Cadastros simultâneos para condomínios grandes; o número de workers sobe e
+desce conforme a fila e a folga de CPU/RAM (worker_autoscaler)
 """
 
 import os
-import json
 import time
-import requests
-import base64
 import logging
-import subprocess
 import threading
 import queue
 from datetime import datetime
@@ -24,6 +21,14 @@ load_dotenv()
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 print(f"[DEBUG] Diretório do script: {SCRIPT_DIR}")
 
+# Automação carregada uma única vez (Selenium + scripts) e executada em processo
+from hikcentral_jobs import run_visitor_job
+from worker_autoscaler import WorkerAutoscaler
+from supabase_queue import claim_queue_items, default_worker_id
+from photo_storage import materialize_queue_photo, photo_cache
+from supabase_rest import get_client
+from queue_change_feed import QueueChangeFeed
+
 # Configuração de logging
 logging.basicConfig(
     level=logging.INFO,
@@ -44,7 +49,7 @@ if not SUPABASE_URL or not SUPABASE_SERVICE_KEY:
 
 print("WINDOWS DUAL WORKERS SERVICE - VISIT HUB")
 print("==================================================")
-print("[OK] 2 CADASTROS SIMULTÂNEOS ATIVADOS!")
+print("[OK] CADASTROS SIMULTÂNEOS COM AUTOSCALING ATIVADOS!")
 print("[OK] Arquitetura SEGURA - Windows NAO exposto!")
 print("[INFO] Verificando fila de cadastros...")
 print("==================================================")
@@ -58,79 +63,44 @@ class DualWorkersService:
     def __init__(self):
         self.supabase_url = SUPABASE_URL
         self.supabase_key = SUPABASE_SERVICE_KEY
-        self.headers = {
-            'apikey': self.supabase_key,
-            'Authorization': f'Bearer {self.supabase_key}',
-            'Content-Type': 'application/json',
-            'Prefer': 'return=representation'
-        }
-        
-        # Scripts path
-        self.script_create = os.path.join(SCRIPT_DIR, 'test_form_direct.py')
-        self.script_reactivate = os.path.join(SCRIPT_DIR, 'test_reactivate_visitor.py')
+        # Sessão HTTP compartilhada (keep-alive, timeout, retry e métricas por endpoint)
+        self.rest = get_client(self.supabase_url, self.supabase_key)
+        # Gravado em worker_id pelo claim (identifica esta máquina/processo na fila)
+        self.worker_id = default_worker_id()
+        # Acorda o monitor por LISTEN/NOTIFY; sem ele, polling adaptativo
+        self.feed = QueueChangeFeed()
         
-        if not os.path.exists(self.script_create):
-            logging.error(f"Script de criação não encontrado: {self.script_create}")
-            exit(1)
-        if not os.path.exists(self.script_reactivate):
-            logging.error(f"Script de reativação não encontrado: {self.script_reactivate}")
-            exit(1)
+        # Itens já trazidos do Supabase e ainda não concluídos (evita buscar o mesmo item duas vezes)
+        self.queued_ids = set()
+        # Último claim veio cheio: provavelmente há mais pendências no Supabase (sinal para o autoscaler)
+        self.remote_backlog = 0
+        self.autoscaler = WorkerAutoscaler(
+            spawn=self.spawn_worker,
+            queue_depth=lambda: work_queue.qsize() + self.remote_backlog,
+            busy_count=self.busy_workers,
+            on_retire=self.retire_worker
+        )
         
         logging.info("[OK] Dual Workers Service inicializado")
-        logging.info(f"[OK] Script criação: {self.script_create}")
-        logging.info(f"[OK] Script reativação: {self.script_reactivate}")
+        logging.info("[OK] Cadastro e reativação executados em processo (sem subprocesso)")
 
     def check_queue(self, limit=2):
-        """Verificar fila de cadastros pendentes (até 2 por vez)"""
+        """Reservar até limit cadastros pendentes (claim atômico: já voltam como processing)"""
         try:
-            url = f"{self.supabase_url}/rest/v1/visitor_registration_queue"
-            params = {
-                'status': 'eq.pending',
-                'select': '*',
-                'order': 'created_at.asc',
-                'limit': str(limit)
-            }
-            
-            response = requests.get(url, headers=self.headers, params=params)
-            
-            if response.status_code == 200:
-                items = response.json()
-                return items if items else []
-            else:
-                logging.error(f"Erro ao verificar fila: {response.status_code}")
-                return []
-                
+            return claim_queue_items(self.rest, limit, self.worker_id)
         except Exception as e:
             logging.error(f"Erro na verificação da fila: {e}")
             return []
 
-    def mark_processing(self, item_id, worker_id):
-        """Marcar item como processando"""
-        try:
-            url = f"{self.supabase_url}/rest/v1/visitor_registration_queue"
-            data = {
-                "status": "processing",
-                "worker_id": worker_id,
-                "processing_started_at": datetime.now().isoformat()
-            }
-            params = {"id": f"eq.{item_id}"}
-            
-            response = requests.patch(url, headers=self.headers, json=data, params=params)
-            return response.status_code == 200
-        except Exception as e:
-            logging.error(f"Erro ao marcar como processando: {e}")
-            return False
-
     def mark_completed(self, item_id):
         """Marcar item como concluído"""
         try:
-            url = f"{self.supabase_url}/rest/v1/visitor_registration_queue"
             from datetime import timezone
             data = {"status": "completed", "processed_at": datetime.now(timezone.utc).isoformat()}
             params = {"id": f"eq.{item_id}"}
             
-            response = requests.patch(url, headers=self.headers, json=data, params=params)
-            return response.status_code == 200
+            response = self.rest.update('visitor_registration_queue', params, data)
+            return response.status_code in [200, 204]
         except Exception as e:
             logging.error(f"Erro ao marcar como concluído: {e}")
             return False
@@ -138,7 +108,6 @@ class DualWorkersService:
     def mark_failed(self, item_id, error_message=""):
         """Marcar item como falhado"""
         try:
-            url = f"{self.supabase_url}/rest/v1/visitor_registration_queue"
             from datetime import timezone
             data = {
                 "status": "failed", 
@@ -147,26 +116,17 @@ class DualWorkersService:
             }
             params = {"id": f"eq.{item_id}"}
             
-            response = requests.patch(url, headers=self.headers, json=data, params=params)
-            return response.status_code == 200
+            response = self.rest.update('visitor_registration_queue', params, data)
+            return response.status_code in [200, 204]
         except Exception as e:
             logging.error(f"Erro ao marcar como falhado: {e}")
             return False
 
-    def save_photo(self, photo_base64, visitor_id):
-        """Salvar foto do visitante"""
-        if not photo_base64:
-            return None
-            
+    def save_photo(self, item, visitor_id):
+        """Salvar foto do visitante (Storage em streaming, via cache local)"""
         try:
-            photo_data = base64.b64decode(photo_base64)
-            photo_filename = f"visitor_photo_{visitor_id}.jpg"
-            photo_path = os.path.join(SCRIPT_DIR, photo_filename)
-            
-            with open(photo_path, 'wb') as f:
-                f.write(photo_data)
-            
-            return photo_path
+            photo_path = os.path.join(SCRIPT_DIR, f"visitor_photo_{visitor_id}.jpg")
+            return materialize_queue_photo(self.rest, item, photo_path)
         except Exception as e:
             logging.error(f"Erro ao salvar foto: {e}")
             return None
@@ -176,6 +136,10 @@ class DualWorkersService:
         logging.info(f"🚀 Worker {worker_id} iniciado")
         
         while True:
+            # Escala para baixo: sai só entre um job e outro
+            if self.autoscaler.should_retire(worker_id):
+                break
+            visitor_id = None
             try:
                 # Aguardar item na fila
                 try:
@@ -194,12 +158,7 @@ class DualWorkersService:
                 
                 logging.info(f"📝 Worker {worker_id} processando visitante {visitor_id}")
                 
-                # Marcar como processando
-                if not self.mark_processing(visitor_id, worker_id):
-                    logging.error(f"❌ Erro ao marcar {visitor_id} como processando")
-                    continue
-                
-                # Processar item
+                # Processar item (já reservado como processing pelo claim do monitor)
                 success = self.process_visitor(item, worker_id)
                 
                 # Atualizar status
@@ -211,6 +170,7 @@ class DualWorkersService:
                     logging.error(f"❌ Worker {worker_id} falhou {visitor_id}")
                 
                 with worker_lock:
+                    self.queued_ids.discard(visitor_id)
                     active_workers[worker_id] = {
                         'visitor_id': None,
                         'status': 'idle',
@@ -221,6 +181,12 @@ class DualWorkersService:
                 
             except Exception as e:
                 logging.error(f"❌ Worker {worker_id} erro: {e}")
+                if visitor_id is not None:
+                    # Item reservado como processing no Supabase: não deixar preso sem worker
+                    self.mark_failed(visitor_id, f"Erro no worker: {e}")
+                with worker_lock:
+                    self.queued_ids.discard(visitor_id)
+                    active_workers[worker_id] = {'visitor_id': None, 'status': 'idle'}
                 work_queue.task_done()
 
     def process_visitor(self, item, worker_id):
@@ -232,10 +198,10 @@ class DualWorkersService:
             
             logging.info(f"🔄 Worker {worker_id}: {action_type} para {visitor_id}")
             
-            # Salvar foto se existir
+            # Foto baixada só agora e só para cadastro (a reativação não usa foto)
             photo_path = None
-            if item.get('photo_base64'):
-                photo_path = self.save_photo(item['photo_base64'], visitor_id)
+            if action_type != 'reactivate':
+                photo_path = self.save_photo(item, visitor_id)
             
             # Preparar dados
             visitor_data = {
@@ -251,49 +217,21 @@ class DualWorkersService:
                 'photo_path': photo_path
             }
             
-            # Salvar dados temporários
-            json_filename = f"visitor_data_{visitor_id}_worker{worker_id}.json"
-            json_path = os.path.join(SCRIPT_DIR, json_filename)
-            
-            with open(json_path, 'w', encoding='utf-8') as f:
-                json.dump(visitor_data, f, ensure_ascii=False, indent=2)
-            
-            # Executar script apropriado
-            if action_type == 'reactivate':
-                cmd = [
-                    'python',
-                    self.script_reactivate,
-                    '--visitor-id', visitor_id
-                ]
-            else:
-                cmd = [
-                    'python',
-                    self.script_create,
-                    '--visitor-data', json_path,
-                    '--visitor-id', visitor_id
-                ]
-            
-            logging.info(f"📋 Worker {worker_id} executando: {' '.join(cmd)}")
-            
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                cwd=SCRIPT_DIR,
-                timeout=300  # 5 minutos timeout
-            )
+            # Executar em processo e obter resultado estruturado
+            result = run_visitor_job(visitor_data, visitor_id)
             
-            # Limpar arquivo temporário
-            try:
-                os.remove(json_path)
-            except:
-                pass
+            # Limpar foto temporária
+            if photo_path and os.path.exists(photo_path):
+                try:
+                    os.remove(photo_path)
+                except OSError:
+                    pass
             
-            if result.returncode == 0:
-                logging.info(f"✅ Worker {worker_id} sucesso: {visitor_id}")
+            if result.success:
+                logging.info(f"✅ Worker {worker_id} sucesso: {result.summary()}")
                 return True
             else:
-                logging.error(f"❌ Worker {worker_id} falha: {result.stderr}")
+                logging.error(f"❌ Worker {worker_id} falha: {result.summary()} - {result.error}")
                 return False
                 
         except Exception as e:
@@ -306,45 +244,68 @@ class DualWorkersService:
         
         while True:
             try:
-                # Verificar quantos workers estão livres
+                # Reservar só para workers vivos e ociosos: o que fica em processing no
+                # Supabase sem worker livre não pode ser pego por outra máquina
                 with worker_lock:
-                    idle_workers = sum(1 for w in active_workers.values() if w.get('status') == 'idle')
+                    idle = sum(1 for w in active_workers.values() if w.get('status') == 'idle')
+                free_slots = idle - work_queue.qsize()
+                
+                if free_slots <= 0:
+                    # Todos os slots ocupados: um aviso que chegar agora fica guardado no feed
+                    time.sleep(self.feed.min_interval)
+                    continue
+                
+                items = self.check_queue(limit=free_slots)
+                self.feed.record_claims(items)
+                # Claim cheio = deve haver mais na fila remota: o autoscaler sobe mais um worker
+                self.remote_backlog = 1 if len(items) >= free_slots else 0
                 
-                # Buscar itens pendentes (máximo = workers livres)
-                if idle_workers > 0:
-                    items = self.check_queue(limit=min(2, idle_workers))
-                    
-                    for item in items:
-                        work_queue.put(item)
-                        logging.info(f"📥 Item {item['id']} adicionado à fila")
+                for item in items:
+                    with worker_lock:
+                        if item['id'] in self.queued_ids:
+                            continue
+                        self.queued_ids.add(item['id'])
+                    work_queue.put(item)
+                    logging.info(f"📥 Item {item['id']} adicionado à fila")
                 
-                # Aguardar antes da próxima verificação
-                time.sleep(15)  # Verificar a cada 15 segundos
+                # Aguardar aviso de item novo (ou o intervalo adaptativo)
+                self.feed.wait(found=len(items))
                 
             except Exception as e:
                 logging.error(f"❌ Erro no monitor: {e}")
                 time.sleep(30)
 
-    def start_workers(self):
-        """Iniciar os 2 workers"""
-        # Inicializar status dos workers
+    def spawn_worker(self, worker_id):
+        """Iniciar a thread de um worker (chamado pelo autoscaler)"""
         with worker_lock:
-            for i in range(1, 3):  # Workers 1 e 2
-                active_workers[i] = {
-                    'visitor_id': None,
-                    'status': 'idle',
-                    'start_time': datetime.now().isoformat()
-                }
+            active_workers[worker_id] = {
+                'visitor_id': None,
+                'status': 'idle',
+                'start_time': datetime.now().isoformat()
+            }
         
-        # Iniciar threads dos workers
-        for worker_id in range(1, 3):
-            worker_thread = threading.Thread(
-                target=self.worker_process,
-                args=(worker_id,),
-                daemon=True
-            )
-            worker_thread.start()
-            logging.info(f"✅ Worker {worker_id} thread iniciada")
+        worker_thread = threading.Thread(
+            target=self.worker_process,
+            args=(worker_id,),
+            daemon=True
+        )
+        worker_thread.start()
+        logging.info(f"✅ Worker {worker_id} thread iniciada")
+
+    def retire_worker(self, worker_id):
+        """Worker encerrado pelo autoscaler"""
+        with worker_lock:
+            active_workers.pop(worker_id, None)
+
+    def busy_workers(self):
+        """Workers processando um visitante agora"""
+        with worker_lock:
+            return sum(1 for w in active_workers.values() if w.get('status') == 'processing')
+
+    def start_workers(self):
+        """Iniciar workers (autoscaler) e o monitor da fila"""
+        self.autoscaler.start()
+        self.feed.start()
         
         # Iniciar monitor da fila
         monitor_thread = threading.Thread(
@@ -357,7 +318,16 @@ class DualWorkersService:
     def print_status(self):
         """Imprimir status dos workers"""
         with worker_lock:
-            logging.info("📊 STATUS DOS WORKERS:")
+            logging.info(f"📊 STATUS DOS WORKERS ({self.autoscaler.last_decision}):")
+            feed = self.feed.get_metrics()
+            logging.info(f"   Fila: modo={feed['mode']} pickup p50={feed['pickup_latency_p50']}s "
+                         f"p99={feed['pickup_latency_p99']}s ({feed['pickup_samples']} amostras)")
+            for endpoint, stats in self.rest.get_metrics().items():
+                logging.info(f"   Supabase {endpoint}: {stats['calls']} chamadas, média {stats['avg_ms']}ms, "
+                             f"máx {stats['max_ms']}ms, {stats['retries']} retries")
+            photos = photo_cache.get_metrics()
+            logging.info(f"   Fotos: {photos['hits']} do cache, {photos['downloads']} baixadas "
+                         f"({photos['bytes_downloaded']} bytes)")
             for worker_id, status in active_workers.items():
                 visitor = status.get('visitor_id', 'None')
                 state = status.get('status', 'unknown')
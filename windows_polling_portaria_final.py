@@ -4,12 +4,13 @@
 import os
 import json
 import time
-import requests
-import base64
 import logging
 import subprocess
 from datetime import datetime, timezone
 from dotenv import load_dotenv
+from supabase_queue import claim_queue_items, default_worker_id
+from photo_storage import materialize_queue_photo
+from supabase_rest import get_client
 
 # Carregar .env
 load_dotenv()
@@ -48,12 +49,9 @@ class WindowsPollingService:
     def __init__(self):
         self.supabase_url = SUPABASE_URL
         self.supabase_key = SUPABASE_SERVICE_KEY
-        self.headers = {
-            'apikey': self.supabase_key,
-            'Authorization': f'Bearer {self.supabase_key}',
-            'Content-Type': 'application/json',
-            'Prefer': 'return=representation'
-        }
+        # Sessão HTTP compartilhada (keep-alive, timeout, retry e métricas por endpoint)
+        self.rest = get_client(self.supabase_url, self.supabase_key)
+        self.worker_id = default_worker_id()  # gravado em worker_id pelo claim
         
         # SCRIPT PATH COM CAMINHO ABSOLUTO - VERSÃO SEM EMOJIS
         self.script_path = os.path.join(SCRIPT_DIR, 'test_hikcentral_demo_windows_sem_emoji.py')
@@ -67,50 +65,21 @@ class WindowsPollingService:
         logging.info("[OK] Servico iniciado - Polling a cada 30s")
 
     def check_queue(self):
-        """Verificar fila de cadastros pendentes"""
+        """Reservar o próximo cadastro pendente (claim atômico: já volta como processando)"""
         try:
-            url = f"{self.supabase_url}/rest/v1/visitor_registration_queue"
-            params = {
-                'status': 'eq.pending',
-                'select': '*',
-                'order': 'created_at.asc',
-                'limit': '1'
-            }
-            
-            response = requests.get(url, headers=self.headers, params=params)
-            
-            if response.status_code == 200:
-                data = response.json()
-                return data[0] if data else None
-            else:
-                logging.error(f"[ERRO] Falha ao consultar fila: {response.status_code}")
-                return None
-                
+            items = claim_queue_items(self.rest, 1, self.worker_id)
+            return items[0] if items else None
         except Exception as e:
             logging.error(f"[ERRO] Erro ao verificar fila: {e}")
             return None
 
-    def mark_processing(self, item_id):
-        """Marcar item como processando"""
-        try:
-            url = f"{self.supabase_url}/rest/v1/visitor_registration_queue"
-            data = {"status": "processing"}
-            params = {"id": f"eq.{item_id}"}
-            
-            response = requests.patch(url, headers=self.headers, json=data, params=params)
-            return response.status_code in [200, 204]
-        except Exception as e:
-            logging.error(f"[ERRO] Erro ao marcar processando: {e}")
-            return False
-
     def mark_completed(self, item_id):
         """Marcar item como concluído"""
         try:
-            url = f"{self.supabase_url}/rest/v1/visitor_registration_queue"
             data = {"status": "completed", "processed_at": datetime.now(timezone.utc).isoformat()}
             params = {"id": f"eq.{item_id}"}
             
-            response = requests.patch(url, headers=self.headers, json=data, params=params)
+            response = self.rest.update('visitor_registration_queue', params, data)
             return response.status_code in [200, 204]
         except Exception as e:
             logging.error(f"[ERRO] Erro ao marcar concluido: {e}")
@@ -119,7 +88,6 @@ class WindowsPollingService:
     def mark_failed(self, item_id, error_message=""):
         """Marcar item como falhado"""
         try:
-            url = f"{self.supabase_url}/rest/v1/visitor_registration_queue"
             data = {
                 "status": "failed", 
                 "processed_at": datetime.now(timezone.utc).isoformat(),
@@ -127,7 +95,7 @@ class WindowsPollingService:
             }
             params = {"id": f"eq.{item_id}"}
             
-            response = requests.patch(url, headers=self.headers, json=data, params=params)
+            response = self.rest.update('visitor_registration_queue', params, data)
             return response.status_code in [200, 204]
         except Exception as e:
             logging.error(f"[ERRO] Erro ao marcar falhado: {e}")
@@ -149,23 +117,13 @@ class WindowsPollingService:
             logging.error(f"[ERRO] Erro ao salvar dados: {e}")
             return None
 
-    def save_photo(self, photo_base64, visitor_id):
-        """Salvar foto em arquivo - CAMINHO ABSOLUTO"""
+    def save_photo(self, item, visitor_id):
+        """Salvar foto em arquivo - CAMINHO ABSOLUTO (Storage em streaming, via cache local)"""
         try:
-            if not photo_base64:
-                return None
-                
-            # FORÇAR CAMINHO ABSOLUTO NO DIRETÓRIO DO SCRIPT  
+            # FORÇAR CAMINHO ABSOLUTO NO DIRETÓRIO DO SCRIPT
             photo_path = os.path.join(SCRIPT_DIR, f'visitor_photo_{visitor_id}.jpg')
-            
-            # Remover prefixo data:image se presente
-            if photo_base64.startswith('data:image'):
-                photo_base64 = photo_base64.split(',')[1]
-            
-            photo_data = base64.b64decode(photo_base64)
-            
-            with open(photo_path, 'wb') as f:
-                f.write(photo_data)
+            if not materialize_queue_photo(self.rest, item, photo_path):
+                return None
             
             logging.info(f"[PROCESS] Foto salva: {photo_path}")
             return photo_path
@@ -182,17 +140,10 @@ class WindowsPollingService:
             
             logging.info(f"[PROCESS] Processando: {visitor_name}")
             
-            # Marcar como processando
-            if not self.mark_processing(visitor_id):
-                logging.error(f"[ERRO] Falha ao marcar processando: {visitor_id}")
-                return False
-            
-            logging.info(f"[STATUS] Item {visitor_id} marcado como processando")
+            # Item já chega marcado como processando (claim em check_queue)
             
             # Salvar foto se presente
-            photo_path = None
-            if item.get('photo_base64'):
-                photo_path = self.save_photo(item['photo_base64'], visitor_id)
+            photo_path = self.save_photo(item, visitor_id)  # Storage, com cache local
             
             # Preparar dados para script
             visitor_data = {
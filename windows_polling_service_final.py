@@ -4,10 +4,7 @@
 import os
 import json
 import time
-import requests
-import base64
 import logging
-import subprocess
 import threading
 import queue
 from datetime import datetime
@@ -20,6 +17,13 @@ load_dotenv()
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 print(f"[DEBUG] Diretório do script: {SCRIPT_DIR}")
 
+# Automação carregada uma única vez (Selenium + scripts) e executada em processo
+from hikcentral_jobs import run_visitor_job
+from supabase_queue import claim_queue_items, default_worker_id
+from photo_storage import materialize_queue_photo
+from supabase_rest import get_client
+from queue_change_feed import QueueChangeFeed
+
 # Configuração de logging
 logging.basicConfig(
     level=logging.INFO,
@@ -70,69 +74,31 @@ class WindowsPollingService:
     def __init__(self):
         self.supabase_url = SUPABASE_URL
         self.supabase_key = SUPABASE_SERVICE_KEY
-        self.headers = {
-            'apikey': self.supabase_key,
-            'Authorization': f'Bearer {self.supabase_key}',
-            'Content-Type': 'application/json',
-            'Prefer': 'return=representation'
-        }
-        
-        # USAR O SCRIPT QUE ESTAVA FUNCIONANDO 100%
-        self.script_path = os.path.join(SCRIPT_DIR, 'test_form_direct.py')
-        if not os.path.exists(self.script_path):
-            print(f"[ERRO] Script não encontrado: {self.script_path}")
-            exit(1)
+        # Sessão HTTP compartilhada (keep-alive, timeout, retry e métricas por endpoint)
+        self.rest = get_client(self.supabase_url, self.supabase_key)
+        self.worker_id = default_worker_id()  # gravado em worker_id pelo claim
+        self.feed = QueueChangeFeed()  # LISTEN/NOTIFY ou polling adaptativo
         
         logging.info("[OK] Cliente Supabase inicializado")
-        logging.info(f"[OK] Processador HikCentral pronto: {self.script_path}")
-        logging.info("[OK] Servico iniciado - Polling a cada 30s")
+        logging.info("[OK] Processador HikCentral pronto (execução em processo)")
+        logging.info("[OK] Servico iniciado - fila por LISTEN/NOTIFY ou polling adaptativo")
 
     def check_queue(self, limit=2):
-        """Verificar fila de cadastros pendentes (até 2 por vez)"""
+        """Reservar até 2 cadastros pendentes (claim atômico: já voltam como processando)"""
         try:
-            url = f"{self.supabase_url}/rest/v1/visitor_registration_queue"
-            params = {
-                'status': 'eq.pending',
-                'select': '*',
-                'order': 'created_at.asc',
-                'limit': str(limit)
-            }
-            
-            response = requests.get(url, headers=self.headers, params=params)
-            
-            if response.status_code == 200:
-                data = response.json()
-                return data if data else []
-            else:
-                logging.error(f"[ERRO] Falha ao consultar fila: {response.status_code}")
-                return []
-                
+            return claim_queue_items(self.rest, limit, self.worker_id)
         except Exception as e:
             logging.error(f"[ERRO] Erro ao verificar fila: {e}")
             return []
 
-    def mark_processing(self, item_id):
-        """Marcar item como processando"""
-        try:
-            url = f"{self.supabase_url}/rest/v1/visitor_registration_queue"
-            data = {"status": "processing"}
-            params = {"id": f"eq.{item_id}"}
-            
-            response = requests.patch(url, headers=self.headers, json=data, params=params)
-            return response.status_code in [200, 204]
-        except Exception as e:
-            logging.error(f"[ERRO] Erro ao marcar processando: {e}")
-            return False
-
     def mark_completed(self, item_id):
         """Marcar item como concluído"""
         try:
-            url = f"{self.supabase_url}/rest/v1/visitor_registration_queue"
             from datetime import timezone
             data = {"status": "completed", "processed_at": datetime.now(timezone.utc).isoformat()}
             params = {"id": f"eq.{item_id}"}
             
-            response = requests.patch(url, headers=self.headers, json=data, params=params)
+            response = self.rest.update('visitor_registration_queue', params, data)
             return response.status_code in [200, 204]
         except Exception as e:
             logging.error(f"[ERRO] Erro ao marcar concluido: {e}")
@@ -141,7 +107,6 @@ class WindowsPollingService:
     def mark_failed(self, item_id, error_message=""):
         """Marcar item como falhado"""
         try:
-            url = f"{self.supabase_url}/rest/v1/visitor_registration_queue"
             from datetime import timezone
             data = {
                 "status": "failed", 
@@ -150,56 +115,19 @@ class WindowsPollingService:
             }
             params = {"id": f"eq.{item_id}"}
             
-            response = requests.patch(url, headers=self.headers, json=data, params=params)
+            response = self.rest.update('visitor_registration_queue', params, data)
             return response.status_code in [200, 204]
         except Exception as e:
             logging.error(f"[ERRO] Erro ao marcar falhado: {e}")
             return False
 
-    def save_visitor_data(self, visitor_data, visitor_id):
-        """Salvar dados do visitante em arquivo JSON - CAMINHO ABSOLUTO"""
+    def save_photo(self, item, visitor_id):
+        """Salvar foto em arquivo - CAMINHO ABSOLUTO (Storage em streaming, via cache local)"""
         try:
             # FORÇAR CAMINHO ABSOLUTO NO DIRETÓRIO DO SCRIPT
-            json_path = os.path.join(SCRIPT_DIR, f'visitor_data_{visitor_id}.json')
-            
-            # DEBUG: Verificar dados antes de salvar
-            print(f"[DEBUG] Salvando dados: {visitor_data}")
-            print(f"[DEBUG] Caminho de destino: {json_path}")
-            
-            with open(json_path, 'w', encoding='utf-8') as f:
-                json.dump(visitor_data, f, ensure_ascii=False, indent=2)
-            
-            # Verificar se foi salvo
-            if os.path.exists(json_path):
-                size = os.path.getsize(json_path)
-                print(f"[DEBUG] Arquivo salvo com {size} bytes")
-            else:
-                print(f"[DEBUG] ERRO: Arquivo não foi criado!")
-            
-            logging.info(f"[PROCESS] Dados salvos: {json_path}")
-            return json_path
-            
-        except Exception as e:
-            logging.error(f"[ERRO] Erro ao salvar dados: {e}")
-            return None
-
-    def save_photo(self, photo_base64, visitor_id):
-        """Salvar foto em arquivo - CAMINHO ABSOLUTO"""
-        try:
-            if not photo_base64:
-                return None
-                
-            # FORÇAR CAMINHO ABSOLUTO NO DIRETÓRIO DO SCRIPT  
             photo_path = os.path.join(SCRIPT_DIR, f'visitor_photo_{visitor_id}.jpg')
-            
-            # Remover prefixo data:image se presente
-            if photo_base64.startswith('data:image'):
-                photo_base64 = photo_base64.split(',')[1]
-            
-            photo_data = base64.b64decode(photo_base64)
-            
-            with open(photo_path, 'wb') as f:
-                f.write(photo_data)
+            if not materialize_queue_photo(self.rest, item, photo_path):
+                return None
             
             logging.info(f"[PROCESS] Foto salva: {photo_path}")
             return photo_path
@@ -218,33 +146,18 @@ class WindowsPollingService:
             action_type = visitor_data_temp.get('action', item.get('action_type', 'create'))  # 'create' ou 'reactivate'
             cpf = visitor_data_temp.get('cpf', '')
             
-            # ESCOLHER SCRIPT BASEADO NO TIPO DE AÇÃO
             if action_type == 'reactivate':
-                script_name = 'test_reactivate_visitor.py'
                 logging.info(f"[REACTIVATE] Reativando visitante: {visitor_name} (CPF: {cpf})")
             else:
-                script_name = 'test_form_direct.py'
                 logging.info(f"[CREATE] Criando novo visitante: {visitor_name}")
             
-            script_path = os.path.join(SCRIPT_DIR, script_name)
-            
-            # Verificar se script existe
-            if not os.path.exists(script_path):
-                logging.error(f"[ERRO] Script não encontrado: {script_path}")
-                self.mark_failed(visitor_id, f"Script não encontrado: {script_name}")
-                return False
-            
-            # Marcar como processando
-            if not self.mark_processing(visitor_id):
-                logging.error(f"[ERRO] Falha ao marcar processando: {visitor_id}")
-                return False
-            
-            logging.info(f"[STATUS] Item {visitor_id} marcado como processando")
+            # Item já chega marcado como processando (claim em check_queue)
             
             # Salvar foto se presente (apenas para cadastro novo)
             photo_path = None
-            if action_type == 'create' and item.get('photo_base64'):
-                photo_path = self.save_photo(item['photo_base64'], visitor_id)
+            if action_type == 'create':
+                # Foto baixada só para o job que vai rodar (Storage, com cache local)
+                photo_path = self.save_photo(item, visitor_id)
             
             # Preparar dados para script - COMPATÍVEL COM MELHORIAS
             visitor_data_from_queue = item.get('visitor_data', {})
@@ -261,65 +174,25 @@ class WindowsPollingService:
                 'photo_path': photo_path
             }
             
-            # Salvar dados em JSON
-            json_path = self.save_visitor_data(visitor_data, visitor_id)
-            if not json_path:
-                self.mark_failed(visitor_id, "Falha ao salvar dados")
-                return False
-            
-            # VERIFICAR SE ARQUIVOS FORAM CRIADOS
-            print(f"[DEBUG] JSON existe: {os.path.exists(json_path)}")
-            if photo_path:
-                print(f"[DEBUG] Foto existe: {os.path.exists(photo_path)}")
-            
-            # Executar script apropriado - ARGUMENTOS CORRETOS PARA CADA TIPO
-            if action_type == 'reactivate':
-                # Script de reativação: apenas visitor-id (SEM HEADLESS para configurar data)
-                cmd = [
-                    'python', 
-                    script_path,
-                    '--visitor-id', visitor_id
-                    # REMOVIDO --headless para permitir visualizacao da configuracao de data
-                ]
-            else:
-                # Script de cadastro: visitor-data + visitor-id (SEM HEADLESS para configurar duração)
-                cmd = [
-                    'python', 
-                    script_path,
-                    '--visitor-data', json_path,
-                    '--visitor-id', visitor_id
-                    # REMOVIDO --headless para permitir configuracao manual de data
-                ]
+            # Executar em processo (sem JSON temporário nem subprocesso)
+            result = run_visitor_job(visitor_data, visitor_id)
             
-            logging.info(f"[PROCESS] Executando: {' '.join(cmd)}")
-            
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=600,  # ✅ 10 minutos timeout (aumentado para acomodar melhorias anti-crash)
-                cwd=SCRIPT_DIR  # FORÇAR WORKING DIRECTORY
-            )
-            
-            # Limpar arquivos temporários
+            # Limpar foto temporária
             try:
-                if os.path.exists(json_path):
-                    os.remove(json_path)
                 if photo_path and os.path.exists(photo_path):
                     os.remove(photo_path)
             except Exception as e:
                 logging.warning(f"[WARN] Erro ao limpar arquivos: {e}")
             
-            if result.returncode == 0:
+            if result.success:
                 logging.info(f"[SUCCESS] Sucesso para {visitor_id}")
-                logging.info(f"[PROCESS] STDOUT: {result.stdout}")
+                logging.info(f"[PROCESS] {result.summary()}")
                 self.mark_completed(visitor_id)
                 return True
             else:
-                error_msg = result.stderr or result.stdout or "Erro desconhecido"
+                error_msg = result.error or "Erro desconhecido"
                 logging.error(f"[PROCESS] Falha para {visitor_id}")
-                logging.error(f"[PROCESS] STDERR: {result.stderr}")
-                logging.error(f"[PROCESS] STDOUT: {result.stdout}")
+                logging.error(f"[PROCESS] {result.summary()}")
                 self.mark_failed(visitor_id, error_msg)
                 return False
                 
@@ -363,6 +236,7 @@ class WindowsPollingService:
     def run(self):
         """Loop principal do serviço com 2 workers"""
         logging.info("[INFO] Iniciando DUAL WORKERS polling...")
+        self.feed.start()
         
         # Iniciar 2 workers
         for worker_id in range(1, 3):  # Workers 1 e 2
@@ -377,8 +251,14 @@ class WindowsPollingService:
         # Loop principal - alimenta a fila
         while True:
             try:
-                # Verificar fila de até 2 itens
-                items = self.check_queue(limit=2)
+                # Reservar só o que os 2 workers conseguem pegar agora
+                free_slots = 2 - work_queue.unfinished_tasks
+                if free_slots <= 0:
+                    time.sleep(self.feed.min_interval)
+                    continue
+                
+                items = self.check_queue(limit=free_slots)
+                self.feed.record_claims(items)
                 
                 if items:
                     logging.info(f"[QUEUE] {len(items)} item(s) encontrado(s)")
@@ -391,8 +271,8 @@ class WindowsPollingService:
                     logging.info("[QUEUE] Fila vazia")
                     logging.info("[INFO] Aguardando novos itens...")
                 
-                # Aguardar antes da próxima verificação
-                time.sleep(15)  # Verificar a cada 15 segundos
+                # Aguardar aviso de item novo (ou o intervalo adaptativo)
+                self.feed.wait(found=len(items))
                 
             except KeyboardInterrupt:
                 logging.info("[INFO] Servico interrompido pelo usuario")
@@ -15,9 +15,13 @@ import logging
 import subprocess
 import tempfile
 from datetime import datetime
-import requests
 from typing import Optional, Dict, Any
 
+from supabase_queue import claim_queue_items, default_worker_id
+from photo_storage import materialize_queue_photo
+from supabase_rest import get_client
+from queue_change_feed import QueueChangeFeed
+
 # Carregar variáveis de ambiente do arquivo .env
 try:
     from dotenv import load_dotenv
@@ -48,56 +52,33 @@ class SupabaseQueue:
         if not self.supabase_url or not self.supabase_key:
             raise ValueError("Supabase URL e Service Key são obrigatórios")
         
-        self.headers = {
-            'apikey': self.supabase_key,
-            'Authorization': f'Bearer {self.supabase_key}',
-            'Content-Type': 'application/json',
-            'Prefer': 'return=representation'
-        }
+        # Sessão HTTP compartilhada (keep-alive, timeout, retry e métricas por endpoint)
+        self.rest = get_client(self.supabase_url, self.supabase_key)
+        # Gravado em worker_id pelo claim da fila
+        self.worker_id = default_worker_id()
         
         logging.info("[OK] Cliente Supabase inicializado")
     
     def get_next_queue_item(self) -> Optional[Dict[Any, Any]]:
-        """Buscar próximo item da fila"""
+        """Reservar próximo item da fila (claim atômico: já volta como processing)"""
         try:
-            # Chamar função do PostgreSQL para pegar próximo item
-            response = requests.post(
-                f"{self.supabase_url}/rest/v1/rpc/get_next_queue_item",
-                headers=self.headers,
-                timeout=30
-            )
-            
-                                     if response.status_code == 200:
-                data = response.json()
-                # Verificar se há dados válidos
-                if data and isinstance(data, dict) and data.get('id'):
-                    logging.info(f"[INFO] Item da fila obtido: {data.get('id')}")
-                    return data
-                else:
-                    logging.info("[INFO] Nenhum item na fila")
-                    return None
-            elif response.status_code == 204:  # 204 = sem itens
-                logging.info("[INFO] Fila vazia")
-                return None
-            else:
-                logging.warning(f"[WARN] Erro ao buscar fila: {response.status_code}")
-                return None
-                
+            items = claim_queue_items(self.rest, 1, self.worker_id)
+            if items:
+                item = items[0]
+                logging.info(f"[INFO] Item da fila reservado: {item.get('id')}")
+                return item
         except Exception as e:
             logging.error(f"[ERROR] Erro na conexao Supabase: {e}")
-            return None
+        
+        return None
     
     def mark_completed(self, item_id: str):
         """Marcar item como concluído"""
         try:
-            response = requests.post(
-                f"{self.supabase_url}/rest/v1/rpc/mark_queue_item_completed",
-                headers=self.headers,
-                json={'item_id': item_id},
-                timeout=30
-            )
+            # Idempotente: repetir depois de timeout não muda o resultado
+            response = self.rest.rpc('mark_queue_item_completed', {'item_id': item_id}, idempotent=True)
             
-            if response.status_code == 200:
+            if response.status_code in [200, 204]:
                 logging.info(f"[OK] Item {item_id} marcado como concluido")
             else:
                 logging.warning(f"[WARN] Erro ao marcar concluido: {response.status_code}")
@@ -108,17 +89,12 @@ class SupabaseQueue:
     def mark_failed(self, item_id: str, error_message: str):
         """Marcar item como falhado"""
         try:
-            response = requests.post(
-                f"{self.supabase_url}/rest/v1/rpc/mark_queue_item_failed",
-                headers=self.headers,
-                json={
-                    'item_id': item_id,
-                    'error_msg': error_message
-                },
-                timeout=30
-            )
+            response = self.rest.rpc('mark_queue_item_failed', {
+                'item_id': item_id,
+                'error_msg': error_message
+            }, idempotent=True)
             
-            if response.status_code == 200:
+            if response.status_code in [200, 204]:
                 logging.info(f"[FAIL] Item {item_id} marcado como falhado")
             else:
                 logging.warning(f"[WARN] Erro ao marcar falhado: {response.status_code}")
@@ -145,7 +121,6 @@ class HikCentralProcessor:
             
         item_id = queue_item.get('id')
         visitor_data = queue_item.get('visitor_data', {})
-        photo_base64 = queue_item.get('photo_base64')
         
         if not visitor_data:
             logging.error(f"[ERROR] Dados do visitante vazio para item {item_id}")
@@ -163,11 +138,10 @@ class HikCentralProcessor:
                 'photo_path': None
             }
             
-            # Salvar foto se fornecida
-            if photo_base64:
-                photo_path = self._save_photo(photo_base64, item_id)
-                if photo_path:
-                    script_data['photo_path'] = photo_path
+            # Salvar foto se fornecida (baixada só agora, do Storage ou do cache local)
+            photo_path = self._save_photo(queue_item, item_id)
+            if photo_path:
+                script_data['photo_path'] = photo_path
             
             # Criar arquivo temporário com dados
             temp_file = self._create_temp_file(script_data, item_id)
@@ -184,20 +158,14 @@ class HikCentralProcessor:
             logging.error(f"[ERROR] Erro ao processar {item_id}: {e}")
             return False
     
-    def _save_photo(self, photo_base64: str, item_id: str) -> Optional[str]:
-        """Salvar foto base64 em arquivo temporário"""
+    def _save_photo(self, queue_item: Dict[Any, Any], item_id: str) -> Optional[str]:
+        """Salvar foto do item em arquivo temporário (Storage em streaming, via cache local)"""
         try:
-            import base64
-            
-            # Decodificar base64
-            photo_data = base64.b64decode(photo_base64)
-            
-            # Salvar em arquivo temporário
             temp_dir = tempfile.gettempdir()
-            photo_path = os.path.join(temp_dir, f"visitor_photo_{item_id}.jpg")
-            
-            with open(photo_path, 'wb') as f:
-                f.write(photo_data)
+            photo_path = materialize_queue_photo(get_client(), queue_item,
+                                                 os.path.join(temp_dir, f"visitor_photo_{item_id}.jpg"))
+            if not photo_path:
+                return None
             
             logging.info(f"[INFO] Foto salva: {photo_path}")
             return photo_path
@@ -289,19 +257,23 @@ class WindowsPollingService:
     def __init__(self):
         self.queue = SupabaseQueue()
         self.processor = HikCentralProcessor()
-        self.poll_interval = int(os.getenv('POLL_INTERVAL', '30'))  # 30 segundos
+        self.poll_interval = int(os.getenv('POLL_INTERVAL', '30'))  # intervalo máximo sem aviso
         self.running = True
         
-        logging.info(f"[OK] Servico iniciado - Polling a cada {self.poll_interval}s")
+        logging.info(f"[OK] Servico iniciado - Polling adaptativo até {self.poll_interval}s")
+        # LISTEN/NOTIFY acorda o loop na hora; sem ele, polling adaptativo até poll_interval
+        self.feed = QueueChangeFeed(max_interval=self.poll_interval)
     
     def run(self):
         """Loop principal do serviço"""
         logging.info("[INFO] Iniciando polling loop...")
+        self.feed.start()
         
         while self.running:
             try:
                 # Buscar próximo item
                 queue_item = self.queue.get_next_queue_item()
+                self.feed.record_claims([queue_item] if queue_item else [])
                 
                 if queue_item:
                     # Processar item
@@ -317,8 +289,8 @@ class WindowsPollingService:
                     # Sem itens, aguardar
                     logging.info("[INFO] Nenhum item na fila, aguardando...")
                 
-                # Aguardar próximo ciclo
-                time.sleep(self.poll_interval)
+                # Aguardar aviso de item novo (ou o intervalo adaptativo)
+                self.feed.wait(found=1 if queue_item else 0)
                 
             except KeyboardInterrupt:
                 logging.info("[INFO] Interrupcao manual recebida")
@@ -12,9 +12,12 @@ import sys
 import logging
 import subprocess
 import tempfile
-import requests
 from typing import Optional, Dict, Any
 
+from supabase_queue import claim_queue_items, default_worker_id
+from photo_storage import materialize_queue_photo
+from supabase_rest import get_client
+
 # Carregar .env
 try:
     from dotenv import load_dotenv
@@ -33,83 +36,35 @@ logging.basicConfig(
     ]
 )
 
-def get_supabase_headers():
-    """Obter headers do Supabase"""
-    service_key = os.getenv('SUPABASE_SERVICE_KEY')
-    return {
-        'apikey': service_key,
-        'Authorization': f'Bearer {service_key}',
-        'Content-Type': 'application/json'
-    }
+# Gravado em worker_id pelo claim da fila
+WORKER_ID = default_worker_id()
 
 def check_queue():
-    """Verificar se há itens na fila"""
+    """Reservar o próximo item da fila (claim atômico: já volta como processando)"""
     try:
-        url = os.getenv('SUPABASE_URL')
-        headers = get_supabase_headers()
-        
-        # Buscar itens pendentes diretamente na tabela
-        response = requests.get(
-            f"{url}/rest/v1/visitor_registration_queue?status=eq.pending&limit=1",
-            headers=headers,
-            timeout=30
-        )
-        
-        if response.status_code == 200:
-            data = response.json()
-            if data and len(data) > 0:
-                item = data[0]
-                logging.info(f"[QUEUE] Item encontrado: {item.get('id')}")
-                return item
-            else:
-                logging.info("[QUEUE] Fila vazia")
-                return None
+        items = claim_queue_items(get_client(), 1, WORKER_ID)
+        if items:
+            item = items[0]
+            logging.info(f"[QUEUE] Item reservado: {item.get('id')}")
+            return item
         else:
-            logging.warning(f"[QUEUE] Erro HTTP: {response.status_code}")
+            logging.info("[QUEUE] Fila vazia")
             return None
             
     except Exception as e:
         logging.error(f"[QUEUE] Erro: {e}")
         return None
 
-def mark_processing(item_id):
-    """Marcar item como sendo processado"""
-    try:
-        url = os.getenv('SUPABASE_URL')
-        headers = get_supabase_headers()
-        
-        response = requests.patch(
-            f"{url}/rest/v1/visitor_registration_queue?id=eq.{item_id}",
-            headers=headers,
-            json={'status': 'processing'},
-            timeout=30
-        )
-        
-        if response.status_code == 204:
-            logging.info(f"[STATUS] Item {item_id} marcado como processando")
-            return True
-        else:
-            logging.warning(f"[STATUS] Erro ao marcar processando: {response.status_code}")
-            return False
-            
-    except Exception as e:
-        logging.error(f"[STATUS] Erro: {e}")
-        return False
-
 def mark_completed(item_id):
     """Marcar item como concluído"""
     try:
-        url = os.getenv('SUPABASE_URL')
-        headers = get_supabase_headers()
-        
-        response = requests.patch(
-            f"{url}/rest/v1/visitor_registration_queue?id=eq.{item_id}",
-            headers=headers,
-            json={
+        response = get_client().update(
+            'visitor_registration_queue',
+            {'id': f'eq.{item_id}'},
+            {
                 'status': 'completed',
                 'processed_at': 'now()'
-            },
-            timeout=30
+            }
         )
         
         if response.status_code == 204:
@@ -126,17 +81,13 @@ def mark_completed(item_id):
 def mark_failed(item_id, error_msg):
     """Marcar item como falhado"""
     try:
-        url = os.getenv('SUPABASE_URL')
-        headers = get_supabase_headers()
-        
-        response = requests.patch(
-            f"{url}/rest/v1/visitor_registration_queue?id=eq.{item_id}",
-            headers=headers,
-            json={
+        response = get_client().update(
+            'visitor_registration_queue',
+            {'id': f'eq.{item_id}'},
+            {
                 'status': 'failed',
                 'error_message': error_msg
-            },
-            timeout=30
+            }
         )
         
         if response.status_code == 204:
@@ -163,24 +114,15 @@ def process_visitor(queue_item):
         name = visitor_data.get('name', 'N/A')
         logging.info(f"[PROCESS] Processando: {name}")
         
-        # Marcar como processando
-        mark_processing(item_id)
-        
-        # Salvar foto se fornecida
+        # Salvar foto se fornecida (Storage em streaming, via cache local)
         photo_path = None
-        if queue_item.get('photo_base64'):
-            try:
-                import base64
-                photo_data = base64.b64decode(queue_item.get('photo_base64'))
-                temp_dir = tempfile.gettempdir()
-                photo_path = os.path.join(temp_dir, f"visitor_photo_{item_id}.jpg")
-                
-                with open(photo_path, 'wb') as f:
-                    f.write(photo_data)
-                
+        try:
+            photo_path = materialize_queue_photo(get_client(), queue_item,
+                                                 os.path.join(tempfile.gettempdir(), f"visitor_photo_{item_id}.jpg"))
+            if photo_path:
                 logging.info(f"[PROCESS] Foto salva: {photo_path}")
-            except Exception as e:
-                logging.error(f"[ERROR] Erro ao salvar foto: {e}")
+        except Exception as e:
+            logging.error(f"[ERROR] Erro ao salvar foto: {e}")
         
         # Preparar dados para script
         script_data = {
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+📈 WORKER AUTOSCALER - CONCORRÊNCIA POR FOLGA DE CPU/RAM E TAMANHO DA FILA
+=========================================================================
+Substitui o número fixo de workers (MAX_WORKERS = 3 no servidor, 2 no
+serviço dual) por um controle que, a cada ciclo:
+
+- sobe workers enquanto houver fila e folga de RAM (um Chrome headless por
+  worker, orçado em CHROME_MEMORY_CAP_MB) e a CPU não estiver saturada
+- desce workers aos poucos quando a fila esvazia e eles ficam ociosos;
+  o worker só sai entre um job e outro (nunca no meio de um cadastro)
+
+Sem psutil, a escala considera apenas a fila (limitada a MAX_WORKERS).
+"""
+
+import os
+import time
+import logging
+import threading
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+    logging.warning("⚠️ psutil não instalado - autoscaler usará apenas o tamanho da fila")
+
+CPU_COUNT = os.cpu_count() or 2
+
+MIN_WORKERS = int(os.getenv('MIN_WORKERS', '1'))
+MAX_WORKERS = int(os.getenv('MAX_WORKERS', str(max(2, CPU_COUNT // 2))))
+CHROME_MEMORY_CAP_MB = int(os.getenv('CHROME_MEMORY_CAP_MB', '1024'))  # teto por Chrome (árvore de processos)
+RAM_RESERVE_MB = int(os.getenv('RAM_RESERVE_MB', '1024'))              # RAM que fica livre para o sistema
+CPU_HIGH_PERCENT = float(os.getenv('CPU_HIGH_PERCENT', '85'))          # acima disso não sobe worker
+SCALE_DOWN_IDLE = int(os.getenv('SCALE_DOWN_IDLE', '120'))             # segundos de ociosidade antes de descer
+AUTOSCALE_INTERVAL = int(os.getenv('AUTOSCALE_INTERVAL', '5'))
+
+
+def process_tree_memory_mb(pid):
+    """RSS somado de um processo e de todos os filhos (ex.: chromedriver + Chrome), em MB"""
+    if psutil is None or not pid:
+        return None
+    try:
+        root = psutil.Process(pid)
+        total = 0
+        for proc in [root] + root.children(recursive=True):
+            try:
+                total += proc.memory_info().rss
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+        return total / (1024 * 1024)
+    except (psutil.NoSuchProcess, psutil.AccessDenied):
+        return None
+
+
+def driver_memory_mb(driver):
+    """Memória do Chrome controlado pelo driver (via PID do chromedriver)"""
+    try:
+        return process_tree_memory_mb(driver.service.process.pid)
+    except Exception:
+        return None
+
+
+class WorkerAutoscaler:
+    """
+    Controla quantos workers estão vivos.
+
+    Args:
+        spawn: callable(worker_id) que inicia a thread do worker
+        queue_depth: callable() -> itens aguardando na fila
+        busy_count: callable() -> workers processando um job agora
+        on_retire: callable(worker_id) chamado quando o worker sai (ex.: liberar sessão Chrome)
+    """
+
+    def __init__(self, spawn, queue_depth, busy_count, on_retire=None,
+                 min_workers=MIN_WORKERS, max_workers=MAX_WORKERS,
+                 memory_per_worker_mb=CHROME_MEMORY_CAP_MB, interval=AUTOSCALE_INTERVAL):
+        self.spawn = spawn
+        self.queue_depth = queue_depth
+        self.busy_count = busy_count
+        self.on_retire = on_retire
+        self.min_workers = max(1, min_workers)
+        self.max_workers = max(self.min_workers, max_workers)
+        self.memory_per_worker_mb = memory_per_worker_mb
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.alive = set()
+        self.retiring = set()
+        self.running = False
+        self.last_demand = time.monotonic()
+        self.last_decision = 'start'
+        self.metrics = {'scale_ups': 0, 'scale_downs': 0, 'blocked_by_cpu': 0, 'blocked_by_ram': 0}
+
+    # ========== CICLO ==========
+
+    def start(self):
+        """Sobe o mínimo de workers e inicia o controle em segundo plano"""
+        self.running = True
+        for _ in range(self.min_workers):
+            self._scale_up()
+        threading.Thread(target=self._loop, daemon=True).start()
+        logging.info(f"📈 Autoscaler iniciado ({self.min_workers}-{self.max_workers} workers, "
+                     f"{self.memory_per_worker_mb} MB por Chrome)")
+
+    def stop(self):
+        self.running = False
+
+    def _loop(self):
+        while self.running:
+            try:
+                self.tick()
+            except Exception as e:
+                logging.error(f"❌ Erro no autoscaler: {e}")
+            time.sleep(self.interval)
+
+    # ========== FOLGA DE RECURSOS ==========
+
+    def headroom(self):
+        """CPU atual e quantos Chromes a mais cabem na RAM livre (None sem psutil)"""
+        if psutil is None:
+            return None
+        memory = psutil.virtual_memory()
+        available_mb = memory.available / (1024 * 1024)
+        return {
+            'cpu_percent': psutil.cpu_percent(interval=None),
+            'available_mb': round(available_mb),
+            'extra_workers_by_ram': max(0, int((available_mb - RAM_RESERVE_MB) // self.memory_per_worker_mb))
+        }
+
+    # ========== DECISÃO ==========
+
+    def tick(self):
+        """Compara demanda (ocupados + fila) com workers vivos e ajusta um worker por ciclo"""
+        depth = self.queue_depth()
+        busy = self.busy_count()
+        with self.lock:
+            alive = len(self.alive) - len(self.retiring)
+        demand = busy + depth
+        target = max(self.min_workers, min(self.max_workers, demand))
+
+        if demand >= alive:
+            self.last_demand = time.monotonic()
+
+        if target > alive:
+            headroom = self.headroom()
+            if headroom is not None and headroom['cpu_percent'] >= CPU_HIGH_PERCENT:
+                self.metrics['blocked_by_cpu'] += 1
+                self.last_decision = f"hold: CPU {headroom['cpu_percent']:.0f}%"
+                return
+            if headroom is not None and headroom['extra_workers_by_ram'] < 1:
+                self.metrics['blocked_by_ram'] += 1
+                self.last_decision = f"hold: {headroom['available_mb']} MB livres"
+                return
+            self._scale_up()
+            self.last_decision = f"up: fila={depth}, ocupados={busy}"
+        elif target < alive and depth == 0 and time.monotonic() - self.last_demand >= SCALE_DOWN_IDLE:
+            self._scale_down()
+            self.last_decision = f"down: ocioso há {time.monotonic() - self.last_demand:.0f}s"
+
+    def _scale_up(self):
+        with self.lock:
+            # Reaproveitar worker que ia sair, se houver
+            if self.retiring:
+                worker_id = min(self.retiring)
+                self.retiring.discard(worker_id)
+                logging.info(f"📈 Worker {worker_id} mantido (demanda voltou)")
+                return
+            worker_id = 0
+            while worker_id in self.alive:
+                worker_id += 1
+            self.alive.add(worker_id)
+            self.metrics['scale_ups'] += 1
+        logging.info(f"📈 Subindo worker {worker_id}")
+        self.spawn(worker_id)
+
+    def _scale_down(self):
+        with self.lock:
+            candidates = sorted(self.alive - self.retiring, reverse=True)
+            if len(candidates) <= self.min_workers:
+                return
+            worker_id = candidates[0]
+            self.retiring.add(worker_id)
+        logging.info(f"📉 Worker {worker_id} sairá após o job atual (fila vazia)")
+
+    # ========== LADO DO WORKER ==========
+
+    def should_retire(self, worker_id):
+        """
+        Chamado pelo worker entre jobs. True = encerrar o loop agora;
+        o autoscaler já tirou o worker da contagem e liberou os recursos dele.
+        """
+        with self.lock:
+            if worker_id not in self.retiring:
+                return False
+            self.retiring.discard(worker_id)
+            self.alive.discard(worker_id)
+            self.metrics['scale_downs'] += 1
+        if self.on_retire:
+            try:
+                self.on_retire(worker_id)
+            except Exception as e:
+                logging.warning(f"⚠️ Erro ao liberar recursos do worker {worker_id}: {e}")
+        logging.info(f"📉 Worker {worker_id} encerrado")
+        return True
+
+    # ========== MÉTRICAS ==========
+
+    def get_metrics(self):
+        with self.lock:
+            alive = sorted(self.alive)
+            retiring = sorted(self.retiring)
+        return {
+            'alive': alive,
+            'retiring': retiring,
+            'min_workers': self.min_workers,
+            'max_workers': self.max_workers,
+            'memory_per_worker_mb': self.memory_per_worker_mb,
+            'last_decision': self.last_decision,
+            'headroom': self.headroom(),
+            **self.metrics
+        }